@@ -1,75 +1,202 @@
-from PySide6.QtCore import QObject, Signal, QTimer
-import nidaqmx
-from nidaqmx.constants import TemperatureUnits, ThermocoupleType
+from PySide6.QtCore import QObject, Signal, Slot, QTimer, Qt
+import numpy as np
 import time
+import traceback
 
-type_map = {
-    "K": ThermocoupleType.K,
-    "J": ThermocoupleType.J,
-    "T": ThermocoupleType.T,
-    "E": ThermocoupleType.E,
-    "R": ThermocoupleType.R,
-    "S": ThermocoupleType.S,
-    "B": ThermocoupleType.B,
-    "N": ThermocoupleType.N
-}
+from acquisition.block import DataBlock
+from acquisition.chassis_tasks import build_chassis_tasks, READ_TIMEOUT_S
+from acquisition.scheduler import AcquisitionScheduler
+from core.calibration import CalibrationBank, units_of
+from core.filters import FilterBank
+from core.virtual_channels import compile_virtual_channels
 
 class AcquisitionWorker(QObject):
-    new_data = Signal(dict)
+    new_data = Signal(object)           # DataBlock (canaux physiques puis virtuels)
+    timing_updated = Signal(dict)       # statistiques du scheduler après chaque acquisition
+    device_status = Signal(str, bool, float)  # châssis ou module, en ligne, instant (s depuis le départ)
+    heartbeat = Signal(float, str)      # intervalle courant (s), erreur du tick ("" si aucune)
     finished = Signal()
 
-    def __init__(self, config):
+    def __init__(self, config, t0=None, generation=0):
         super().__init__()
-        self.config = config
         self.running = False
         self.timer = None
+        self.scheduler = None
+        self.chassis_tasks = []
+        self.filters = None
+        # Origine des temps imposée (redémarrage par le superviseur) : horodatages continus
+        self.t0 = t0
+        # Numéro de la config appliquée, porté par chaque bloc
+        self.generation = generation
+        self._apply_config(config)
+
+    def _apply_config(self, config):
+        self.config = config
+        acq_cfg = config.section("acquisition")
+        scheduler = AcquisitionScheduler(
+            interval_s=acq_cfg.get("interval_ms", 1000) / 1000.0,
+            policy=acq_cfg.get("overrun_policy", "skip"),
+            max_catch_up=acq_cfg.get("max_catch_up", 3),
+            max_interval_s=acq_cfg.get("max_interval_ms", 0) / 1000.0 or None,
+        )
+        if self.scheduler is None or acq_cfg != self._acq_cfg:
+            self.scheduler = scheduler
+            self._acq_cfg = dict(acq_cfg)
+
+        # Ordre des lignes de la matrice : canaux actifs, précalculé par la config
+        self.channels = config.enabled_channels
+        self.channel_ids = list(config.enabled_channel_ids)
+        # Une tâche persistante par châssis ; celles dont les canaux n'ont pas changé sont gardées
+        self.chassis_tasks = build_chassis_tasks(
+            self.channels, self.chassis_tasks,
+            read_timeout_s=acq_cfg.get("read_timeout_s", READ_TIMEOUT_S)
+        )
+        self.virtual_plan, errors = compile_virtual_channels(
+            config.virtual_channels, self.channel_ids
+        )
+        for name, error in errors.items():
+            print(f"[Worker] Virtual channel {name} ignored: {error}")
+
+        # Étalonnages et unité : sans état, recalculés à chaque config
+        self.calibration = CalibrationBank(self.channels, units_of(config))
+        for ch_id, error in self.calibration.errors.items():
+            print(f"[Worker] Calibration of {ch_id} ignored: {error}")
+
+        # Filtres conçus pour la cadence nominale ; état gardé si rien ne change
+        filters = FilterBank(self.channels, 1.0 / self.scheduler.target_interval)
+        if self.filters is None or filters.signature != self.filters.signature:
+            self.filters = filters
+            for ch_id, error in filters.errors.items():
+                print(f"[Worker] Filter on {ch_id} ignored: {error}")
+
+    @Slot(object, int)
+    def reconfigure(self, config, generation=0):
+        """Applique une nouvelle config (profil) sans arrêter le thread ni rescanner.
+
+        Le scheduler n'est recréé que si la section "acquisition" change ;
+        sinon seuls les canaux et le plan des canaux virtuels sont remplacés,
+        entre deux ticks.
+        """
+        previous = self.scheduler
+        self._apply_config(config)
+        self.generation = generation
+        if self.scheduler is not previous and previous.t0 is not None:
+            # Nouvelle cadence, même origine des temps : les horodatages restent continus
+            self.scheduler.start()
+            self.scheduler.t0 = previous.t0
+            if self.running and self.timer:
+                self.timer.start(0)
+
+    @Slot(str, bool)
+    def set_device_online(self, device_name, online):
+        """Signalé par le DeviceWatcher : seule la tâche du châssis concerné est reconstruite."""
+        for chassis in self.chassis_tasks:
+            if online and chassis.include_device(device_name):
+                print(f"[Worker] {device_name} back, rebuilding task of {chassis.chassis}")
+                self.device_status.emit(device_name, True, self._elapsed())
+            elif not online and chassis.exclude_device(device_name):
+                print(f"[Worker] {device_name} removed, rebuilding task of {chassis.chassis}")
+                self.device_status.emit(device_name, False, self._elapsed())
+
+    def _chassis_lost(self, chassis, error):
+        print(f"[Worker] Chassis {chassis.chassis} offline: {error}")
+        chassis.mark_offline(self.scheduler.clock(), error)
+        self.device_status.emit(chassis.chassis, False, self._elapsed())
+
+    def _elapsed(self):
+        return self.scheduler.clock() - (self.scheduler.t0 or self.scheduler.clock())
+
+    def close_tasks(self):
+        """Ferme les tâches DAQmx (appelé par stop(), dans le thread du worker)."""
+        for chassis in self.chassis_tasks:
+            chassis.close()
 
     def start(self):
-        self.running = True
-        self.timer.start()
+        if self.timer is None:
+            self.start_timer()
 
+    @Slot()
     def stop(self):
+        """Arrête le timer et ferme les tâches ; à appeler dans le thread du worker."""
+        self.running = False
         if self.timer:
             self.timer.stop()
             self.timer.deleteLater()
             self.timer = None
+        self.close_tasks()
         self.finished.emit()
 
-
+    @Slot()
     def start_timer(self):
+        # Timer mono-coup réarmé à chaque tick : c'est le scheduler qui fixe l'échéance
         self.timer = QTimer(self)
-        self.timer.setInterval(1000)
-        self.timer.timeout.connect(self.acquire_once)
-        self.timer.start()
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._on_tick)
         self.running = True
+        delay = self.scheduler.start()
+        if self.t0 is not None:
+            self.scheduler.t0 = self.t0
+        self.heartbeat.emit(self.scheduler.interval, "")
+        self.timer.start(round(delay * 1000))
+
+    def _on_tick(self):
+        if not self.running:
+            return
+        error = ""
+        timestamp = self.scheduler.begin_tick()
+        try:
+            self.acquire_once(timestamp)
+        except Exception as e:
+            # Une exception ne doit pas casser la chaîne des ticks : signalée au superviseur
+            error = f"{type(e).__name__}: {e}"
+            print(f"[Worker] Tick failed: {error}\n{traceback.format_exc()}")
+        if not self.running:
+            # Retiré pendant la lecture : ressources DAQmx libérées sans attendre stop()
+            self.close_tasks()
+            return
+        delay = self.scheduler.end_tick()
+        self.timing_updated.emit(self.scheduler.stats())
+        self.heartbeat.emit(self.scheduler.interval, error)
+        if self.running and self.timer:
+            self.timer.start(round(delay * 1000))
 
-    def acquire_once(self):
+    def acquire_once(self, timestamp=None):
         if not self.running:
             return
-        readings = {}
-        for device_name, dev_cfg in self.config.get("devices", {}).items():
-            if not dev_cfg.get("enabled"):
+        if timestamp is None:
+            timestamp = self._elapsed()
+        now = self.scheduler.clock()
+        # Lignes d'un châssis hors ligne laissées à NaN : trou visible et enregistré
+        values = np.full((len(self.channel_ids), 1), np.nan)
+        for chassis in self.chassis_tasks:
+            if not chassis.due(now):
+                continue
+            was_online = chassis.online
+            try:
+                values[chassis.active_rows, 0] = chassis.read()
+            except Exception as e:
+                if was_online:
+                    self._chassis_lost(chassis, e)
+                else:
+                    chassis.mark_offline(now, e)  # nouvel essai plus tard
                 continue
+            if not was_online:
+                chassis.mark_online()
+                print(f"[Worker] Chassis {chassis.chassis} back online")
+                self.device_status.emit(chassis.chassis, True, timestamp)
 
-            for ch_id, ch_cfg in dev_cfg.get("channels", {}).items():
-                if not ch_cfg.get("enabled", True):
-                    continue
-                try:
-                    with nidaqmx.Task() as task:
-                        thermocouple_type = type_map.get(
-                            ch_cfg.get("thermocouple_type", "K"),
-                            ThermocoupleType.K
-                        )
-                        task.ai_channels.add_ai_thrmcpl_chan(
-                            ch_id,
-                            thermocouple_type=thermocouple_type,
-                            units=TemperatureUnits.DEG_C,
-                            cjc_source=nidaqmx.constants.CJCSource.BUILT_IN
-                        )
-                        value = task.read()
-                        readings[ch_id] = value
-                except Exception as e:
-                    print(f"[Worker] Error on {ch_id}: {e}")
-                    readings[ch_id] = None
-
-        self.new_data.emit(readings)
+        if self.calibration:
+            # Lecture DAQ en °C : étalonnage puis unité, une transformation pour tout le bloc
+            values = self.calibration.apply(values)
+        if self.filters:
+            block = DataBlock(self.channel_ids, [timestamp], self.filters.apply(values), values,
+                              self.generation)
+        else:
+            block = DataBlock(self.channel_ids, [timestamp], values, generation=self.generation)
+        if self.virtual_plan:
+            # Canaux virtuels calculés sur les deux versions : l'enregistrement brut reste cohérent
+            block = block.with_channels(
+                self.virtual_plan.channel_ids, self.virtual_plan.evaluate(block.values),
+                None if block.raw is None else self.virtual_plan.evaluate(block.raw))
+        self.new_data.emit(block)
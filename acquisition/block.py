@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class DataBlock:
+    """Bloc d'acquisition : une matrice (canaux x échantillons) horodatée.
+
+    `channel_ids` donne l'ordre des lignes de `values` ; `timestamps` est en
+    secondes (horloge monotone) depuis le départ de l'acquisition. Quand des
+    filtres sont actifs, `raw` garde les valeurs avant filtrage (même forme).
+    `generation` numérote la config appliquée par le worker au moment de
+    l'acquisition (voir AcquisitionSupervisor.reconfigure).
+    """
+
+    __slots__ = ("channel_ids", "timestamps", "values", "raw", "generation")
+
+    def __init__(self, channel_ids, timestamps, values, raw=None, generation=0):
+        self.channel_ids = tuple(channel_ids)
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.raw = None if raw is None else np.asarray(raw, dtype=np.float64)
+        self.generation = generation
+
+    @classmethod
+    def from_readings(cls, channel_ids, timestamp, readings):
+        """Construit un bloc d'un échantillon à partir d'un dict {canal: valeur}."""
+        values = np.array(
+            [[readings.get(ch_id) if readings.get(ch_id) is not None else np.nan]
+             for ch_id in channel_ids],
+            dtype=np.float64,
+        ).reshape(len(channel_ids), 1)
+        return cls(channel_ids, [timestamp], values)
+
+    @property
+    def n_samples(self):
+        return self.timestamps.shape[0]
+
+    def with_channels(self, channel_ids, values, raw=None):
+        """Renvoie un nouveau bloc complété par des lignes supplémentaires."""
+        if not channel_ids:
+            return self
+        if self.raw is not None:
+            raw = np.vstack((self.raw, values if raw is None else raw))
+        return DataBlock(self.channel_ids + tuple(channel_ids), self.timestamps,
+                         np.vstack((self.values, values)), raw, self.generation)
+
+    def unfiltered(self):
+        """Le même bloc avec les valeurs avant filtrage (lui-même s'il n'y en a pas)."""
+        if self.raw is None:
+            return self
+        return DataBlock(self.channel_ids, self.timestamps, self.raw, generation=self.generation)
+
+    def latest(self):
+        """Dernière valeur de chaque canal, sous forme de dict."""
+        if not self.n_samples:
+            return {}
+        return dict(zip(self.channel_ids, self.values[:, -1].tolist()))
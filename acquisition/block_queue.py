@@ -0,0 +1,143 @@
+"""Files bornées entre le moteur d'acquisition et ses consommateurs.
+
+Le worker dépose chaque bloc (dans son thread) dans une file par
+consommateur. L'enregistrement a son propre thread (RecordWriter, file
+"record") et ne dépend pas de l'interface. Pour les autres files,
+l'interface est prévenue par un seul signal tant qu'elles n'ont pas été
+vidées, puis traite tout l'arriéré d'un coup. Le nombre d'évènements Qt en
+attente reste donc borné, comme la mémoire :
+
+- "process" (LOSSLESS) : séquenceur, plugins, publication. Aucune perte tant
+  que l'arriéré tient dans `max_bytes` ; au-delà (interface bloquée), les
+  blocs les plus anciens sont abandonnés et le trou est signalé (`take()`
+  renvoie l'intervalle perdu).
+- "display" (LATEST) : historique affiché. Au plus `max_samples`
+  échantillons (la profondeur de l'historique), les plus récents gagnent ;
+  un seul rafraîchissement des courbes par vidage, quel que soit l'arriéré.
+"""
+import threading
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+LOSSLESS = "lossless"
+LATEST = "latest"
+RECORD = "record"
+PROCESS = "process"
+DISPLAY = "display"
+RECORD_QUEUE_MB = 256
+DISPLAY_QUEUE_SAMPLES = 3600
+
+
+def block_nbytes(block):
+    return block.timestamps.nbytes + block.values.nbytes + (0 if block.raw is None else block.raw.nbytes)
+
+
+class BlockQueue:
+    """File de blocs bornée en échantillons et/ou en octets ; le bloc le plus récent est toujours gardé.
+
+    Pas de verrou propre : c'est le BlockPipeline qui sérialise les accès.
+    """
+
+    def __init__(self, policy, max_samples=None, max_bytes=None):
+        self.policy = policy
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self._blocks = deque()
+        self.samples = self.bytes = 0
+        self.peak_samples = self.peak_bytes = 0
+        self.received = self.dropped_samples = self.dropped_blocks = 0
+        self._lost = None           # (t_début, t_fin) abandonnés depuis le dernier take()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def _over(self):
+        return ((self.max_samples is not None and self.samples > self.max_samples)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes))
+
+    def put(self, block):
+        n, nbytes = block.n_samples, block_nbytes(block)
+        self._blocks.append((block, nbytes))
+        self.received += n
+        self.samples += n
+        self.bytes += nbytes
+        self.peak_samples = max(self.peak_samples, self.samples)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        while self._over() and len(self._blocks) > 1:
+            old, old_bytes = self._blocks.popleft()
+            self.samples -= old.n_samples
+            self.bytes -= old_bytes
+            self.dropped_samples += old.n_samples
+            self.dropped_blocks += 1
+            if old.n_samples:
+                # Toujours les plus anciens en attente : les pertes d'un vidage sont contiguës
+                t_start = old.timestamps[0] if self._lost is None else self._lost[0]
+                self._lost = (float(t_start), float(old.timestamps[-1]))
+
+    def take(self):
+        """(blocs en attente dans l'ordre, intervalle perdu ou None) ; la file est vidée."""
+        blocks = [block for block, _ in self._blocks]
+        lost = self._lost
+        self._blocks.clear()
+        self.samples = self.bytes = 0
+        self._lost = None
+        return blocks, lost
+
+    def stats(self):
+        return {"policy": self.policy, "blocks": len(self._blocks), "samples": self.samples,
+                "bytes": self.bytes, "peak_samples": self.peak_samples,
+                "peak_bytes": self.peak_bytes, "received": self.received,
+                "dropped_samples": self.dropped_samples, "dropped_blocks": self.dropped_blocks}
+
+
+class BlockPipeline(QObject):
+    """Point de passage des blocs : `put()` depuis n'importe quel thread.
+
+    `recorder` (RecordWriter, optionnel) reçoit chaque bloc dans le même
+    ordre que les files de l'interface. `ready` n'est émis qu'au passage de
+    vide à non vide : au plus une notification en attente dans la boucle Qt,
+    jamais une par bloc.
+    """
+    ready = Signal()
+
+    def __init__(self, parent=None, recorder=None):
+        super().__init__(parent)
+        self.recorder = recorder
+        self.queues = {
+            PROCESS: BlockQueue(LOSSLESS, max_bytes=RECORD_QUEUE_MB * 1024 * 1024),
+            DISPLAY: BlockQueue(LATEST, max_samples=DISPLAY_QUEUE_SAMPLES),
+        }
+        self._lock = threading.Lock()
+        self._notified = False
+
+    def configure(self, record_queue_mb=RECORD_QUEUE_MB, display_samples=DISPLAY_QUEUE_SAMPLES):
+        with self._lock:
+            self.queues[PROCESS].max_bytes = int(record_queue_mb * 1024 * 1024)
+            self.queues[DISPLAY].max_samples = int(display_samples)
+        if self.recorder is not None:
+            self.recorder.configure(record_queue_mb)
+
+    def put(self, block):
+        with self._lock:
+            if self.recorder is not None:
+                self.recorder.put(block)
+            for queue in self.queues.values():
+                queue.put(block)
+            notify = not self._notified
+            self._notified = True
+        if notify:
+            self.ready.emit()
+
+    def take(self):
+        """{consommateur: (blocs, intervalle perdu)} ; toutes les files vidées d'un coup."""
+        with self._lock:
+            self._notified = False
+            return {name: queue.take() for name, queue in self.queues.items()}
+
+    def stats(self):
+        with self._lock:
+            stats = {name: queue.stats() for name, queue in self.queues.items()}
+        if self.recorder is not None:
+            stats[RECORD] = self.recorder.stats()
+        return stats
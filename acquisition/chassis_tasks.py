@@ -0,0 +1,159 @@
+import nidaqmx
+from nidaqmx.constants import TemperatureUnits, ThermocoupleType
+import numpy as np
+
+type_map = {
+    "K": ThermocoupleType.K,
+    "J": ThermocoupleType.J,
+    "T": ThermocoupleType.T,
+    "E": ThermocoupleType.E,
+    "R": ThermocoupleType.R,
+    "S": ThermocoupleType.S,
+    "B": ThermocoupleType.B,
+    "N": ThermocoupleType.N
+}
+# Délai max d'une lecture DAQmx (le défaut du driver est de 10 s)
+READ_TIMEOUT_S = 5.0
+
+
+def chassis_of(channel_id):
+    """"cDAQ2Mod1/ai0" -> "cDAQ2" ; un périphérique hors châssis est son propre groupe."""
+    return channel_id.split("/")[0].split("Mod")[0]
+
+
+class ChassisTask:
+    """Tâche DAQmx persistante regroupant les canaux actifs d'un châssis.
+
+    Créée au premier `read()` et gardée ouverte d'un tick à l'autre. Un
+    module retiré est exclu et la tâche reconstruite sans lui : les autres
+    modules du châssis continuent. Si c'est le châssis entier qui ne répond
+    plus, la tâche est fermée, ses lignes restent à NaN et la reconstruction
+    est retentée avec un délai croissant, sans toucher aux autres châssis.
+    """
+
+    def __init__(self, chassis, channels, rows, retry_s=1.0, max_retry_s=30.0,
+                 read_timeout_s=READ_TIMEOUT_S):
+        self.chassis = chassis
+        self.channels = tuple(channels)
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.device_names = {channel.channel_id.split("/")[0] for channel in self.channels}
+        self.signature = tuple((ch.channel_id, ch.thermocouple_type) for ch in self.channels)
+        self.missing = set()   # modules retirés, exclus de la tâche
+        self.active = np.arange(len(self.channels))  # canaux de la tâche ouverte
+        self.active_rows = self.rows
+        self.task = None
+        self.online = True
+        self.error = None
+        self.next_retry = 0.0
+        self.read_timeout_s = read_timeout_s
+        self._retry_s = retry_s
+        self._backoff = retry_s
+        self._max_retry_s = max_retry_s
+
+    def open(self):
+        active = np.asarray([i for i, ch in enumerate(self.channels)
+                             if ch.channel_id.split("/")[0] not in self.missing], dtype=np.intp)
+        task = nidaqmx.Task()
+        try:
+            for channel in (self.channels[i] for i in active):
+                task.ai_channels.add_ai_thrmcpl_chan(
+                    channel.channel_id,
+                    thermocouple_type=type_map[channel.thermocouple_type],
+                    units=TemperatureUnits.DEG_C,
+                    cjc_source=nidaqmx.constants.CJCSource.BUILT_IN
+                )
+        except Exception:
+            task.close()
+            raise
+        self.task = task
+        self.active = active
+        self.active_rows = self.rows[active]
+
+    def read(self):
+        """Un échantillon par canal présent, pour les lignes `active_rows`."""
+        if self.task is None:
+            self.open()
+        if not self.active_rows.size:
+            return []
+        values = self.task.read(timeout=self.read_timeout_s)
+        return values if isinstance(values, list) else [values]
+
+    def exclude_device(self, device_name):
+        """Module retiré : la tâche sera reconstruite sans ses canaux. True si changement."""
+        if device_name not in self.device_names or device_name in self.missing:
+            return False
+        self.missing.add(device_name)
+        self.close()
+        # Châssis en attente de relance : les modules restants repartent sans attendre
+        self.retry_now()
+        return True
+
+    def include_device(self, device_name):
+        """Module revenu : reconstruction avec ses canaux au prochain tick. True si changement."""
+        if device_name not in self.missing:
+            return False
+        self.missing.discard(device_name)
+        self.close()
+        self.retry_now()
+        return True
+
+    def close(self):
+        if self.task is not None:
+            try:
+                self.task.close()
+            except Exception as e:
+                print(f"[Worker] Error closing task for {self.chassis}: {e}")
+            self.task = None
+
+    def due(self, now):
+        return self.online or now >= self.next_retry
+
+    def mark_offline(self, now, error):
+        self.close()
+        self.error = str(error)
+        if self.online:
+            self._backoff = self._retry_s
+        else:
+            self._backoff = min(self._backoff * 2, self._max_retry_s)
+        self.online = False
+        self.next_retry = now + self._backoff
+
+    def mark_online(self):
+        self.online = True
+        self.error = None
+        self._backoff = self._retry_s
+
+    def retry_now(self):
+        self.next_retry = 0.0
+
+
+def build_chassis_tasks(channels, previous=(), read_timeout_s=READ_TIMEOUT_S):
+    """Groupe les canaux (ordre des lignes de la matrice) par châssis.
+
+    Une tâche de `previous` dont les canaux n'ont pas changé est réutilisée
+    telle quelle (tâche ouverte conservée) ; les autres sont fermées.
+    """
+    groups = {}
+    for row, channel in enumerate(channels):
+        group_channels, rows = groups.setdefault(chassis_of(channel.channel_id), ([], []))
+        group_channels.append(channel)
+        rows.append(row)
+
+    reusable = {task.chassis: task for task in previous}
+    tasks = []
+    for chassis, (group_channels, rows) in groups.items():
+        task = reusable.pop(chassis, None)
+        signature = tuple((ch.channel_id, ch.thermocouple_type) for ch in group_channels)
+        if task is not None and task.signature == signature:
+            # Même tâche ; seules ses lignes dans la matrice ont pu bouger
+            task.rows = np.asarray(rows, dtype=np.intp)
+            task.active_rows = task.rows[task.active]
+            task.read_timeout_s = read_timeout_s
+        else:
+            if task is not None:
+                task.close()
+            task = ChassisTask(chassis, group_channels, rows, read_timeout_s=read_timeout_s)
+        tasks.append(task)
+    for task in reusable.values():
+        task.close()
+    return tasks
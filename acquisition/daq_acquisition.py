@@ -3,6 +3,8 @@ from nidaqmx.constants import ThermocoupleType, TemperatureUnits
 from nidaqmx.stream_readers import AnalogMultiChannelReader
 import numpy as np
 
+from core.calibration import CalibrationBank, units_of
+
 # Convertisseur texte -> DAQmx
 THERMOCOUPLE_MAP = {
     "K": ThermocoupleType.K,
@@ -16,21 +18,12 @@ THERMOCOUPLE_MAP = {
 }
 
 def read_all_temperatures(config, sample_rate=1.0):
-    """Lit la température sur tous les canaux actifs et configurés."""
-    active_channels = []
-
-    for device_name, device_cfg in config.get("devices", {}).items():
-        if not device_cfg.get("enabled", True):
-            continue
-
-        for channel_id, ch_cfg in device_cfg.get("channels", {}).items():
-            if not ch_cfg.get("enabled", True):
-                continue
-
-            thermo_type = ch_cfg.get("thermocouple_type", "K")
-            tc_enum = THERMOCOUPLE_MAP.get(thermo_type, ThermocoupleType.K)
-
-            active_channels.append((channel_id, tc_enum))
+    """Lit la température sur tous les canaux actifs et configurés (étalonnée, dans l'unité de la config)."""
+    # Canaux actifs, déjà ordonnés et validés par la config typée
+    active_channels = [
+        (channel.channel_id, THERMOCOUPLE_MAP[channel.thermocouple_type])
+        for channel in config.enabled_channels
+    ]
 
     if not active_channels:
         raise RuntimeError("Aucun canal actif configuré.")
@@ -49,4 +42,6 @@ def read_all_temperatures(config, sample_rate=1.0):
         data = np.zeros((len(active_channels), 1), dtype=np.float64)
         reader.read_many_sample(data, number_of_samples_per_channel=1)
 
+    # DAQmx lit en °C, domaine des certificats d'étalonnage ; l'unité vient ensuite
+    data = CalibrationBank(config.enabled_channels, units_of(config)).apply(data)
     return {ch_id: float(val[0]) for (ch_id, _), val in zip(active_channels, data)}
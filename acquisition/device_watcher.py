@@ -0,0 +1,55 @@
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
+import nidaqmx.system
+
+
+class DeviceWatcher(QObject):
+    """Surveille la présence des modules dans son propre thread.
+
+    NI-DAQmx n'expose pas d'évènement de branchement : la liste des
+    périphériques est relue toutes les `interval_ms`, hors du thread GUI, et
+    seul un changement émet `device_changed` (nom, en ligne). La fenêtre et
+    le worker d'acquisition réagissent alors au seul module concerné.
+    """
+    device_changed = Signal(str, bool)
+
+    def __init__(self, known_online, interval_ms=500):
+        super().__init__()
+        # {nom du module: en ligne} tel que connu de la config au démarrage
+        self.online = dict(known_online)
+        self.interval_ms = interval_ms
+        self.timer = None
+        self.enumeration_error = None   # dernière erreur signalée, None si l'énumération marche
+
+    @Slot()
+    def start(self):
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(self.interval_ms)
+        self.poll()
+
+    @Slot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer.deleteLater()
+            self.timer = None
+
+    @Slot()
+    def poll(self):
+        try:
+            present = {d.name for d in nidaqmx.system.System.local().devices}
+        except Exception as e:
+            # Erreur du driver : ne rien conclure sur les modules ; signalée une fois par changement
+            if str(e) != self.enumeration_error:
+                print(f"[Watcher] Device enumeration failed: {e}")
+                self.enumeration_error = str(e)
+            return
+        if self.enumeration_error is not None:
+            print("[Watcher] Device enumeration working again")
+            self.enumeration_error = None
+        changes = [(name, name in present) for name, was_online in self.online.items()
+                   if (name in present) != was_online]
+        changes += [(name, True) for name in present - self.online.keys()]
+        for name, now in changes:
+            self.online[name] = now
+            self.device_changed.emit(name, now)
@@ -0,0 +1,445 @@
+"""Traitements propres à un site, branchés sur les blocs d'acquisition sans toucher au worker.
+
+Section "plugins" de config.json, une entrée par plugin :
+
+    "plugins": {
+        "historian": {"path": "historian.py", "mode": "process", "queue_size": 64,
+                      "overflow": "merge", "options": {"url": "..."}},
+        "alarm_four": {"module": "site_tools.alarms", "class": "FourAlarm",
+                       "options": {"channel": "cDAQ1Mod1/ai0", "above": 850}}
+    }
+
+- "path" : fichier Python (relatif au dossier plugins/ à côté de config.json),
+  ou "module" : module importable ; "class" : classe du plugin ("Plugin" par défaut)
+- "mode" : "thread" (défaut) ou "process" (processus séparé : un plugin qui
+  plante ou monopolise le GIL n'affecte pas l'application)
+- "queue_size" : blocs en attente au plus ; "overflow" quand la file est pleine :
+  "drop_oldest" (défaut, le plus récent compte), "drop_newest", ou "merge"
+  (le bloc est concaténé au dernier en attente : rien n'est perdu tant que
+  ce bloc reste sous MERGE_MAX_SAMPLES échantillons)
+
+Un plugin dérive de BlockProcessor :
+
+    class Plugin(BlockProcessor):
+        def set_channels(self, channels):   # {id: {"name", "module", "device", "color", "units"}}
+            self.names = channels
+        def process(self, block):           # DataBlock : channel_ids, timestamps, values (, raw)
+            ...
+
+Chaque plugin a son thread (et son processus en mode "process") et sa file
+bornée : `submit()` ne fait qu'ajouter à des files, jamais d'attente. Un
+plugin lent perd ou fusionne des blocs, sans ralentir l'acquisition ni
+l'interface ; `stats()` donne par plugin le temps de traitement, le retard
+et les pertes.
+"""
+import importlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from acquisition.block import DataBlock
+from core.config_manager import CONFIG_FILE
+
+PLUGINS_DIR = os.path.join(os.path.dirname(CONFIG_FILE), "plugins")
+MODES = ("thread", "process")
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "merge")
+DEFAULT_QUEUE_SIZE = 8
+# Politique "merge" : au-delà, les échantillons les plus anciens du bloc fusionné sont perdus
+MERGE_MAX_SAMPLES = 65536
+# Chargement d'un plugin en processus (import compris) : au-delà, abandon
+PROCESS_START_TIMEOUT_S = 30.0
+STOP_TIMEOUT_S = 2.0
+
+STARTING = "starting"
+RUNNING = "running"
+FAILED = "failed"
+STOPPED = "stopped"
+
+
+class PluginError(ValueError):
+    """Entrée de plugin invalide ou plugin introuvable (chemin de la clé en tête du message)."""
+
+
+class BlockProcessor:
+    """Base des plugins. Seul `process()` est obligatoire.
+
+    Toutes les méthodes sont appelées dans le thread (ou le processus) du
+    plugin, jamais dans celui de l'acquisition ou de l'interface.
+    """
+
+    def __init__(self, options=None):
+        self.options = dict(options or {})
+
+    def start(self):
+        """Après la création, avant le premier bloc."""
+
+    def set_channels(self, channels):
+        """Métadonnées des canaux, {id: {...}} ; rappelé à chaque changement de canaux."""
+
+    def process(self, block):
+        raise NotImplementedError
+
+    def stop(self):
+        """À l'arrêt (fermeture, plugin retiré ou modifié) : vider, fermer les connexions."""
+
+
+def check_entry(name, raw):
+    """Entrée de config validée, valeurs par défaut comprises ; PluginError sinon."""
+    path = f"plugins.{name}"
+    if not isinstance(raw, dict):
+        raise PluginError(f"{path}: expected an object")
+    entry = {"enabled": True, "class": "Plugin", "mode": "thread",
+             "queue_size": DEFAULT_QUEUE_SIZE, "overflow": OVERFLOW_POLICIES[0], "options": {}}
+    entry.update(raw)
+    if ("path" in entry) == ("module" in entry):
+        raise PluginError(f"{path}: give either \"path\" (file) or \"module\" (import name)")
+    for key in ("path", "module", "class"):
+        if key in entry and (not isinstance(entry[key], str) or not entry[key]):
+            raise PluginError(f"{path}.{key}: expected a non-empty string, got {entry[key]!r}")
+    if entry["mode"] not in MODES:
+        raise PluginError(f"{path}.mode: expected one of {', '.join(MODES)}, got {entry['mode']!r}")
+    if entry["overflow"] not in OVERFLOW_POLICIES:
+        raise PluginError(f"{path}.overflow: expected one of {', '.join(OVERFLOW_POLICIES)}, "
+                          f"got {entry['overflow']!r}")
+    size = entry["queue_size"]
+    if isinstance(size, bool) or not isinstance(size, int) or size < 1:
+        raise PluginError(f"{path}.queue_size: expected a positive integer, got {size!r}")
+    if not isinstance(entry["options"], dict):
+        raise PluginError(f"{path}.options: expected an object")
+    return entry
+
+
+def load_plugin(name, entry, plugins_dir=PLUGINS_DIR):
+    """Instancie le plugin d'une entrée validée ; PluginError s'il est introuvable."""
+    if "path" in entry:
+        path = entry["path"] if os.path.isabs(entry["path"]) else os.path.join(plugins_dir, entry["path"])
+        spec = importlib.util.spec_from_file_location(f"thermotion_plugin_{name}", path)
+        if spec is None or not os.path.exists(path):
+            raise PluginError(f"plugins.{name}.path: {path} not found")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(entry["module"])
+    cls = getattr(module, entry["class"], None)
+    if cls is None:
+        raise PluginError(f"plugins.{name}.class: {entry['class']!r} not found in {module.__name__}")
+    plugin = cls(entry["options"])
+    if not callable(getattr(plugin, "process", None)):
+        raise PluginError(f"plugins.{name}: {entry['class']} has no process() method")
+    return plugin
+
+
+def _merge(a, b):
+    """Bloc `b` concaténé à `a` (mêmes canaux), tronqué à MERGE_MAX_SAMPLES ; (bloc, perdus)."""
+    raw = None
+    if a.raw is not None and b.raw is not None:
+        raw = np.hstack((a.raw, b.raw))
+    block = DataBlock(a.channel_ids, np.concatenate((a.timestamps, b.timestamps)),
+                      np.hstack((a.values, b.values)), raw)
+    excess = block.n_samples - MERGE_MAX_SAMPLES
+    if excess > 0:
+        block = DataBlock(block.channel_ids, block.timestamps[excess:], block.values[:, excess:],
+                          None if raw is None else raw[:, excess:])
+    return block, max(excess, 0)
+
+
+def _process_main(conn, name, entry, plugins_dir):
+    """Boucle du processus d'un plugin : (méthode, argument) -> (durée, erreur)."""
+    try:
+        plugin = load_plugin(name, entry, plugins_dir)
+        plugin.start()
+    except Exception as e:
+        conn.send((0.0, f"{type(e).__name__}: {e}"))
+        return
+    conn.send((0.0, None))
+    while True:
+        try:
+            method, arg = conn.recv()
+        except EOFError:
+            break
+        if method == "stop":
+            break
+        t = time.perf_counter()
+        error = None
+        try:
+            getattr(plugin, method)(arg)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        conn.send((time.perf_counter() - t, error))
+    try:
+        plugin.stop()
+    except Exception as e:
+        print(f"[Plugin {name}] stop() failed: {e}")
+
+
+class _PluginRunner:
+    """Un plugin, sa file bornée et son thread ; `offer()` n'attend jamais."""
+
+    def __init__(self, name, entry, plugins_dir):
+        self.name = name
+        self.entry = entry
+        self.signature = json.dumps(entry, sort_keys=True)
+        self.plugins_dir = plugins_dir
+        self.state = STARTING
+        self.last_error = ""
+        self.received = self.processed = self.dropped = self.errors = 0  # en échantillons / appels
+        self.total_s = self.max_s = self.last_s = 0.0
+        self.lag_s = 0.0            # attente en file du dernier bloc traité
+        self.busy_since = None
+        self._next_warning = 1      # pertes signalées à 1, 10, 100... échantillons
+        self._plugin = None
+        self._queue = deque()       # (instant de dépôt, bloc)
+        self._channels = None       # métadonnées à transmettre avant le prochain bloc
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._process = None
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name=f"plugin-{name}", daemon=True)
+        self._thread.start()
+
+    # --- Côté producteur (thread de l'interface) ---------------------------
+
+    def offer(self, block):
+        n = block.n_samples
+        with self._cond:
+            if self.state in (FAILED, STOPPED):
+                return
+            self.received += n
+            item = (time.monotonic(), block)
+            if len(self._queue) >= self.entry["queue_size"]:
+                policy = self.entry["overflow"]
+                last = self._queue[-1][1]
+                if policy == "merge" and last.channel_ids == block.channel_ids:
+                    merged, lost = _merge(last, block)
+                    self._queue[-1] = (self._queue[-1][0], merged)
+                    self._count_drop(lost)
+                    self._cond.notify()
+                    return
+                if policy == "drop_newest":
+                    self._count_drop(n)
+                    return
+                self._count_drop(self._queue.popleft()[1].n_samples)
+            self._queue.append(item)
+            self._cond.notify()
+
+    def _count_drop(self, n):
+        if not n:
+            return
+        self.dropped += n
+        if self.dropped >= self._next_warning:
+            self._next_warning = 10 * self.dropped
+            print(f"[Plugin {self.name}] too slow, {self.dropped} samples dropped "
+                  f"({self.entry['overflow']})")
+
+    def set_channels(self, channels):
+        with self._cond:
+            self._channels = channels
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._queue.clear()
+            self._cond.notify()
+
+    def join(self, timeout_s):
+        """Attend la fin du thread ; un processus bloqué est terminé de force."""
+        self._thread.join(timeout_s)
+        if self._thread.is_alive() and self._process is not None:
+            print(f"[Plugin {self.name}] not responding, terminating its process")
+            self._process.terminate()
+            self._thread.join(0.5)
+        return not self._thread.is_alive()
+
+    def stats(self):
+        with self._cond:
+            busy = time.monotonic() - self.busy_since if self.busy_since is not None else 0.0
+            calls = max(self.processed, 1)
+            return {"name": self.name, "mode": self.entry["mode"], "state": self.state,
+                    "queued": len(self._queue), "queue_size": self.entry["queue_size"],
+                    "received": self.received,
+                    "dropped": self.dropped, "errors": self.errors, "last_error": self.last_error,
+                    "calls": self.processed, "mean_ms": 1000 * self.total_s / calls,
+                    "max_ms": 1000 * self.max_s, "last_ms": 1000 * self.last_s,
+                    "lag_s": self.lag_s, "busy_s": busy}
+
+    # --- Côté plugin (son thread) -------------------------------------------
+
+    def _fail(self, error):
+        with self._cond:
+            self.state = FAILED
+            self.last_error = error
+            self._queue.clear()
+        print(f"[Plugin {self.name}] disabled: {error}")
+
+    def _run(self):
+        try:
+            call = self._start_process() if self.entry["mode"] == "process" else self._start_thread()
+        except Exception as e:
+            self._fail(f"{type(e).__name__}: {e}")
+            return
+        if call is None:
+            return
+        with self._cond:
+            if self.state == STARTING:
+                self.state = RUNNING
+        while True:
+            with self._cond:
+                while not (self._stopping or self._queue or self._channels is not None):
+                    self._cond.wait()
+                if self._stopping:
+                    break
+                self.busy_since = time.monotonic()
+                if self._channels is not None:
+                    method, arg = "set_channels", self._channels
+                    self._channels = None
+                else:
+                    queued_at, arg = self._queue.popleft()
+                    method = "process"
+                    self.lag_s = self.busy_since - queued_at
+            try:
+                elapsed, error = call(method, arg)
+            except (EOFError, OSError) as e:
+                if not self._stopping:  # sinon : processus terminé par join()
+                    self._fail(f"plugin process exited (code {self._process.exitcode}): {e}")
+                break
+            with self._cond:
+                self.busy_since = None
+                if method == "process":
+                    self.processed += 1
+                    self.total_s += elapsed
+                    self.last_s = elapsed
+                    self.max_s = max(self.max_s, elapsed)
+                if error:
+                    self.errors += 1
+                    self.last_error = error
+                    if self.errors in (1, 10, 100) or self.errors % 1000 == 0:
+                        print(f"[Plugin {self.name}] {method}() failed ({self.errors}x): {error}")
+        self._shutdown()
+
+    def _start_thread(self):
+        self._plugin = load_plugin(self.name, self.entry, self.plugins_dir)
+        self._plugin.start()
+
+        def call(method, arg):
+            t = time.perf_counter()
+            try:
+                getattr(self._plugin, method)(arg)
+            except Exception as e:
+                return time.perf_counter() - t, f"{type(e).__name__}: {e}"
+            return time.perf_counter() - t, None
+        return call
+
+    def _start_process(self):
+        # "spawn" partout : même comportement que sous Windows, pas d'état Qt hérité
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_process_main, name=f"plugin-{self.name}",
+                                        args=(child, self.name, self.entry, self.plugins_dir),
+                                        daemon=True)
+        self._process.start()
+        child.close()
+        if not self._conn.poll(PROCESS_START_TIMEOUT_S):
+            self._process.terminate()
+            raise PluginError(f"plugin process did not start within {PROCESS_START_TIMEOUT_S:g} s")
+        _, error = self._conn.recv()
+        if error:
+            self._process.join(1.0)
+            raise PluginError(error)
+
+        def call(method, arg):
+            self._conn.send((method, arg))
+            return self._conn.recv()
+        return call
+
+    def _shutdown(self):
+        if self._process is not None:
+            try:
+                self._conn.send(("stop", None))
+            except OSError:
+                pass
+            self._process.join(STOP_TIMEOUT_S)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._conn.close()
+        elif self._plugin is not None:
+            try:
+                self._plugin.stop()
+            except Exception as e:
+                print(f"[Plugin {self.name}] stop() failed: {e}")
+        with self._cond:
+            if self.state != FAILED:
+                self.state = STOPPED
+
+
+class PluginHost:
+    """Plugins de la config, alimentés bloc par bloc depuis le thread de l'interface.
+
+    `configure()` ne relance que les plugins dont l'entrée a changé ; les
+    autres gardent leur état. Un plugin retiré est arrêté sans attendre la
+    fin de son traitement en cours.
+    """
+
+    def __init__(self, plugins_dir=PLUGINS_DIR):
+        self.plugins_dir = plugins_dir
+        self.runners = {}
+        self.errors = {}          # nom -> entrée invalide
+        self._channels = None
+
+    def __bool__(self):
+        return bool(self.runners)
+
+    def configure(self, config):
+        entries = {}
+        self.errors = {}
+        for name, raw in config.section("plugins").items():
+            try:
+                entry = check_entry(name, raw)
+            except PluginError as e:
+                self.errors[name] = str(e)
+                print(f"[Plugins] {name} ignored: {e}")
+                continue
+            if entry["enabled"]:
+                entries[name] = entry
+        for name, runner in list(self.runners.items()):
+            if name not in entries or runner.signature != json.dumps(entries[name], sort_keys=True):
+                runner.stop()
+                del self.runners[name]
+        for name, entry in entries.items():
+            if name not in self.runners:
+                print(f"[Plugins] starting {name} ({entry['mode']})")
+                self.runners[name] = _PluginRunner(name, entry, self.plugins_dir)
+                if self._channels is not None:
+                    self.runners[name].set_channels(self._channels)
+
+    def set_channels(self, channels):
+        self._channels = channels
+        for runner in self.runners.values():
+            runner.set_channels(channels)
+
+    def submit(self, block):
+        for runner in self.runners.values():
+            runner.offer(block)
+
+    def stats(self):
+        return [runner.stats() for runner in self.runners.values()]
+
+    def shutdown(self, timeout_s=STOP_TIMEOUT_S):
+        """Arrête tous les plugins, en au plus `timeout_s` au total (fermeture de l'application)."""
+        for runner in self.runners.values():
+            runner.stop()
+        deadline = time.monotonic() + timeout_s
+        for runner in self.runners.values():
+            if not runner.join(max(deadline - time.monotonic(), 0.0)):
+                print(f"[Plugins] {runner.name} still busy at exit, abandoned")
+        for runner in self.runners.values():
+            s = runner.stats()
+            print(f"[Plugins] {s['name']}: {s['calls']} blocks, {s['mean_ms']:.2f} ms mean, "
+                  f"{s['max_ms']:.1f} ms max, {s['dropped']} samples dropped, {s['errors']} errors")
+        self.runners = {}
@@ -0,0 +1,244 @@
+"""Écriture du run dans son propre thread, sans dépendre de l'interface.
+
+Le BlockPipeline dépose chaque bloc ici depuis le thread d'acquisition ;
+l'interface n'y ajoute que des commandes (ouverture, fermeture, évènements,
+trous), dans la même file : elles s'intercalent entre les blocs dans l'ordre
+où elles sont émises. Le RunRecorder ouvert n'est plus modifié que par ce
+thread (l'interface ne lit que ses attributs fixes : meta, time_offset...).
+
+La file est sans perte tant que l'arriéré tient dans `max_bytes` (disque
+bloqué) ; au-delà, les blocs les plus anciens sont abandonnés, jamais les
+commandes, et un trou est écrit à leur place dans le run.
+"""
+import threading
+import time
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+from acquisition.block_queue import LOSSLESS, RECORD_QUEUE_MB, block_nbytes
+
+_BLOCK = "block"
+_LOST = "lost"
+_CALL = "call"          # ouverture / fermeture
+_RUN = "run"            # fn(recorder), ignorée sans run ouvert
+
+
+class RecordWriter(QObject):
+    """Thread d'écriture du run ; `put()` et les commandes n'attendent jamais."""
+    # Intervalle abandonné (temps des blocs) : signalé à l'interface
+    lost = Signal(float, float)
+    # Écriture impossible : (run_id, erreur), le run est fermé
+    failed = Signal(str, str)
+
+    def __init__(self, max_bytes=RECORD_QUEUE_MB * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self._items = deque()       # (_BLOCK, bloc, octets) | (_LOST, [t0, t1], 0) | (_CALL/_RUN, fn, 0)
+        self._cond = threading.Condition()
+        self.blocks = self.samples = self.bytes = 0
+        self.peak_samples = self.peak_bytes = 0
+        self.received = self.dropped_samples = self.dropped_blocks = 0
+        self._busy = False
+        self._stopping = False
+        # Propriété du thread d'écriture
+        self._recorder = None
+        self._journal = None
+        self._filtered = False
+        self._pending = None        # (recorder, journal, filtered, génération) : segment suivant
+        self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+
+    # --- Côté producteurs (acquisition, interface) --------------------------
+
+    def configure(self, record_queue_mb=RECORD_QUEUE_MB):
+        with self._cond:
+            self.max_bytes = int(record_queue_mb * 1024 * 1024)
+
+    def put(self, block):
+        n, nbytes = block.n_samples, block_nbytes(block)
+        with self._cond:
+            if self._stopping:
+                return
+            self._items.append((_BLOCK, block, nbytes))
+            self.received += n
+            self.blocks += 1
+            self.samples += n
+            self.bytes += nbytes
+            self.peak_samples = max(self.peak_samples, self.samples)
+            self.peak_bytes = max(self.peak_bytes, self.bytes)
+            self._trim()
+            self._cond.notify()
+
+    def _trim(self):
+        """Abandonne les blocs les plus anciens (jamais le dernier) ; un trou prend leur place."""
+        i = 0
+        while self.bytes > self.max_bytes and i < len(self._items) - 1:
+            kind, block, nbytes = self._items[i]
+            if kind != _BLOCK:
+                i += 1
+                continue
+            del self._items[i]
+            self.blocks -= 1
+            self.samples -= block.n_samples
+            self.bytes -= nbytes
+            self.dropped_samples += block.n_samples
+            self.dropped_blocks += 1
+            if not block.n_samples:
+                continue
+            if i and self._items[i - 1][0] == _LOST:
+                self._items[i - 1][1][1] = float(block.timestamps[-1])
+            else:
+                self._items.insert(i, (_LOST, [float(block.timestamps[0]),
+                                               float(block.timestamps[-1])], 0))
+                i += 1
+
+    def _submit(self, kind, fn):
+        with self._cond:
+            if self._stopping:
+                return
+            self._items.append((kind, fn, 0))
+            self._cond.notify()
+
+    def open(self, recorder, journal, filtered, generation=None):
+        """Les blocs déposés après cet appel sont écrits dans `recorder`.
+
+        Avec `generation`, le run ouvert garde les blocs des configs
+        précédentes : il est fermé, et `recorder` ouvert, au premier bloc
+        acquis avec cette config (DataBlock.generation).
+        """
+        self._submit(_CALL, lambda: self._open(recorder, journal, filtered, generation))
+
+    def close(self):
+        """Ferme le run (et le segment suivant en attente) après les blocs déjà en file."""
+        self._submit(_CALL, self._close)
+
+    def log_event(self, event):
+        self._submit(_RUN, lambda recorder: recorder.log_event(event))
+
+    def mark_gap(self, t_start, t_end, reason):
+        self._submit(_RUN, lambda recorder: recorder.mark_gap(t_start, t_end, reason))
+
+    def log_gap_to_end(self, event):
+        """Trou encore ouvert à la fermeture : il court jusqu'au dernier échantillon écrit."""
+        self._submit(_RUN, lambda recorder: recorder.log_event(dict(event, t_end=recorder.last_time)))
+
+    def flush(self, timeout_s):
+        """Attend que la file soit écrite ; False si le délai est dépassé."""
+        deadline = time.monotonic() + timeout_s
+        with self._cond:
+            while self._items or self._busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def shutdown(self, timeout_s=5.0):
+        """Écrit ce qui reste en file, ferme le run ouvert et arrête le thread."""
+        self.close()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout_s)
+        if self._thread.is_alive():
+            print("[ERROR] Record writer did not finish in time, last blocks not written")
+            return False
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {"policy": LOSSLESS, "blocks": self.blocks, "samples": self.samples,
+                    "bytes": self.bytes, "peak_samples": self.peak_samples,
+                    "peak_bytes": self.peak_bytes, "received": self.received,
+                    "dropped_samples": self.dropped_samples, "dropped_blocks": self.dropped_blocks}
+
+    # --- Côté écriture (son thread) -----------------------------------------
+
+    def _open(self, recorder, journal, filtered, generation):
+        if self._pending is not None:
+            # Segment remplacé avant d'avoir reçu un bloc : fermé vide
+            self._close_run(*self._pending[:2])
+            self._pending = None
+        if generation is not None:
+            self._pending = (recorder, journal, filtered, generation)
+            return
+        self._close_run(self._recorder, self._journal)
+        self._recorder, self._journal, self._filtered = recorder, journal, filtered
+
+    def _switch(self, block):
+        """Premier bloc de la config du segment en attente : passage au run suivant."""
+        if self._pending is None or block.generation < self._pending[3]:
+            return
+        self._close_run(self._recorder, self._journal)
+        self._recorder, self._journal, self._filtered = self._pending[:3]
+        self._pending = None
+
+    def _close(self):
+        runs = [(self._recorder, self._journal)]
+        if self._pending is not None:
+            runs.append(self._pending[:2])
+        self._recorder = self._journal = self._pending = None
+        for recorder, journal in runs:
+            self._close_run(recorder, journal)
+
+    @staticmethod
+    def _close_run(recorder, journal):
+        if recorder is None:
+            return
+        try:
+            journal.stop_run(recorder.meta["run_id"], recorder.position)
+            recorder.close()
+        except OSError as e:
+            print(f"[ERROR] Failed to close recording: {e}")
+
+    def _write(self, block):
+        position = self._recorder.write_block(block if self._filtered else block.unfiltered())
+        if self._journal.checkpoint(self._recorder.meta["run_id"], position):
+            self._recorder.sync()
+
+    def _lost(self, t_start, t_end):
+        print(f"[WARN] Recording too slow, data lost from t={t_start:.3f} s to t={t_end:.3f} s")
+        self.lost.emit(t_start, t_end)
+        if self._recorder is not None:
+            offset = self._recorder.time_offset
+            self._recorder.mark_gap(t_start + offset, t_end + offset, "recording backlog overflow")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not (self._items or self._stopping):
+                    self._cond.wait()
+                if not self._items:
+                    break
+                kind, item, nbytes = self._items.popleft()
+                if kind == _BLOCK:
+                    self.blocks -= 1
+                    self.samples -= item.n_samples
+                    self.bytes -= nbytes
+                self._busy = True
+            try:
+                if kind == _BLOCK:
+                    self._switch(item)
+                if kind == _CALL:
+                    item()
+                elif kind == _LOST:
+                    self._lost(*item)
+                elif self._recorder is None:
+                    pass            # pas de run ouvert : bloc ou évènement non enregistré
+                elif kind == _BLOCK:
+                    self._write(item)
+                else:
+                    item(self._recorder)
+            except OSError as e:
+                # Disque plein, dossier retiré... : le run est fermé plutôt que corrompu
+                run_ids = [recorder.meta["run_id"] for recorder in
+                           (self._recorder, self._pending and self._pending[0]) if recorder]
+                self._close()
+                for run_id in run_ids:
+                    print(f"[ERROR] Recording of run {run_id} stopped: {e}")
+                    self.failed.emit(run_id, str(e))
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
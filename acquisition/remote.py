@@ -0,0 +1,657 @@
+"""Plusieurs postes d'acquisition dans une seule fenêtre.
+
+Chaque poste (station) publie ses blocs par TCP (StationServer, section
+"remote" de config.json : "serve": true, "port", "station_name"). Un poste
+visualiseur ("remote": {"stations": [{"name", "host", "port"}, ...]}) s'y
+abonne (RemoteStation) et fusionne leurs canaux sur sa propre horloge
+(StationMerger) : ses blocs ont la même forme que ceux du worker local.
+
+Les abonnés de même cadence et même lot partagent un flux côté station :
+décimation et codage d'une trame sont faits une fois par flux, pas par
+abonné. Un abonné trop lent perd des lots au lieu de faire grossir la
+mémoire de la station.
+
+Pour essayer sans matériel, des processus locaux jouent les stations :
+
+    python -m acquisition.remote station --name bench2 --port 5731 --channels 32
+    python -m acquisition.remote watch localhost:5731
+"""
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtNetwork import QAbstractSocket, QHostAddress, QTcpServer, QTcpSocket
+
+from acquisition.block import DataBlock
+from core.config_model import ChannelConfig, DeviceConfig, ThermotionConfig
+from core.stream_protocol import (CHANNELS, DATA, HELLO, STATUS, FrameReader, ProtocolError,
+                                  data_frame, decode_data, decode_json, json_frame)
+
+DEFAULT_PORT = 5730
+BATCH_MS = 250
+# Octets en attente d'envoi au-delà desquels les lots d'un abonné sont abandonnés
+MAX_PENDING_BYTES = 4 * 1024 * 1024
+RECONNECT_S = 2.0
+# Retard de restitution : laisse aux lots le temps d'arriver de toutes les stations
+PLAYOUT_DELAY_S = 1.0
+STALE_S = 5.0
+# Fenêtre glissante de l'estimation du décalage d'horloge entre postes
+OFFSET_WINDOW_S = 30.0
+STATION_SEP = ":"
+
+
+def remote_id(station, channel_id):
+    """Identifiant d'un canal distant dans le visualiseur : "station:cDAQ1Mod1/ai0"."""
+    return f"{station}{STATION_SEP}{channel_id}"
+
+
+# --- Côté station -------------------------------------------------------------
+
+class _Feed:
+    """Abonnés d'une même cadence : décimation et lot communs, une trame codée pour tous."""
+
+    def __init__(self, max_rate_hz, batch_ms, parent):
+        self.min_dt = 1.0 / max_rate_hz if max_rate_hz else 0.0
+        self.sockets = []
+        self.last_bucket = None
+        self.t_parts, self.v_parts = [], []
+        self.dropped = 0
+        self.timer = QTimer(parent)
+        self.timer.start(int(batch_ms))
+
+    def add(self, timestamps, values):
+        if self.min_dt:
+            # Un échantillon au plus par intervalle de 1 / max_rate_hz
+            buckets = np.floor(timestamps / self.min_dt)
+            keep = np.r_[True, buckets[1:] != buckets[:-1]]
+            if self.last_bucket is not None and buckets[0] < self.last_bucket:
+                # Temps revenu en arrière : acquisition relancée, nouvelle origine des temps
+                self.last_bucket = None
+            if self.last_bucket is not None:
+                keep &= buckets > self.last_bucket
+            if not keep.any():
+                return
+            self.last_bucket = buckets[keep][-1]
+            timestamps, values = timestamps[keep], values[:, keep]
+        self.t_parts.append(timestamps)
+        self.v_parts.append(values)
+
+    def reset(self):
+        self.t_parts, self.v_parts = [], []
+        self.last_bucket = None
+
+    def take(self):
+        if not self.t_parts:
+            return None
+        t, v = np.concatenate(self.t_parts), np.concatenate(self.v_parts, axis=1)
+        self.t_parts, self.v_parts = [], []
+        return t, v
+
+
+class StationServer(QObject):
+    """Publie les blocs du poste à ses abonnés ; vit dans le thread GUI."""
+    subscribers_changed = Signal(int)
+
+    def __init__(self, station_name, port=DEFAULT_PORT, parent=None):
+        super().__init__(parent)
+        self.station_name = station_name
+        self.port = port
+        self.generation = 0
+        self.channel_ids = ()
+        self.metadata = {}        # canal -> {"name", "module", "device", "color"}
+        self._channels_frame = None
+        self._feeds = {}          # (max_rate_hz, batch_ms) -> _Feed
+        self._readers = {}        # socket -> FrameReader (jusqu'au HELLO)
+        self._server = QTcpServer(self)
+        self._server.newConnection.connect(self._on_new_connection)
+
+    def start(self):
+        if not self._server.listen(QHostAddress.Any, self.port):
+            print(f"[Station] Cannot listen on port {self.port}: {self._server.errorString()}")
+            return False
+        self.port = self._server.serverPort()
+        print(f"[Station] {self.station_name} serving on port {self.port}")
+        return True
+
+    def stop(self):
+        self._server.close()
+        sockets = set(self._readers)
+        for feed in self._feeds.values():
+            feed.timer.stop()
+            feed.timer.deleteLater()
+            sockets.update(feed.sockets)
+        self._feeds.clear()
+        self._readers.clear()
+        for socket in sockets:
+            # Détachés avant destruction : _on_disconnected ne doit pas viser un socket détruit
+            socket.readyRead.disconnect()
+            socket.disconnected.disconnect()
+            socket.abort()
+            socket.deleteLater()
+
+    @property
+    def n_subscribers(self):
+        return sum(len(feed.sockets) for feed in self._feeds.values())
+
+    # --- Canaux et données ---------------------------------------------------
+
+    def set_metadata(self, metadata):
+        """Noms, modules et couleurs des canaux ; renvoyés aux abonnés s'ils changent."""
+        if metadata != self.metadata:
+            self.metadata = dict(metadata)
+            self._new_generation(self.channel_ids)
+
+    def _new_generation(self, channel_ids):
+        self.generation += 1
+        self.channel_ids = tuple(channel_ids)
+        channels = [dict({"id": ch_id, "name": ch_id, "module": "", "device": "",
+                          "color": "#ffffff"}, **self.metadata.get(ch_id, {}))
+                    for ch_id in self.channel_ids]
+        self._channels_frame = json_frame(CHANNELS, {
+            "station": self.station_name, "generation": self.generation, "channels": channels})
+        for feed in self._feeds.values():
+            feed.reset()
+            for socket in feed.sockets:
+                socket.write(self._channels_frame)
+
+    def publish(self, block):
+        if block.channel_ids != self.channel_ids:
+            self._new_generation(block.channel_ids)
+        for feed in self._feeds.values():
+            feed.add(block.timestamps, block.values)
+
+    def publish_status(self, source, online, t):
+        message = json_frame(STATUS, {"source": source, "online": online, "t": t})
+        for feed in self._feeds.values():
+            for socket in feed.sockets:
+                socket.write(message)
+
+    def _flush(self, feed):
+        batch = feed.take()
+        if batch is None or not feed.sockets:
+            return
+        message = data_frame(self.generation, *batch)
+        for socket in feed.sockets:
+            if socket.bytesToWrite() > MAX_PENDING_BYTES:
+                feed.dropped += 1
+                if feed.dropped in (1, 10, 100) or feed.dropped % 1000 == 0:
+                    print(f"[Station] Slow subscriber {socket.peerAddress().toString()}, "
+                          f"{feed.dropped} batches dropped")
+                continue
+            socket.write(message)
+
+    # --- Connexions ------------------------------------------------------------
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            socket.setSocketOption(QAbstractSocket.LowDelayOption, 1)
+            self._readers[socket] = FrameReader()
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+
+    def _on_ready_read(self, socket):
+        reader = self._readers.get(socket)
+        data = bytes(socket.readAll())
+        if reader is None:
+            return  # abonné déjà inscrit : rien d'autre n'est attendu de lui
+        try:
+            frames = reader.feed(data)
+        except ProtocolError as e:
+            print(f"[Station] Closing {socket.peerAddress().toString()}: {e}")
+            socket.abort()
+            return
+        for kind, payload in frames:
+            if kind != HELLO:
+                continue
+            try:
+                hello = decode_json(payload)
+                max_rate = float(hello.get("max_rate_hz") or 0.0)
+                batch_ms = max(int(hello.get("batch_ms") or BATCH_MS), 10)
+            except (ProtocolError, TypeError, ValueError) as e:
+                print(f"[Station] Bad HELLO from {socket.peerAddress().toString()}: {e}")
+                socket.abort()
+                return
+            self._subscribe(socket, max_rate, batch_ms, hello.get("name", "?"))
+            return
+
+    def _subscribe(self, socket, max_rate, batch_ms, name):
+        del self._readers[socket]
+        key = (max_rate, batch_ms)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed(max_rate, batch_ms, self)
+            feed.timer.timeout.connect(lambda f=feed: self._flush(f))
+        feed.sockets.append(socket)
+        if self._channels_frame is not None:
+            socket.write(self._channels_frame)
+        print(f"[Station] {name} subscribed from {socket.peerAddress().toString()} "
+              f"({max_rate:g} Hz max, {batch_ms} ms batches)")
+        self.subscribers_changed.emit(self.n_subscribers)
+
+    def _on_disconnected(self, socket):
+        self._readers.pop(socket, None)
+        for key, feed in list(self._feeds.items()):
+            if socket in feed.sockets:
+                feed.sockets.remove(socket)
+                if not feed.sockets:
+                    feed.timer.stop()
+                    feed.timer.deleteLater()
+                    del self._feeds[key]
+        socket.deleteLater()
+        self.subscribers_changed.emit(self.n_subscribers)
+
+
+# --- Côté visualiseur -----------------------------------------------------------
+
+class RemoteStation(QObject):
+    """Abonnement à une station : connexion, reconnexion, décodage des trames."""
+    channels_changed = Signal(str)                    # station
+    data_received = Signal(str, object, object)       # station, instants, valeurs (k x n)
+    status_received = Signal(str, str, bool, float)   # station, source, en ligne, instant
+    connection_changed = Signal(str, bool, str)       # station, connectée, détail
+
+    def __init__(self, name, host, port=DEFAULT_PORT, max_rate_hz=0.0, batch_ms=BATCH_MS,
+                 client_name="viewer", parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.host = host
+        self.port = port
+        self.max_rate_hz = max_rate_hz
+        self.batch_ms = batch_ms
+        self.client_name = client_name
+        self.connected = False
+        self.channels = []        # [{"id", "name", "module", "device", "color"}]
+        self.generation = None
+        self._reader = FrameReader()
+        self._active = False
+        self._socket = QTcpSocket(self)
+        self._socket.connected.connect(self._on_connected)
+        self._socket.disconnected.connect(self._on_disconnected)
+        self._socket.errorOccurred.connect(self._on_error)
+        self._socket.readyRead.connect(self._on_ready_read)
+        self._retry = QTimer(self)
+        self._retry.setSingleShot(True)
+        self._retry.timeout.connect(self._connect)
+
+    def start(self):
+        self._active = True
+        self._connect()
+
+    def stop(self):
+        self._active = False
+        self._retry.stop()
+        self._socket.abort()
+
+    def _connect(self):
+        if self._active and self._socket.state() == QAbstractSocket.UnconnectedState:
+            self._reader = FrameReader()
+            self._socket.connectToHost(self.host, self.port)
+
+    def _on_connected(self):
+        self._socket.setSocketOption(QAbstractSocket.LowDelayOption, 1)
+        self._socket.write(json_frame(HELLO, {"name": self.client_name,
+                                              "max_rate_hz": self.max_rate_hz,
+                                              "batch_ms": self.batch_ms}))
+        self.connected = True
+        self.connection_changed.emit(self.name, True, f"{self.host}:{self.port}")
+
+    def _lost(self, detail):
+        if self.connected:
+            self.connected = False
+            self.connection_changed.emit(self.name, False, detail)
+        if self._active and not self._retry.isActive():
+            self._retry.start(int(RECONNECT_S * 1000))
+
+    def _on_disconnected(self):
+        self._lost("disconnected")
+
+    def _on_error(self, error):
+        if error != QAbstractSocket.RemoteHostClosedError:
+            self._lost(self._socket.errorString())
+
+    def _on_ready_read(self):
+        try:
+            frames = self._reader.feed(bytes(self._socket.readAll()))
+        except ProtocolError as e:
+            print(f"[Remote] {self.name}: {e}, reconnecting")
+            self._socket.abort()
+            return
+        for kind, payload in frames:
+            try:
+                if kind == DATA:
+                    generation, timestamps, values = decode_data(payload)
+                    # Lot d'avant le dernier changement de canaux : l'ordre n'est plus connu
+                    if generation == self.generation and len(self.channels) == values.shape[0]:
+                        self.data_received.emit(self.name, timestamps, values)
+                elif kind == CHANNELS:
+                    message = decode_json(payload)
+                    self.generation = message["generation"]
+                    self.channels = list(message["channels"])
+                    self.channels_changed.emit(self.name)
+                elif kind == STATUS:
+                    message = decode_json(payload)
+                    self.status_received.emit(self.name, str(message["source"]),
+                                              bool(message["online"]), float(message["t"]))
+            except (ProtocolError, KeyError, TypeError) as e:
+                print(f"[Remote] {self.name}: bad frame ignored ({e})")
+
+
+class _ClockOffset:
+    """Décalage horloge station -> horloge locale, minimum glissant des (réception - émission).
+
+    Le minimum écarte la latence réseau ; il est ré-estimé par fenêtres de
+    OFFSET_WINDOW_S pour suivre la dérive entre les deux horloges.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.current = self.previous = math.inf
+        self.window_start = None
+        self.last_t = None
+
+    def update(self, now, station_t):
+        if self.last_t is not None and station_t < self.last_t - 1.0:
+            self.reset()  # acquisition relancée sur la station : nouvelle origine des temps
+        self.last_t = station_t
+        if self.window_start is None or now - self.window_start > OFFSET_WINDOW_S:
+            self.previous, self.current, self.window_start = self.current, math.inf, now
+        self.current = min(self.current, now - station_t)
+        return min(self.current, self.previous)
+
+
+class StationMerger:
+    """Fusionne les stations sur l'horloge locale : un bloc commun par tick.
+
+    Chaque station garde ses derniers échantillons, datés sur l'horloge
+    locale. Au tick, on prend pour chaque station le dernier échantillon
+    antérieur à (maintenant - `delay_s`) ; plus vieux que `stale_s`, il
+    devient NaN (station muette ou déconnectée).
+    """
+
+    def __init__(self, delay_s=PLAYOUT_DELAY_S, stale_s=STALE_S):
+        self.delay_s = delay_s
+        self.stale_s = stale_s
+        self.t0 = None
+        self.stations = {}        # nom -> état, dans l'ordre d'ajout
+        self.channel_ids = ()
+        self._rows = {}
+
+    def start(self, now):
+        self.t0 = now
+        for state in self.stations.values():
+            self._clear(state)
+            state["offset"].reset()
+
+    @staticmethod
+    def _clear(state):
+        state["t"] = np.empty(0)
+        state["v"] = np.empty((len(state["ids"]), 0))
+
+    def set_channels(self, station, channel_ids):
+        state = self.stations.setdefault(station, {"offset": _ClockOffset()})
+        state["ids"] = tuple(channel_ids)
+        self._clear(state)
+        self.channel_ids = ()
+        self._rows = {}
+        for name, s in self.stations.items():
+            self._rows[name] = slice(len(self.channel_ids), len(self.channel_ids) + len(s["ids"]))
+            self.channel_ids += s["ids"]
+
+    def to_local(self, station, station_t):
+        """Instant station -> temps du visualiseur (s depuis start), None si inconnu."""
+        state = self.stations.get(station)
+        if state is None or state["offset"].last_t is None:
+            return None
+        return station_t + min(state["offset"].current, state["offset"].previous) - self.t0
+
+    def add(self, station, timestamps, values, now):
+        state = self.stations.get(station)
+        if state is None or self.t0 is None or not len(timestamps):
+            return
+        offset = state["offset"].update(now, float(timestamps[-1]))
+        local = timestamps + offset - self.t0
+        keep_from = now - self.t0 - self.delay_s - self.stale_s
+        start = int(np.searchsorted(state["t"], keep_from))
+        if len(state["t"]) and local[0] < state["t"][-1]:
+            # Origine des temps changée (relance) : l'historique ne se raccorde plus
+            start = len(state["t"])
+        state["t"] = np.concatenate((state["t"][start:], local))
+        state["v"] = np.concatenate((state["v"][:, start:], values), axis=1)
+
+    def sample(self, now):
+        """Bloc d'un échantillon à (now - delay_s), ou None avant le premier instant positif."""
+        target = now - self.t0 - self.delay_s
+        if target < 0 or not self.channel_ids:
+            return None
+        column = np.full((len(self.channel_ids), 1), np.nan)
+        for name, state in self.stations.items():
+            i = int(np.searchsorted(state["t"], target, side="right")) - 1
+            if i >= 0 and target - state["t"][i] <= self.stale_s:
+                column[self._rows[name], 0] = state["v"][:, i]
+        return DataBlock(self.channel_ids, [target], column)
+
+
+class RemoteViewer(QObject):
+    """Poste visualiseur : abonnements, fusion et blocs au rythme local.
+
+    Remplace le superviseur d'acquisition quand config.json liste des
+    stations ("remote": {"stations": [...]}). Les canaux distants sont
+    préfixés par le nom de la station, les modules aussi ("bench2:cDAQ1Mod1").
+    """
+    new_data = Signal(object)
+    channels_changed = Signal()
+    station_status = Signal(str, bool, str)          # station, connectée, détail
+    device_status = Signal(str, bool, float)         # source préfixée, en ligne, instant
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.stations = {}
+        self.merger = StationMerger()
+        self.running = False
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    @staticmethod
+    def station_configs(config):
+        return config.section("remote").get("stations") or []
+
+    def configure(self, config):
+        """(Re)crée les abonnements d'après la config ; l'affichage suit channels_changed.
+
+        En cours de mesure, l'origine des temps est gardée : l'historique affiché
+        se poursuit.
+        """
+        was_running, t0 = self.running, self.merger.t0
+        self.stop()
+        for station in self.stations.values():
+            station.stop()
+            station.deleteLater()
+        remote_cfg = config.section("remote")
+        interval_ms = remote_cfg.get("interval_ms",
+                                     config.section("acquisition").get("interval_ms", 1000))
+        self.interval_ms = interval_ms
+        self.merger = StationMerger(remote_cfg.get("playout_delay_s", PLAYOUT_DELAY_S),
+                                    remote_cfg.get("stale_s", STALE_S))
+        self.stations = {}
+        for entry in self.station_configs(config):
+            station = RemoteStation(entry["name"], entry.get("host", "localhost"),
+                                    entry.get("port", DEFAULT_PORT),
+                                    max_rate_hz=entry.get("max_rate_hz", 1000.0 / interval_ms),
+                                    batch_ms=entry.get("batch_ms", remote_cfg.get("batch_ms", BATCH_MS)),
+                                    client_name=remote_cfg.get("station_name", "viewer"),
+                                    parent=self)
+            station.channels_changed.connect(self._on_channels)
+            station.data_received.connect(self._on_data)
+            station.status_received.connect(self._on_status)
+            station.connection_changed.connect(self._on_connection)
+            self.merger.set_channels(station.name, ())
+            self.stations[station.name] = station
+            station.start()
+        if was_running:
+            self.merger.start(t0)
+            self.running = True
+            self._timer.start(int(self.interval_ms))
+        self.channels_changed.emit()
+
+    def start(self):
+        self.merger.start(time.monotonic())
+        self.running = True
+        self._timer.start(int(self.interval_ms))
+
+    def stop(self):
+        self.running = False
+        self._timer.stop()
+
+    def shutdown(self):
+        self.stop()
+        for station in self.stations.values():
+            station.stop()
+
+    @property
+    def channel_ids(self):
+        return self.merger.channel_ids
+
+    @property
+    def ready(self):
+        """Vrai quand toutes les stations ont envoyé leur liste de canaux."""
+        return all(station.generation is not None for station in self.stations.values())
+
+    def missing_stations(self):
+        return [name for name, station in self.stations.items() if station.generation is None]
+
+    def merged_config(self):
+        """Modules et canaux des stations, sous forme de config (affichage seulement).
+
+        Les canaux virtuels d'une station (sans périphérique) sont rangés
+        sous un module "<station> · virtual".
+        """
+        devices = {}
+        for station in self.stations.values():
+            for channel in station.channels:
+                device = channel.get("device") or "virtual"
+                device_name = remote_id(station.name, device)
+                if device_name not in devices:
+                    module = channel.get("module") or device
+                    devices[device_name] = DeviceConfig(device_name, f"{station.name} · {module}",
+                                                        online=station.connected)
+                ch_id = remote_id(station.name, channel["id"])
+                devices[device_name].channels[ch_id] = ChannelConfig(
+                    ch_id, channel.get("name") or channel["id"], color=channel.get("color") or "#ffffff")
+        return ThermotionConfig(devices)
+
+    def _on_channels(self, name):
+        station = self.stations[name]
+        self.merger.set_channels(name, [remote_id(name, c["id"]) for c in station.channels])
+        print(f"[Remote] {name}: {len(station.channels)} channels")
+        self.channels_changed.emit()
+
+    def _on_data(self, name, timestamps, values):
+        self.merger.add(name, timestamps, values, time.monotonic())
+
+    def _on_status(self, name, source, online, t):
+        local = self.merger.to_local(name, t)
+        self.device_status.emit(remote_id(name, source), online,
+                                local if local is not None else self._now())
+
+    def _on_connection(self, name, connected, detail):
+        print(f"[Remote] {name} {'connected' if connected else 'lost'} ({detail})")
+        self.station_status.emit(name, connected, detail)
+        if self.running:
+            self.device_status.emit(name, connected, self._now())
+
+    def _now(self):
+        return time.monotonic() - self.merger.t0 - self.merger.delay_s if self.merger.t0 else 0.0
+
+    def _tick(self):
+        block = self.merger.sample(time.monotonic())
+        if block is not None:
+            self.new_data.emit(block)
+
+
+# --- Stations et abonnés de test, en processus séparés ----------------------------
+
+def _fake_station(args):
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication([])
+    server = StationServer(args.name, args.port)
+    if not server.start():
+        return 1
+    modules = max(1, args.channels // 16)
+    ids = [f"cDAQ9Mod{1 + i // 16}/ai{i % 16}" for i in range(args.channels)]
+    server.set_metadata({ch_id: {"name": f"TC{i}", "module": f"{args.name} M{1 + i // 16}",
+                                 "device": ch_id.split("/")[0], "color": "#e67e22"}
+                         for i, ch_id in enumerate(ids)})
+    rng = np.random.default_rng()
+    phase = rng.uniform(0, 2 * np.pi, (len(ids), 1))
+    t0 = time.monotonic()
+
+    def tick():
+        t = time.monotonic() - t0
+        values = 25 + 10 * np.sin(2 * np.pi * t / 60 + phase) + rng.normal(0, 0.1, phase.shape)
+        server.publish(DataBlock(ids, [t], values))
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(int(1000 / args.rate))
+    print(f"[Station] {len(ids)} synthetic channels on {modules} modules at {args.rate:g} Hz")
+    if args.seconds:
+        QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    return app.exec()
+
+
+def _watch(args):
+    from PySide6.QtCore import QCoreApplication
+    app = QCoreApplication([])
+    host, _, port = args.address.rpartition(":")
+    station = RemoteStation(args.address, host or "localhost", int(port or DEFAULT_PORT),
+                            max_rate_hz=args.rate, batch_ms=args.batch_ms, client_name="watch")
+    stats = {"frames": 0, "samples": 0}
+
+    def on_data(name, timestamps, values):
+        stats["frames"] += 1
+        stats["samples"] += len(timestamps)
+
+    def report():
+        print(f"[Watch] {len(station.channels)} channels, {stats['frames']} batches, "
+              f"{stats['samples']} samples")
+        stats.update(frames=0, samples=0)
+
+    station.data_received.connect(on_data)
+    station.connection_changed.connect(lambda name, ok, detail: print(
+        f"[Watch] {'connected' if ok else 'disconnected'} ({detail})"))
+    station.start()
+    timer = QTimer()
+    timer.timeout.connect(report)
+    timer.start(1000)
+    if args.seconds:
+        QTimer.singleShot(int(args.seconds * 1000), app.quit)
+    return app.exec()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m acquisition.remote",
+                                     description="Test stations and subscribers for remote viewing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    station = commands.add_parser("station", help="serve synthetic channels like a station")
+    station.add_argument("--name", default="station")
+    station.add_argument("--port", type=int, default=DEFAULT_PORT)
+    station.add_argument("--channels", type=int, default=16)
+    station.add_argument("--rate", type=float, default=10.0, help="samples per second")
+    station.add_argument("--seconds", type=float, default=0, help="stop after S seconds")
+    watch = commands.add_parser("watch", help="subscribe to a station and print throughput")
+    watch.add_argument("address", help="host:port")
+    watch.add_argument("--rate", type=float, default=0.0, help="max samples per second (0: all)")
+    watch.add_argument("--batch-ms", type=int, default=BATCH_MS)
+    watch.add_argument("--seconds", type=float, default=0, help="stop after S seconds")
+    args = parser.parse_args(argv)
+    return _fake_station(args) if args.command == "station" else _watch(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import time
+from collections import deque
+
+# Politiques appliquées quand une acquisition dépasse son intervalle
+OVERRUN_POLICIES = ("skip", "catch_up", "degrade")
+
+
+class AcquisitionScheduler:
+    """Cadence les acquisitions sur une horloge monotone.
+
+    Les échéances sont calculées sur une grille fixe (t0 + k * interval) pour
+    éviter la dérive d'un QTimer répétitif. Quand une acquisition dure plus
+    longtemps que l'intervalle, la politique choisie décide de la suite :
+
+    - "skip"     : on saute les échéances manquées et on se recale sur la grille
+    - "catch_up" : on enchaîne les échéances en retard (au plus max_catch_up)
+    - "degrade"  : on allonge l'intervalle, puis on revient à la cible quand
+                   les acquisitions redeviennent ponctuelles
+    """
+
+    def __init__(self, interval_s=1.0, policy="skip", max_catch_up=3,
+                 degrade_factor=2.0, max_interval_s=None, recover_after=10,
+                 rate_window=30, clock=time.monotonic):
+        if interval_s <= 0:
+            raise ValueError("interval_s must be > 0")
+        if policy not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy: {policy!r}")
+        self.target_interval = float(interval_s)
+        self.policy = policy
+        self.max_catch_up = int(max_catch_up)
+        self.degrade_factor = float(degrade_factor)
+        self.max_interval = float(max_interval_s or interval_s * 16)
+        self.recover_after = int(recover_after)
+        self.clock = clock
+        self._recent = deque(maxlen=max(2, int(rate_window)))
+        self.reset()
+
+    def reset(self):
+        self.interval = self.target_interval
+        self.t0 = None
+        self.next_deadline = None
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_deadlines = 0
+        self.max_lateness = 0.0
+        self.last_duration = 0.0
+        self._on_time_streak = 0
+        self._backlog = 0
+        self._recent.clear()
+
+    def start(self, now=None):
+        """Démarre la grille ; la première acquisition est immédiate."""
+        self.reset()
+        now = self.clock() if now is None else now
+        self.t0 = now
+        self.next_deadline = now
+        return 0.0
+
+    def begin_tick(self, now=None):
+        """Horodate une acquisition et mesure son retard sur l'échéance."""
+        now = self.clock() if now is None else now
+        lateness = max(0.0, now - self.next_deadline)
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.ticks += 1
+        self._recent.append(now)
+        return now - self.t0
+
+    def end_tick(self, now=None):
+        """Calcule le délai (en secondes) avant la prochaine acquisition."""
+        now = self.clock() if now is None else now
+        started = self._recent[-1] if self._recent else now
+        self.last_duration = now - started
+        overrun = self.last_duration > self.interval
+        if overrun:
+            self.overruns += 1
+            self._on_time_streak = 0
+        else:
+            self._on_time_streak += 1
+
+        self.next_deadline += self.interval
+        if self.next_deadline > now:
+            self._backlog = 0
+            self._recover()
+            return self.next_deadline - now
+
+        # Une ou plusieurs échéances sont déjà passées
+        late_ticks = int((now - self.next_deadline) // self.interval) + 1
+
+        if self.policy == "catch_up" and self._backlog < self.max_catch_up:
+            self._backlog += 1
+            return 0.0
+
+        if self.policy == "degrade" and overrun:
+            self.interval = min(self.interval * self.degrade_factor, self.max_interval)
+
+        # skip (ou rattrapage épuisé) : on abandonne les échéances manquées
+        self.missed_deadlines += late_ticks
+        self._backlog = 0
+        self.next_deadline = now + self.interval if self.policy == "degrade" \
+            else self.next_deadline + late_ticks * self.interval
+        return max(0.0, self.next_deadline - now)
+
+    def _recover(self):
+        if self.policy != "degrade" or self.interval <= self.target_interval:
+            return
+        if self._on_time_streak >= self.recover_after:
+            self.interval = max(self.interval / self.degrade_factor, self.target_interval)
+            self._on_time_streak = 0
+
+    def achieved_rate(self):
+        if len(self._recent) < 2:
+            return 0.0
+        span = self._recent[-1] - self._recent[0]
+        return (len(self._recent) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        return {
+            "target_rate": 1.0 / self.target_interval,
+            "current_rate": 1.0 / self.interval,
+            "achieved_rate": self.achieved_rate(),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_deadlines": self.missed_deadlines,
+            "max_lateness": self.max_lateness,
+            "last_duration": self.last_duration,
+            "policy": self.policy,
+        }
@@ -0,0 +1,250 @@
+import time
+
+from PySide6.QtCore import QObject, Signal, Slot, QTimer, QThread, QMetaObject, Qt
+
+from acquisition.acquisition_worker import AcquisitionWorker
+from acquisition.block_queue import BlockPipeline
+from acquisition.chassis_tasks import READ_TIMEOUT_S
+
+# États de santé du moteur d'acquisition
+HEALTH_STOPPED = "stopped"
+HEALTH_STARTING = "starting"
+HEALTH_RUNNING = "running"
+HEALTH_DEGRADED = "degraded"      # des ticks échouent, le moteur tourne encore
+HEALTH_STALLED = "stalled"        # plus de battement : redémarrage programmé
+HEALTH_RESTARTING = "restarting"
+
+# Source des évènements "hors ligne" quand c'est tout le moteur qui s'arrête
+ENGINE_SOURCE = "acquisition"
+
+
+class AcquisitionSupervisor(QObject):
+    """Possède le worker d'acquisition et son thread, et les surveille.
+
+    Vit dans le thread GUI. Le worker émet un battement à chaque tick ; sans
+    battement pendant `stall_timeout_s` (au moins trois intervalles), ou
+    après `max_errors` ticks en échec d'affilée, le moteur est relancé avec
+    un délai doublé à chaque fois (remis à zéro après `stable_after_s` sans
+    incident). L'ancien thread, peut-être bloqué dans un appel DAQmx, n'est
+    jamais attendu : il est abandonné et libéré quand il rend la main.
+    L'arrêt attend au plus `stop_timeout_s`.
+
+    Les blocs du worker vont directement, depuis son thread, dans le
+    `pipeline` (files bornées lues par l'interface) : pas de file Qt qui
+    grossit si l'interface prend du retard. Les autres signaux du worker
+    courant sont relayés tels quels ; la nouvelle config et l'état des
+    modules sont transmis à chaque nouveau worker.
+    """
+    timing_updated = Signal(dict)
+    device_status = Signal(str, bool, float)
+    health_changed = Signal(str, str)   # état, détail
+    _reconfigure = Signal(object, int)
+    _device_online = Signal(str, bool)
+
+    def __init__(self, parent=None, poll_ms=500, backoff_s=1.0, max_backoff_s=60.0,
+                 max_errors=5, stable_after_s=60.0, pipeline=None):
+        super().__init__(parent)
+        self.pipeline = pipeline if pipeline is not None else BlockPipeline(self)
+        self.config = None
+        self.generation = 0        # numéro de self.config, porté par les blocs des workers
+        self.worker = None
+        self.thread = None
+        self.state = HEALTH_STOPPED
+        self.detail = ""
+        self.restarts = 0
+        self.t0 = None
+        self.last_beat = None
+        self.last_ok = None        # dernier tick réussi (début d'un éventuel trou)
+        self.interval_s = 1.0
+        self.stall_timeout_s = 15.0
+        self.stop_timeout_s = 3.0
+        self.errors = 0
+        self.healthy_since = None
+        self.engine_down = False   # trou ouvert depuis un redémarrage
+        self.device_online = {}    # module -> en ligne, rejoué sur chaque nouveau worker
+        self._retiring = []     # (thread, worker) arrêtés mais pas encore terminés
+        self._backoff_s = backoff_s
+        self._backoff = backoff_s
+        self._max_backoff_s = max_backoff_s
+        self._max_errors = max_errors
+        self._stable_after_s = stable_after_s
+        self._restart_timer = QTimer(self)
+        self._restart_timer.setSingleShot(True)
+        self._restart_timer.timeout.connect(self._spawn)
+        self._watchdog = QTimer(self)
+        self._watchdog.timeout.connect(self._check)
+        self._poll_ms = poll_ms
+
+    @property
+    def running(self):
+        return self.state != HEALTH_STOPPED
+
+    def elapsed(self, now=None):
+        return (now or time.monotonic()) - self.t0 if self.t0 is not None else 0.0
+
+    def _set_state(self, state, detail=""):
+        if (state, detail) == (self.state, self.detail):
+            return
+        self.state, self.detail = state, detail
+        print(f"[Supervisor] {state}{': ' + detail if detail else ''}")
+        self.health_changed.emit(state, detail)
+
+    def _read_config(self, config):
+        acq_cfg = config.section("acquisition")
+        read_timeout = acq_cfg.get("read_timeout_s", READ_TIMEOUT_S)
+        # Une lecture peut légitimement durer jusqu'à son timeout : on laisse de la marge
+        self.stall_timeout_s = acq_cfg.get("stall_timeout_s", 3 * read_timeout)
+        self.stop_timeout_s = acq_cfg.get("stop_timeout_s", 3.0)
+
+    # --- Cycle de vie ----------------------------------------------------------
+
+    def start(self, config):
+        if self.running:
+            self.stop()
+        self.config = config
+        self._read_config(config)
+        self.t0 = self.last_ok = time.monotonic()
+        self.restarts = 0
+        self._backoff = self._backoff_s
+        self.engine_down = False
+        self._set_state(HEALTH_STARTING)
+        self._spawn()
+        self._watchdog.start(self._poll_ms)
+
+    def stop(self):
+        """Arrête le moteur en au plus `stop_timeout_s` ; False si le thread a dû être abandonné."""
+        self._watchdog.stop()
+        self._restart_timer.stop()
+        clean = self._retire(wait_s=self.stop_timeout_s)
+        self._set_state(HEALTH_STOPPED)
+        return clean
+
+    def shutdown(self):
+        """Arrêt à la fermeture : les threads encore bloqués sont terminés de force."""
+        self.stop()
+        deadline = time.monotonic() + self.stop_timeout_s
+        for thread, _ in list(self._retiring):
+            if not thread.wait(max(int((deadline - time.monotonic()) * 1000), 0)):
+                # Dernier recours, le processus se termine de toute façon
+                print("[Supervisor] Acquisition thread still blocked at exit, terminating it")
+                thread.terminate()
+                thread.wait(500)
+        self._retiring.clear()
+
+    def _spawn(self):
+        worker = AcquisitionWorker(self.config, t0=self.t0, generation=self.generation)
+        thread = QThread()
+        worker.moveToThread(thread)
+        worker.new_data.connect(self.pipeline.put, Qt.DirectConnection)
+        worker.timing_updated.connect(self.timing_updated)
+        worker.device_status.connect(self.device_status)
+        worker.heartbeat.connect(self._on_heartbeat)
+        self._reconfigure.connect(worker.reconfigure)
+        self._device_online.connect(worker.set_device_online)
+        # Direct : quit() est sûr depuis le thread du worker, et le thread GUI attend peut-être
+        worker.finished.connect(thread.quit, Qt.DirectConnection)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(self._release_finished)
+        thread.started.connect(worker.start_timer)
+        self.worker, self.thread = worker, thread
+        self.last_beat = time.monotonic()
+        self.errors = 0
+        self.healthy_since = None
+        thread.start()
+        if self.state != HEALTH_STARTING:
+            self._set_state(HEALTH_STARTING, f"restart #{self.restarts}" if self.restarts else "")
+        for device_name, online in self.device_online.items():
+            self._device_online.emit(device_name, online)
+
+    def _retire(self, wait_s=0.0):
+        """Demande l'arrêt du worker courant (dans son thread) et le détache."""
+        worker, thread = self.worker, self.thread
+        self.worker = self.thread = None
+        if worker is None:
+            return True
+        for signal, slot in ((worker.new_data, self.pipeline.put),
+                             (worker.timing_updated, self.timing_updated),
+                             (worker.device_status, self.device_status),
+                             (worker.heartbeat, self._on_heartbeat),
+                             (self._reconfigure, worker.reconfigure),
+                             (self._device_online, worker.set_device_online)):
+            signal.disconnect(slot)
+        # Lu entre deux ticks par le worker : un thread débloqué n'acquiert plus
+        worker.running = False
+        # Pas de quit() ici : un tick en cours ferait sortir la boucle avant stop(),
+        # tâches DAQmx jamais fermées. stop() -> finished -> quit termine le thread.
+        QMetaObject.invokeMethod(worker, "stop", Qt.QueuedConnection)
+        self._retiring.append((thread, worker))
+        if wait_s and thread.wait(int(wait_s * 1000)):
+            self._release_finished()
+            return True
+        if wait_s:
+            print(f"[Supervisor] Acquisition thread did not stop within {wait_s:.1f} s, abandoned")
+        return False
+
+    @Slot()
+    def _release_finished(self):
+        # Le worker s'est supprimé dans son thread (finished -> deleteLater)
+        for entry in [e for e in self._retiring if e[0].isFinished()]:
+            self._retiring.remove(entry)
+            entry[0].deleteLater()
+
+    def _restart(self, state, reason):
+        self.restarts += 1
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, self._max_backoff_s)
+        self._set_state(state, f"{reason}; restart #{self.restarts} in {delay:.0f} s")
+        if not self.engine_down:
+            # Trou dans les données depuis le dernier battement, refermé au premier tick réussi
+            self.engine_down = True
+            self.device_status.emit(ENGINE_SOURCE, False, self.elapsed(self.last_ok))
+        self._retire()
+        self._restart_timer.start(int(delay * 1000))
+
+    # --- Surveillance ----------------------------------------------------------
+
+    @Slot(float, str)
+    def _on_heartbeat(self, interval_s, error):
+        now = time.monotonic()
+        self.last_beat = now
+        self.interval_s = interval_s
+        if error:
+            self.errors += 1
+            self.healthy_since = None
+            if self.errors >= self._max_errors:
+                self._restart(HEALTH_RESTARTING, f"{self.errors} failed ticks ({error})")
+            else:
+                self._set_state(HEALTH_DEGRADED, error)
+            return
+        self.errors = 0
+        self.last_ok = now
+        if self.engine_down:
+            self.engine_down = False
+            self.device_status.emit(ENGINE_SOURCE, True, self.elapsed(now))
+        self._set_state(HEALTH_RUNNING)
+        if self.healthy_since is None:
+            self.healthy_since = now
+        elif now - self.healthy_since > self._stable_after_s:
+            self._backoff = self._backoff_s
+
+    def _check(self):
+        if self.worker is None or self.state == HEALTH_STOPPED:
+            return
+        silent = time.monotonic() - self.last_beat
+        if silent > max(self.stall_timeout_s, 3 * self.interval_s):
+            self._restart(HEALTH_STALLED, f"no heartbeat for {silent:.0f} s")
+
+    # --- Relais vers le worker courant -----------------------------------------
+
+    def reconfigure(self, config, generation=0):
+        """Nouvelle config ; les blocs acquis avec elle portent `generation`."""
+        self.config = config
+        self.generation = generation
+        self._read_config(config)
+        if self.worker is not None:
+            self._reconfigure.emit(config, generation)
+
+    def set_device_online(self, device_name, online):
+        self.device_online[device_name] = online
+        if self.worker is not None:
+            self._device_online.emit(device_name, online)
@@ -0,0 +1,114 @@
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+from core.recorder import EVENTS_FILE
+
+
+class Annotation:
+    """Repère posé pendant un essai : un instant, ou une plage si `t_end` est donné."""
+
+    __slots__ = ("t", "text", "t_end")
+
+    def __init__(self, t, text, t_end=None):
+        self.t = float(t)
+        self.text = text
+        self.t_end = None if t_end is None else float(t_end)
+
+    @property
+    def is_region(self):
+        return self.t_end is not None
+
+    def __lt__(self, other):
+        return self.t < other.t
+
+    def to_event(self, time_offset=0.0):
+        event = {"type": "annotation", "t": self.t + time_offset, "text": self.text}
+        if self.t_end is not None:
+            event["t_end"] = self.t_end + time_offset
+        return event
+
+    @classmethod
+    def from_event(cls, event, time_offset=0.0):
+        t_end = event.get("t_end")
+        return cls(event["t"] - time_offset, event.get("text", ""),
+                   None if t_end is None else t_end - time_offset)
+
+
+class AnnotationIndex:
+    """Repères triés par instant, interrogeables par plage en O(log n + k).
+
+    Les instants sont gardés dans une liste triée parallèle pour `bisect`.
+    Une plage peut commencer avant la fenêtre demandée : la recherche des
+    plages part de `t0 - longueur de la plus longue plage`.
+    """
+
+    def __init__(self, annotations=()):
+        self._times = []
+        self._items = []
+        self._region_times = []
+        self._regions = []
+        self._max_region = 0.0
+        for annotation in sorted(annotations):
+            self.add(annotation)
+
+    def __len__(self):
+        return len(self._items) + len(self._regions)
+
+    def add(self, annotation):
+        times, items = ((self._region_times, self._regions) if annotation.is_region
+                        else (self._times, self._items))
+        i = bisect_right(times, annotation.t)
+        times.insert(i, annotation.t)
+        items.insert(i, annotation)
+        if annotation.is_region:
+            self._max_region = max(self._max_region, annotation.t_end - annotation.t)
+        return annotation
+
+    def markers_in(self, t0, t1):
+        """Repères ponctuels dans [t0, t1], dans l'ordre."""
+        return self._items[bisect_left(self._times, t0):bisect_right(self._times, t1)]
+
+    def regions_in(self, t0, t1):
+        """Plages qui recouvrent [t0, t1]."""
+        start = bisect_left(self._region_times, t0 - self._max_region)
+        stop = bisect_right(self._region_times, t1)
+        return [r for r in self._regions[start:stop] if r.t_end >= t0]
+
+    def next_after(self, t):
+        """Premier repère (ponctuel ou plage) strictement après t, ou None."""
+        candidates = []
+        for times, items in ((self._times, self._items), (self._region_times, self._regions)):
+            i = bisect_right(times, t)
+            if i < len(items):
+                candidates.append(items[i])
+        return min(candidates, default=None)
+
+    def previous_before(self, t):
+        """Dernier repère strictement avant t, ou None."""
+        candidates = []
+        for times, items in ((self._times, self._items), (self._region_times, self._regions)):
+            i = bisect_left(times, t)
+            if i > 0:
+                candidates.append(items[i - 1])
+        return max(candidates, default=None)
+
+    def __iter__(self):
+        return iter(sorted(self._items + self._regions))
+
+
+def load_annotations(run_dir, time_offset=0.0):
+    """Repères enregistrés dans events.jsonl d'un run (temps du run moins `time_offset`)."""
+    path = os.path.join(run_dir, EVENTS_FILE)
+    index = AnnotationIndex()
+    if not os.path.exists(path):
+        return index
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                break  # dernière ligne tronquée
+            if event.get("type") == "annotation":
+                index.add(Annotation.from_event(event, time_offset))
+    return index
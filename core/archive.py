@@ -0,0 +1,500 @@
+"""Archive compressée d'un run, avec des niveaux pré-agrégés.
+
+    python -m core.archive runs/20240101-120000 --resolution 0.001 --drop-raw
+
+Le dossier <run_dir>/archive/ contient :
+
+- manifest.json : canaux, codec, index des tranches et des niveaux ;
+- chunk_NNNNN.bin : les données pleine cadence par tranches de lignes, une
+  colonne après l'autre (temps, puis chaque canal). Une colonne est
+  quantifiée au pas `resolution`, codée en différences successives dans le
+  plus petit entier qui les contient, octets regroupés par poids, puis
+  compressée (zstd si le module `zstandard` est installé, zlib sinon). Les
+  NaN sont gardés dans un masque de bits à part ;
+- tier_<w>s.bin / tier_<w>s.t.bin : min, moyenne et max par intervalle de
+  `w` secondes (float32, lignes [min..., moy..., max...]) et l'instant de
+  début de chaque intervalle (float64), non compressés pour être lus par
+  np.memmap. Un niveau n'est gardé que s'il réduit au moins d'un facteur
+  `MIN_TIER_REDUCTION` le nombre de lignes.
+
+Une requête sur une longue durée ne lit que le niveau adapté ; seules les
+tranches et les colonnes demandées sont décompressées en pleine cadence.
+Sans data.bin, `open_recorded_data()` sert les lignes de l'archive aux
+lecteurs écrits pour le memmap (rapport, runs de référence).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import zlib
+
+import numpy as np
+
+from core.recorder import DATA_FILE, load_meta, open_run_data
+
+try:
+    import zstandard
+except ImportError:  # zstandard est optionnel : zlib, un peu moins compact
+    zstandard = None
+
+ARCHIVE_DIR = "archive"
+MANIFEST_FILE = "manifest.json"
+ARCHIVE_VERSION = 1
+CHUNK_ROWS = 65536
+# Pas de quantification par défaut (unité des mesures) et du temps (s)
+RESOLUTION = 0.001
+TIME_RESOLUTION = 1e-6
+TIERS_S = (1, 60, 3600)
+MIN_TIER_REDUCTION = 4
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+TIER_FIELDS = ("min", "mean", "max")
+
+
+def available_codecs():
+    return ("zstd", "zlib") if zstandard is not None else ("zlib",)
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("archive compressed with zstd: install the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# --- Codage d'une colonne ---------------------------------------------------
+
+def _smallest_int(deltas):
+    peak = int(np.abs(deltas).max()) if len(deltas) else 0
+    for dtype in (np.int8, np.int16, np.int32):
+        if peak <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _shuffle(array):
+    """Octets regroupés par poids : les octets de poids fort, souvent nuls, se compressent bien."""
+    return np.ascontiguousarray(array.view(np.uint8).reshape(-1, array.itemsize).T).tobytes()
+
+
+def _unshuffle(data, dtype, n):
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(np.dtype(dtype).itemsize, n)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+def encode_column(values, resolution, codec):
+    """Colonne float64 -> (octets, description) ; erreur au plus resolution / 2."""
+    finite = np.isfinite(values)
+    quantized = np.zeros(len(values), dtype=np.int64)
+    quantized[finite] = np.round(values[finite] / resolution)
+    if not finite.all():
+        # Les trous reprennent la dernière valeur : pas de saut dans les différences
+        last = np.maximum.accumulate(np.where(finite, np.arange(len(values)), -1))
+        quantized = np.where(last >= 0, quantized[np.maximum(last, 0)], 0)
+    first = int(quantized[0]) if len(quantized) else 0
+    deltas = np.diff(quantized, prepend=first)
+    dtype = _smallest_int(deltas)
+    payload = _compress(_shuffle(deltas.astype(dtype)), codec)
+    column = {"length": len(payload), "dtype": np.dtype(dtype).name, "first": first,
+              "resolution": resolution}
+    if not finite.all():
+        mask = _compress(np.packbits(~finite).tobytes(), codec)
+        column["nan_length"] = len(mask)
+        payload += mask
+    return payload, column
+
+
+def decode_column(data, column, n, codec):
+    length = column["length"]
+    deltas = _unshuffle(_decompress(data[:length], codec), column["dtype"], n)
+    values = (column["first"] + np.cumsum(deltas, dtype=np.int64)) * column["resolution"]
+    if "nan_length" in column:
+        mask = np.unpackbits(np.frombuffer(
+            _decompress(data[length:length + column["nan_length"]], codec), dtype=np.uint8),
+            count=n).astype(bool)
+        values[mask] = np.nan
+    return values
+
+
+# --- Niveaux pré-agrégés ----------------------------------------------------
+
+class BucketReducer:
+    """Min/moyenne/max par intervalle de `width_s`, alimenté tranche par tranche.
+
+    Le dernier intervalle d'une tranche peut se poursuivre dans la suivante :
+    il reste ouvert (sommes, comptes, extrêmes) jusqu'à ce qu'un autre commence.
+    `add` et `close` renvoient les intervalles terminés : (débuts, (n, 3, n_canaux)).
+    """
+
+    def __init__(self, width_s):
+        self.width_s = width_s
+        self._open = None   # (indice, somme, compte, min, max) de l'intervalle en cours, 1 ligne
+
+    def add(self, t, values):
+        index = np.floor(t / self.width_s).astype(np.int64)
+        starts = np.flatnonzero(np.diff(index, prepend=index[0] - 1))
+        finite = np.isfinite(values)
+        total = np.add.reduceat(np.where(finite, values, 0.0), starts, axis=0)
+        count = np.add.reduceat(finite.astype(np.int64), starts, axis=0)
+        low = np.fmin.reduceat(values, starts, axis=0)
+        high = np.fmax.reduceat(values, starts, axis=0)
+        buckets = [index[starts], total, count, low, high]
+        done = []
+        if self._open is not None:
+            if self._open[0][0] == buckets[0][0]:
+                buckets[1][0] += self._open[1][0]
+                buckets[2][0] += self._open[2][0]
+                buckets[3][0] = np.fmin(buckets[3][0], self._open[3][0])
+                buckets[4][0] = np.fmax(buckets[4][0], self._open[4][0])
+            else:
+                done.append(self._open)
+        done.append(tuple(b[:-1] for b in buckets))
+        self._open = tuple(b[-1:] for b in buckets)
+        return self._finish(done)
+
+    def close(self):
+        done, self._open = [self._open] if self._open is not None else [], None
+        return self._finish(done)
+
+    def _finish(self, done):
+        if not done:
+            return np.empty(0), None
+        index, total, count, low, high = (np.concatenate(x) for x in zip(*done))
+        if not len(index):
+            return np.empty(0), None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        return index * float(self.width_s), np.stack((low, mean, high), axis=1)
+
+
+class _TierWriter:
+    """Niveau écrit au fil des tranches : instants (float64) et [min, moy, max] (float32)."""
+
+    def __init__(self, width_s, out_dir):
+        self.width_s = width_s
+        self.name = f"tier_{width_s:g}s"
+        self.rows = 0
+        self._reducer = BucketReducer(width_s)
+        self._values = open(os.path.join(out_dir, self.name + ".bin"), "wb")
+        self._times = open(os.path.join(out_dir, self.name + ".t.bin"), "wb")
+
+    def add(self, t, values):
+        self._write(*self._reducer.add(t, values))
+
+    def _write(self, times, rows):
+        if not len(times):
+            return
+        self._values.write(rows.astype(np.float32).tobytes())
+        self._times.write(times.astype(np.float64).tobytes())
+        self.rows += len(times)
+
+    def close(self):
+        self._write(*self._reducer.close())
+        self._values.close()
+        self._times.close()
+        return {"width_s": self.width_s, "rows": self.rows,
+                "file": self.name + ".bin", "times": self.name + ".t.bin"}
+
+
+# --- Écriture ----------------------------------------------------------------
+
+def archive_run(run_dir, resolution=RESOLUTION, tiers_s=TIERS_S, codec=None,
+                chunk_rows=CHUNK_ROWS, drop_raw=False):
+    """Écrit <run_dir>/archive/ ; avec `drop_raw`, data.bin est supprimé après vérification.
+
+    L'archive est construite dans un dossier temporaire puis renommée : une
+    archive présente est toujours complète. Renvoie le manifeste.
+    """
+    codec = codec or available_codecs()[0]
+    if codec not in available_codecs():
+        raise ValueError(f"codec {codec!r} not available (choose from {', '.join(available_codecs())})")
+    if resolution <= 0:
+        raise ValueError(f"resolution must be > 0, got {resolution!r}")
+    meta = load_meta(run_dir)
+    n_cols = 1 + len(meta["channel_ids"])
+    row_size = n_cols * 8
+    raw_path = os.path.join(run_dir, DATA_FILE)
+    n_rows = (os.path.getsize(raw_path) if os.path.exists(raw_path) else 0) // row_size
+    if not n_rows:
+        raise ValueError(f"{run_dir}: no recorded data to archive")
+
+    final_dir = os.path.join(run_dir, ARCHIVE_DIR)
+    out_dir = final_dir + ".tmp"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    chunks = []
+    # Fichier lu par tranches, pas mappé : sous Windows, data.bin ne pourrait pas être supprimé
+    with open(raw_path, "rb") as raw:
+        # Niveaux pas plus grossiers que l'échantillonnage écartés d'emblée
+        head = np.frombuffer(raw.read(min(n_rows, 1024) * row_size), dtype=np.float64)[::n_cols]
+        step_s = float(np.median(np.diff(head))) if len(head) > 1 else 0.0
+        tiers = [_TierWriter(w, out_dir) for w in sorted(tiers_s)
+                 if w >= MIN_TIER_REDUCTION * step_s]
+
+        raw.seek(0)
+        for a in range(0, n_rows, chunk_rows):
+            rows = min(chunk_rows, n_rows - a)
+            block = np.frombuffer(raw.read(rows * row_size), dtype=np.float64).reshape(rows, n_cols)
+            columns, payload = [], []
+            for c in range(n_cols):
+                encoded, column = encode_column(block[:, c],
+                                                TIME_RESOLUTION if c == 0 else resolution, codec)
+                if drop_raw:
+                    _check_column(block[:, c], encoded, column, codec)
+                column["offset"] = sum(map(len, payload))
+                columns.append(column)
+                payload.append(encoded)
+            name = f"chunk_{len(chunks):05d}.bin"
+            with open(os.path.join(out_dir, name), "wb") as f:
+                f.write(b"".join(payload))
+            chunks.append({"file": name, "rows": rows, "t0": float(block[0, 0]),
+                           "t1": float(block[-1, 0]), "columns": columns})
+            for tier in tiers:
+                tier.add(block[:, 0], block[:, 1:])
+
+    # Trop peu d'intervalles de moins que de lignes : le niveau n'apporte rien
+    kept = []
+    for tier in tiers:
+        entry = tier.close()
+        if entry["rows"] * MIN_TIER_REDUCTION <= n_rows:
+            kept.append(entry)
+        else:
+            for key in ("file", "times"):
+                os.remove(os.path.join(out_dir, entry[key]))
+
+    manifest = {
+        "version": ARCHIVE_VERSION,
+        "run_id": meta.get("run_id"),
+        "channel_ids": list(meta["channel_ids"]),
+        "codec": codec,
+        "rows": n_rows,
+        "t_start": chunks[0]["t0"],
+        "t_end": chunks[-1]["t1"],
+        "chunks": chunks,
+        "tiers": kept,
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(out_dir, final_dir)
+    if drop_raw:
+        os.remove(raw_path)
+    return manifest
+
+
+def _check_column(values, encoded, column, codec):
+    decoded = decode_column(encoded, column, len(values), codec)
+    same_nan = np.array_equal(np.isfinite(values), np.isfinite(decoded))
+    error = np.nanmax(np.abs(decoded - values), initial=0.0)
+    if not same_nan or error > column["resolution"] * 0.501:
+        raise ValueError(f"archive check failed (error {error:g}); raw data kept")
+
+
+# --- Lecture -----------------------------------------------------------------
+
+def has_archive(run_dir):
+    return os.path.exists(os.path.join(run_dir, ARCHIVE_DIR, MANIFEST_FILE))
+
+
+class ArchiveReader:
+    """Lecture d'une archive : tranches décompressées à la demande, niveaux mappés."""
+
+    def __init__(self, run_dir):
+        self.dir = os.path.join(run_dir, ARCHIVE_DIR)
+        with open(os.path.join(self.dir, MANIFEST_FILE), "r") as f:
+            self.manifest = json.load(f)
+        self.channel_ids = self.manifest["channel_ids"]
+        self.index = {ch_id: i + 1 for i, ch_id in enumerate(self.channel_ids)}  # colonne
+        self.codec = self.manifest["codec"]
+        self.tiers = {t["width_s"]: t for t in self.manifest["tiers"]}
+        self._chunk_t0 = np.asarray([c["t0"] for c in self.manifest["chunks"]])
+        self._chunk_t1 = np.asarray([c["t1"] for c in self.manifest["chunks"]])
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def _chunks_in(self, t0, t1):
+        first = int(np.searchsorted(self._chunk_t1, t0, side="left"))
+        last = int(np.searchsorted(self._chunk_t0, t1, side="right"))
+        return self.manifest["chunks"][first:last]
+
+    def decode_chunk(self, chunk, cols):
+        """Colonnes `cols` (0 : temps) d'une tranche du manifeste, décompressées."""
+        columns = []
+        with open(os.path.join(self.dir, chunk["file"]), "rb") as f:
+            for c in cols:
+                column = chunk["columns"][c]
+                f.seek(column["offset"])
+                size = column["length"] + column.get("nan_length", 0)
+                columns.append(decode_column(f.read(size), column, chunk["rows"], self.codec))
+        return columns
+
+    def iter_chunks(self, channel_ids, t0=-np.inf, t1=np.inf):
+        """Tranches décompressées une à une sur [t0, t1] : (t, valeurs (n, len(channel_ids)))."""
+        cols = [self.index[ch_id] for ch_id in channel_ids]
+        for chunk in self._chunks_in(t0, t1):
+            columns = self.decode_chunk(chunk, [0] + cols)
+            keep = (columns[0] >= t0) & (columns[0] <= t1)
+            values = np.column_stack(columns[1:]) if cols else np.empty((chunk["rows"], 0))
+            yield columns[0][keep], values[keep]
+
+    def read(self, channel_ids, t0=-np.inf, t1=np.inf):
+        """Pleine cadence sur [t0, t1] : (t, valeurs (n, len(channel_ids)))."""
+        parts = list(self.iter_chunks(channel_ids, t0, t1))
+        if not parts:
+            return np.empty(0), np.empty((0, len(channel_ids)))
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def tier(self, width_s):
+        """(instants, données (n, 3, n_canaux)) d'un niveau, mappés en lecture seule."""
+        tier = self.tiers[width_s]
+        n = tier["rows"]
+        if not n:
+            return np.empty(0), np.empty((0, 3, len(self.channel_ids)), dtype=np.float32)
+        times = np.memmap(os.path.join(self.dir, tier["times"]), dtype=np.float64, mode="r",
+                          shape=(n,))
+        values = np.memmap(os.path.join(self.dir, tier["file"]), dtype=np.float32, mode="r",
+                           shape=(n, 3, len(self.channel_ids)))
+        return times, values
+
+    def read_tier(self, width_s, channel_ids, t0=-np.inf, t1=np.inf):
+        """Niveau `width_s` sur [t0, t1] : (t, {champ: valeurs (n, len(channel_ids))})."""
+        cols = [self.index[ch_id] - 1 for ch_id in channel_ids]
+        times, values = self.tier(width_s)
+        i0 = int(np.searchsorted(times, t0 - width_s, side="right"))
+        i1 = int(np.searchsorted(times, t1, side="right"))
+        block = np.asarray(values[i0:i1][:, :, cols], dtype=np.float64)
+        return (np.asarray(times[i0:i1]),
+                {name: block[:, k, :] for k, name in enumerate(TIER_FIELDS)})
+
+    def choose_tier(self, t0, t1, max_points):
+        """Niveau le plus fin qui tient en `max_points` sur [t0, t1] ; None : pleine cadence."""
+        t0 = max(t0, self.manifest["t_start"])
+        t1 = min(t1, self.manifest["t_end"])
+        span = max(t1 - t0, 0.0)
+        full = len(self) * span / max(self.manifest["t_end"] - self.manifest["t_start"], 1e-9)
+        if full <= max_points:
+            return None
+        for width_s in sorted(self.tiers):
+            if span / width_s <= max_points:
+                return width_s
+        return max(self.tiers, default=None)
+
+
+class ArchivedRows:
+    """Lignes [t, canal_0, ...] d'une archive, indexées comme le memmap de data.bin.
+
+    Lignes en tranche, entier ou tableau d'entiers, puis colonnes : seules les
+    tranches touchées sont décompressées (la dernière reste en cache). La
+    colonne des temps est décodée une fois pour les recherches dichotomiques.
+    """
+    dtype = np.dtype(np.float64)
+
+    def __init__(self, reader):
+        self.reader = reader
+        self._chunks = reader.manifest["chunks"]
+        self._starts = np.cumsum([0] + [c["rows"] for c in self._chunks])
+        self.shape = (int(self._starts[-1]), len(reader.channel_ids) + 1)
+        self._cached = (None, None)
+        self._times = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def times(self):
+        if self._times is None:
+            parts = [self.reader.decode_chunk(c, [0])[0] for c in self._chunks]
+            self._times = np.concatenate(parts) if parts else np.empty(0)
+        return self._times
+
+    def _chunk(self, k):
+        if self._cached[0] != k:
+            columns = self.reader.decode_chunk(self._chunks[k], range(self.shape[1]))
+            self._cached = (k, np.column_stack(columns))
+        return self._cached[1]
+
+    def _rows(self, rows):
+        """Lignes d'indices positifs `rows` (tableau 1D), tranche par tranche."""
+        out = np.empty((len(rows), self.shape[1]))
+        which = np.searchsorted(self._starts, rows, side="right") - 1
+        for k in np.unique(which):
+            mask = which == k
+            out[mask] = self._chunk(k)[rows[mask] - self._starts[k]]
+        return out
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(cols, (int, np.integer)) and cols == 0:
+            return self.times()[rows]
+        n = len(self)
+        if isinstance(rows, slice):
+            a, b, step = rows.indices(n)
+            block = self._rows(np.arange(a, b, step))
+        else:
+            index = np.asarray(rows)
+            if index.size and (index.min() < -n or index.max() >= n):
+                raise IndexError(f"row index out of range for {n} rows")
+            index = np.where(index < 0, index + n, index)
+            block = self._rows(index.ravel()).reshape(index.shape + (self.shape[1],))
+        return block[..., cols]
+
+
+def open_recorded_data(run_dir, meta=None):
+    """Lignes du run : data.bin mappé, ou l'archive si data.bin a été supprimé (--drop-raw)."""
+    data = open_run_data(run_dir, meta)
+    if len(data) or not has_archive(run_dir):
+        return data
+    return ArchivedRows(ArchiveReader(run_dir))
+
+
+def archive_size(run_dir):
+    folder = os.path.join(run_dir, ARCHIVE_DIR)
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.archive",
+                                     description="Compress recorded runs into a tiered archive.")
+    parser.add_argument("run_dirs", nargs="+", metavar="run_dir", help="run folder (runs/<run_id>)")
+    parser.add_argument("--resolution", type=float, default=RESOLUTION,
+                        help=f"quantization step of the values (default {RESOLUTION:g})")
+    parser.add_argument("--tier", type=float, action="append", dest="tiers", metavar="S",
+                        help="aggregation tier in seconds (repeatable, default "
+                             f"{' '.join(f'{t:g}' for t in TIERS_S)})")
+    parser.add_argument("--codec", choices=("zstd", "zlib"), default=None,
+                        help="compression (default zstd when installed, else zlib)")
+    parser.add_argument("--drop-raw", action="store_true",
+                        help="delete data.bin once the archive is written and checked")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for run_dir in args.run_dirs:
+        raw_path = os.path.join(run_dir, DATA_FILE)
+        raw_size = os.path.getsize(raw_path) if os.path.exists(raw_path) else 0
+        try:
+            manifest = archive_run(run_dir, args.resolution, tuple(args.tiers or TIERS_S),
+                                   args.codec, drop_raw=args.drop_raw)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {run_dir}: {e}")
+            status = 1
+            continue
+        size = archive_size(run_dir)
+        tiers = ", ".join(f"{t['width_s']:g} s" for t in manifest["tiers"]) or "none"
+        print(f"[INFO] {run_dir}: {manifest['rows']} rows, {raw_size / 1e6:.1f} MB -> "
+              f"{size / 1e6:.1f} MB ({manifest['codec']}, x{raw_size / max(size, 1):.1f}), "
+              f"tiers: {tiers}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Étalonnage par canal et unité de température, appliqués en une transformation par bloc.
+
+Config d'un canal (clé "calibration") :
+
+    {"type": "linear", "gain": 1.002, "offset": -0.15, "certificate": "CAL-2024-117"}
+    {"type": "polynomial", "coefficients": [c0, c1, c2]}      # c0 + c1 x + c2 x²
+    {"type": "table", "points": [[lu, vrai], ...]}            # interpolation linéaire
+
+Section "acquisition" : "units" vaut "C" (défaut), "F" ou "K".
+
+Le DAQ lit toujours en °C, domaine des certificats : l'étalonnage s'applique
+en °C, puis la conversion d'unité. Unité et étalonnages linéaires ou
+polynomiaux sont fusionnés en une matrice de coefficients par ligne : une
+seule évaluation de Horner pour toutes ces lignes. Les tables passent par
+np.interp, prolongée linéairement aux deux bouts.
+"""
+import numpy as np
+
+CALIBRATION_TYPES = ("linear", "polynomial", "table")
+DEFAULT_UNITS = "C"
+# Unité -> (a, b) : valeur = a * °C + b
+UNIT_SCALES = {"C": (1.0, 0.0), "F": (1.8, 32.0), "K": (1.0, 273.15)}
+UNIT_SYMBOLS = {"C": "°C", "F": "°F", "K": "K"}
+UNIT_AXIS_LABELS = {"C": "degC", "F": "degF", "K": "K"}
+MAX_POLYNOMIAL_DEGREE = 6
+# Inversion des polynômes (réétalonnage d'un run) : Newton, précision relative visée
+NEWTON_ITERATIONS = 30
+NEWTON_TOLERANCE = 1e-9
+
+
+def units_of(config):
+    """Unité des valeurs acquises (config typée ou dict) ; l'unité par défaut si inconnue."""
+    sections = config.get("acquisition", {}) if isinstance(config, dict) else \
+        config.section("acquisition")
+    units = sections.get("units", DEFAULT_UNITS)
+    if units not in UNIT_SCALES:
+        print(f"[WARN] Unknown acquisition.units {units!r}, using {DEFAULT_UNITS}")
+        return DEFAULT_UNITS
+    return units
+
+
+def _number(spec, key, path, default=None):
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+        raise ValueError(f"{path}.{key}: expected a number, got {value!r}")
+    return float(value)
+
+
+def compile_calibration(spec, path="calibration"):
+    """(coefficients croissants, None) pour linéaire/polynôme, (None, (lu, vrai)) pour une table."""
+    kind = spec.get("type")
+    if kind == "linear":
+        gain = _number(spec, "gain", path, 1.0)
+        if gain == 0:
+            raise ValueError(f"{path}.gain: must not be zero")
+        return np.array([_number(spec, "offset", path, 0.0), gain]), None
+    if kind == "polynomial":
+        coefficients = spec.get("coefficients")
+        if not isinstance(coefficients, list) or not 2 <= len(coefficients) <= MAX_POLYNOMIAL_DEGREE + 1:
+            raise ValueError(f"{path}.coefficients: expected 2..{MAX_POLYNOMIAL_DEGREE + 1} numbers "
+                             f"[c0, c1, ...], got {coefficients!r}")
+        values = [_number({"c": c}, "c", f"{path}.coefficients[{i}]")
+                  for i, c in enumerate(coefficients)]
+        if not any(values[1:]):
+            raise ValueError(f"{path}.coefficients: constant polynomial")
+        return np.array(values), None
+    if kind == "table":
+        points = spec.get("points")
+        if (not isinstance(points, list) or len(points) < 2
+                or not all(isinstance(p, list) and len(p) == 2 for p in points)):
+            raise ValueError(f"{path}.points: expected at least two [read, true] pairs")
+        table = np.array([[_number({"v": v}, "v", f"{path}.points[{i}]") for v in p]
+                          for i, p in enumerate(points)])
+        read, true = table[:, 0], table[:, 1]
+        if not (np.diff(read) > 0).all():
+            raise ValueError(f"{path}.points: read values must be strictly increasing")
+        if not ((np.diff(true) > 0).all() or (np.diff(true) < 0).all()):
+            raise ValueError(f"{path}.points: true values must be strictly monotonic")
+        return None, (read, true)
+    raise ValueError(f"{path}.type: unknown calibration {kind!r}")
+
+
+def _interp(x, xp, fp):
+    """np.interp prolongé par les segments extrêmes (xp croissant) ; NaN conservés."""
+    y = np.interp(x, xp, fp)
+    below, above = x < xp[0], x > xp[-1]
+    if below.any():
+        y[below] = fp[0] + (x[below] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+    if above.any():
+        y[above] = fp[-1] + (x[above] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    return y
+
+
+def _horner(coefficients, x):
+    """Polynômes ligne à ligne : `coefficients` (lignes x degré+1), `x` (lignes x n)."""
+    y = np.repeat(coefficients[:, -1:], x.shape[1], axis=1)
+    for k in range(coefficients.shape[1] - 2, -1, -1):
+        y *= x
+        y += coefficients[:, k:k + 1]
+    return y
+
+
+class CalibrationBank:
+    """Étalonnages et unité appliqués à la matrice (canaux x échantillons) de chaque bloc.
+
+    Faux (rien à faire, aucun coût) quand aucun canal n'est étalonné et que
+    l'unité est le °C. Les canaux dont l'étalonnage est invalide restent en
+    lecture brute convertie ; l'erreur est dans `errors`.
+    """
+
+    def __init__(self, channels, units=DEFAULT_UNITS):
+        self.units = units
+        self.errors = {}
+        scale, shift = UNIT_SCALES[units]
+        poly_rows, poly_coefficients = [], []
+        self.tables = []  # (ligne, lu, vrai)
+        for row, channel in enumerate(channels):
+            spec = getattr(channel, "calibration", None)
+            coefficients, table = np.array([0.0, 1.0]), None
+            if spec:
+                try:
+                    coefficients, table = compile_calibration(spec)
+                except ValueError as e:
+                    self.errors[channel.channel_id] = str(e)
+                    coefficients, table = np.array([0.0, 1.0]), None
+            if table is not None:
+                self.tables.append((row, table[0], table[1]))
+                continue
+            # Unité fusionnée dans le polynôme : a * p(x) + b
+            coefficients = coefficients * scale
+            coefficients[0] += shift
+            if len(coefficients) == 2 and coefficients[0] == 0.0 and coefficients[1] == 1.0:
+                continue
+            poly_rows.append(row)
+            poly_coefficients.append(coefficients)
+        self.scale, self.shift = scale, shift
+        self.poly_rows = np.asarray(poly_rows, dtype=np.intp)
+        degree = max((len(c) for c in poly_coefficients), default=1)
+        self.coefficients = np.zeros((len(poly_rows), degree))
+        for i, c in enumerate(poly_coefficients):
+            self.coefficients[i, :len(c)] = c
+
+    def __bool__(self):
+        return bool(len(self.poly_rows) or self.tables)
+
+    def apply(self, values):
+        """Valeurs étalonnées et converties ; `values` (lecture brute en °C) n'est pas modifié."""
+        out = values.copy()
+        if len(self.poly_rows):
+            out[self.poly_rows] = _horner(self.coefficients, values[self.poly_rows])
+        for row, read, true in self.tables:
+            out[row] = self.scale * _interp(values[row], read, true) + self.shift
+        return out
+
+    def invert(self, values):
+        """Lecture brute en °C retrouvée à partir de valeurs étalonnées (réétalonnage d'un run).
+
+        ValueError si un polynôme n'est pas inversible sur ces valeurs.
+        """
+        out = values.copy()
+        if len(self.poly_rows):
+            target = values[self.poly_rows]
+            derivative = self.coefficients[:, 1:] * np.arange(1, self.coefficients.shape[1])
+            # Départ : inverse de la seule partie affine, exact pour les étalonnages linéaires
+            slope = self.coefficients[:, 1:2]
+            x = (target - self.coefficients[:, :1]) / np.where(slope == 0, 1.0, slope)
+            for _ in range(NEWTON_ITERATIONS):
+                error = _horner(self.coefficients, x) - target
+                if not (np.abs(error) > NEWTON_TOLERANCE * (1.0 + np.abs(target))).any():
+                    break
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x = x - error / _horner(derivative, x)
+            else:
+                raise ValueError("calibration polynomial cannot be inverted over the recorded values")
+            out[self.poly_rows] = x
+        for row, read, true in self.tables:
+            celsius = (values[row] - self.shift) / self.scale
+            order = np.argsort(true)
+            out[row] = _interp(celsius, true[order], read[order])
+        return out
@@ -1,14 +1,17 @@
 import json
 import os
 
+from core.config_model import ThermotionConfig
+
 CONFIG_FILE = "config.json"
 
-def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def load_config(path=CONFIG_FILE):
+    """Charge, migre et valide la config ; ConfigError si elle est invalide."""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return ThermotionConfig.from_dict(json.load(f))
+    return ThermotionConfig()
 
-def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+def save_config(config, path=CONFIG_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config.to_dict(), f, indent=2, ensure_ascii=False)
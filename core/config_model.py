@@ -0,0 +1,333 @@
+import copy
+import re
+from dataclasses import dataclass, field
+
+from core.calibration import CALIBRATION_TYPES
+from core.filters import FILTER_TYPES
+
+SCHEMA_VERSION = 2
+
+THERMOCOUPLE_TYPES = ("K", "J", "T", "E", "R", "S", "B", "N")
+DEFAULT_THERMOCOUPLE_TYPE = "K"
+COLOR_PATTERN = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+class ConfigError(ValueError):
+    """Configuration invalide ; le message indique le chemin de la clé fautive."""
+
+
+def _check_bool(value, path):
+    if not isinstance(value, bool):
+        raise ConfigError(f"{path}: expected true/false, got {value!r}")
+    return value
+
+
+def _check_str(value, path):
+    if not isinstance(value, str):
+        raise ConfigError(f"{path}: expected a string, got {value!r}")
+    return value
+
+
+def _check_color(value, path):
+    value = _check_str(value, path).strip()
+    if not COLOR_PATTERN.match(value):
+        raise ConfigError(f"{path}: expected a #rrggbb color, got {value!r}")
+    return value
+
+
+def _check_filter(value, path):
+    """Un étage ou une liste d'étages, normalisé en liste (None : pas de filtre)."""
+    if value is None:
+        return None
+    stages = [value] if isinstance(value, dict) else value
+    if not isinstance(stages, list):
+        raise ConfigError(f"{path}: expected an object or a list of objects, got {value!r}")
+    for i, stage in enumerate(stages):
+        if not isinstance(stage, dict) or stage.get("type") not in FILTER_TYPES:
+            raise ConfigError(f"{path}[{i}]: expected an object with \"type\" in "
+                              f"{', '.join(FILTER_TYPES)}, got {stage!r}")
+    return [dict(stage) for stage in stages] or None
+
+
+def _check_calibration(value, path):
+    """Étalonnage d'un canal (détail vérifié par core.calibration) ; None : aucun."""
+    if value is None:
+        return None
+    if not isinstance(value, dict) or value.get("type") not in CALIBRATION_TYPES:
+        raise ConfigError(f"{path}: expected an object with \"type\" in "
+                          f"{', '.join(CALIBRATION_TYPES)}, got {value!r}")
+    return dict(value)
+
+
+@dataclass(slots=True)
+class ChannelConfig:
+    channel_id: str
+    display_name: str
+    color: str = "#ffffff"
+    enabled: bool = True
+    visible: bool = True
+    thermocouple_type: str = DEFAULT_THERMOCOUPLE_TYPE
+    filter: list = None   # étages appliqués dans le worker (core.filters), dans l'ordre
+    calibration: dict = None  # certificat du capteur (core.calibration), appliqué avant les filtres
+    extra: dict = field(default_factory=dict)  # clés inconnues, conservées telles quelles
+
+    FIELDS = ("color", "display_name", "enabled", "visible", "thermocouple_type")
+
+    @classmethod
+    def from_dict(cls, channel_id, raw, path=None):
+        path = path or channel_id
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{path}: expected an object")
+        channel = cls(channel_id, _check_str(raw.get("display_name", channel_id.split("/")[-1]),
+                                             f"{path}.display_name"))
+        channel.update({k: v for k, v in raw.items() if k != "display_name"}, path)
+        return channel
+
+    def update(self, values, path=None):
+        """Applique un dict de modifications (issu d'un dialogue), avec validation."""
+        path = path or self.channel_id
+        for key, value in values.items():
+            if key == "display_name":
+                self.display_name = _check_str(value, f"{path}.{key}")
+            elif key == "color":
+                self.color = _check_color(value, f"{path}.{key}")
+            elif key in ("enabled", "visible"):
+                setattr(self, key, _check_bool(value, f"{path}.{key}"))
+            elif key == "thermocouple_type":
+                if value not in THERMOCOUPLE_TYPES:
+                    raise ConfigError(f"{path}.{key}: unknown thermocouple type {value!r}")
+                self.thermocouple_type = value
+            elif key == "filter":
+                self.filter = _check_filter(value, f"{path}.{key}")
+            elif key == "calibration":
+                self.calibration = _check_calibration(value, f"{path}.{key}")
+            else:
+                self.extra[key] = value
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        if self.filter:
+            data["filter"] = copy.deepcopy(self.filter)
+        if self.calibration:
+            data["calibration"] = copy.deepcopy(self.calibration)
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class VirtualChannelConfig:
+    name: str
+    expression: str
+    display_name: str
+    color: str = "#ffffff"
+    enabled: bool = True
+    visible: bool = True
+    extra: dict = field(default_factory=dict)
+
+    FIELDS = ("expression", "display_name", "color", "enabled", "visible")
+
+    @property
+    def channel_id(self):
+        return self.name
+
+    @classmethod
+    def from_dict(cls, name, raw, path=None):
+        path = path or f"virtual_channels.{name}"
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{path}: expected an object")
+        channel = cls(name, _check_str(raw.get("expression", ""), f"{path}.expression"),
+                      _check_str(raw.get("display_name", name), f"{path}.display_name"))
+        channel.update({k: v for k, v in raw.items() if k not in ("expression", "display_name")},
+                       path)
+        return channel
+
+    def update(self, values, path=None):
+        path = path or f"virtual_channels.{self.name}"
+        for key, value in values.items():
+            if key in ("expression", "display_name"):
+                setattr(self, key, _check_str(value, f"{path}.{key}"))
+            elif key == "color":
+                self.color = _check_color(value, f"{path}.{key}")
+            elif key in ("enabled", "visible"):
+                setattr(self, key, _check_bool(value, f"{path}.{key}"))
+            elif key == "thermocouple_type":
+                continue  # sans objet pour un canal calculé
+            else:
+                self.extra[key] = value
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        data.update(self.extra)
+        return data
+
+
+@dataclass(slots=True)
+class DeviceConfig:
+    name: str
+    display_name: str
+    enabled: bool = True
+    online: bool = True
+    channels: dict = field(default_factory=dict)  # channel_id -> ChannelConfig, ordre conservé
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def chassis(self):
+        return self.name.split("Mod")[0]
+
+    @classmethod
+    def from_dict(cls, name, raw):
+        path = f"devices.{name}"
+        if not isinstance(raw, dict):
+            raise ConfigError(f"{path}: expected an object")
+        device = cls(
+            name,
+            _check_str(raw.get("display_name", name), f"{path}.display_name"),
+            _check_bool(raw.get("enabled", True), f"{path}.enabled"),
+            _check_bool(raw.get("online", True), f"{path}.online"),
+        )
+        channels = raw.get("channels", {})
+        if not isinstance(channels, dict):
+            raise ConfigError(f"{path}.channels: expected an object")
+        for channel_id, ch_raw in channels.items():
+            if not channel_id.startswith(name + "/"):
+                raise ConfigError(f"{path}.channels: {channel_id!r} does not belong to {name}")
+            device.channels[channel_id] = ChannelConfig.from_dict(
+                channel_id, ch_raw, f"{path}.channels.{channel_id}")
+        device.extra = {k: v for k, v in raw.items()
+                        if k not in ("display_name", "enabled", "online", "channels")}
+        return device
+
+    def to_dict(self):
+        data = {
+            "channels": {ch_id: ch.to_dict() for ch_id, ch in self.channels.items()},
+            "display_name": self.display_name,
+            "enabled": self.enabled,
+            "online": self.online,
+        }
+        data.update(self.extra)
+        return data
+
+
+# --- Migrations : une fonction par version, appliquées dans l'ordre ---------
+
+def _migrate_0_to_1(raw):
+    # Avant l'ajout de la clé "version" : même structure
+    raw.setdefault("devices", {})
+    return raw
+
+
+def _migrate_1_to_2(raw):
+    # Le type de thermocouple devient explicite ; l'acquisition utilisait K par défaut
+    for device in raw.get("devices", {}).values():
+        if isinstance(device, dict):
+            for channel in device.get("channels", {}).values():
+                if isinstance(channel, dict):
+                    channel.setdefault("thermocouple_type", DEFAULT_THERMOCOUPLE_TYPE)
+    return raw
+
+
+MIGRATIONS = {
+    0: _migrate_0_to_1,
+    1: _migrate_1_to_2,
+}
+
+
+def migrate(raw):
+    """Amène un dict de config brut à SCHEMA_VERSION (en place)."""
+    version = raw.get("version", 0)
+    if not isinstance(version, int) or version < 0:
+        raise ConfigError(f"version: invalid schema version {version!r}")
+    if version > SCHEMA_VERSION:
+        raise ConfigError(f"version: config schema {version} is newer than supported ({SCHEMA_VERSION})")
+    while version < SCHEMA_VERSION:
+        raw = MIGRATIONS[version](raw)
+        version += 1
+    raw["version"] = SCHEMA_VERSION
+    return raw
+
+
+class ThermotionConfig:
+    """Configuration typée, validée au chargement, avec index de recherche.
+
+    Les périphériques et canaux sont des objets à slots ; les autres sections
+    ("acquisition", "display", "recording", ...) restent des dicts accessibles
+    par `section()`. Les index (canal -> ChannelConfig, nom de module ->
+    DeviceConfig, canaux actifs dans l'ordre d'acquisition) sont recalculés
+    par `reindex()` après une modification de structure (activation, renommage).
+    """
+
+    __slots__ = ("devices", "virtual_channels", "sections",
+                 "_channels", "_device_of", "_modules", "_enabled")
+
+    def __init__(self, devices=None, virtual_channels=None, sections=None):
+        self.devices = devices or {}
+        self.virtual_channels = virtual_channels or {}
+        self.sections = sections or {}
+        self.reindex()
+
+    @classmethod
+    def from_dict(cls, raw):
+        if not isinstance(raw, dict):
+            raise ConfigError("config: expected an object")
+        raw = migrate(copy.deepcopy(raw))
+        devices_raw = raw.get("devices", {})
+        if not isinstance(devices_raw, dict):
+            raise ConfigError("devices: expected an object")
+        devices = {name: DeviceConfig.from_dict(name, dev) for name, dev in devices_raw.items()}
+        virtual_raw = raw.get("virtual_channels", {})
+        if not isinstance(virtual_raw, dict):
+            raise ConfigError("virtual_channels: expected an object")
+        virtual = {name: VirtualChannelConfig.from_dict(name, v) for name, v in virtual_raw.items()}
+        sections = {k: v for k, v in raw.items()
+                    if k not in ("version", "devices", "virtual_channels")}
+        return cls(devices, virtual, sections)
+
+    def to_dict(self):
+        data = {
+            "devices": {name: dev.to_dict() for name, dev in self.devices.items()},
+            "version": SCHEMA_VERSION,
+        }
+        if self.virtual_channels:
+            data["virtual_channels"] = {name: v.to_dict() for name, v in self.virtual_channels.items()}
+        data.update(self.sections)
+        return data
+
+    def reindex(self):
+        self._channels = {}
+        self._device_of = {}
+        self._modules = {}
+        enabled = []
+        for device in self.devices.values():
+            self._modules.setdefault(device.display_name, device)
+            for channel_id, channel in device.channels.items():
+                self._channels[channel_id] = channel
+                self._device_of[channel_id] = device
+                if device.enabled and channel.enabled:
+                    enabled.append(channel)
+        self._enabled = tuple(enabled)
+
+    # --- Recherches O(1) ---------------------------------------------------
+
+    def channel(self, channel_id):
+        """ChannelConfig ou VirtualChannelConfig, None si inconnu."""
+        channel = self._channels.get(channel_id)
+        return channel if channel is not None else self.virtual_channels.get(channel_id)
+
+    def device_of(self, channel_id):
+        return self._device_of.get(channel_id)
+
+    def device_by_module_name(self, module_name):
+        return self._modules.get(module_name)
+
+    @property
+    def enabled_channels(self):
+        """Canaux physiques actifs, dans l'ordre des lignes de la matrice d'acquisition."""
+        return self._enabled
+
+    @property
+    def enabled_channel_ids(self):
+        return tuple(channel.channel_id for channel in self._enabled)
+
+    def section(self, name):
+        """Section libre (dict) ; vide si absente. Utiliser `sections.setdefault` pour écrire."""
+        return self.sections.get(name, {})
@@ -1,3 +1,7 @@
+import re
+import threading
+import time
+
 import nidaqmx.system
 
 def detect_daq_modules():
@@ -15,3 +19,75 @@ def get_online_devices():
     except Exception as e:
         print(f"Error listing devices: {e}")
         return []
+
+
+# --- Topologie (châssis > modules > voies AI), énumérée une fois et mise en cache ---
+
+class ModuleInfo:
+    """Un module détecté : nom NI-DAQmx, châssis, type et voies AI (noms courts, ordre naturel)."""
+
+    __slots__ = ("name", "chassis", "product_type", "channels", "error")
+
+    def __init__(self, name, product_type="", channels=(), error=None):
+        self.name = name
+        self.chassis = name.split("Mod")[0]
+        self.product_type = product_type
+        self.channels = tuple(channels)
+        self.error = error
+
+    @property
+    def module_number(self):
+        return self.name.split("Mod")[1]
+
+    def channel_ids(self):
+        return [f"{self.name}/{ch}" for ch in self.channels]
+
+
+_topology_lock = threading.Lock()
+_topology = None
+_topology_time = 0.0
+
+
+def channel_sort_key(name):
+    """Ordre naturel des voies : ai2 avant ai10 (un tri de chaînes les inverse)."""
+    match = re.match(r"(.*?)(\d+)$", name)
+    return (match.group(1), int(match.group(2))) if match else (name, -1)
+
+
+def scan_topology():
+    """Énumère les modules et leurs voies AI (un seul appel à System.local()).
+
+    Les erreurs de lecture d'un module sont gardées dans `ModuleInfo.error`
+    pour ne pas perdre le reste du scan ; une erreur du système remonte.
+    """
+    system = nidaqmx.system.System.local()
+    modules = []
+    for device in system.devices:
+        if "Mod" not in device.name:
+            continue
+        try:
+            channels = sorted((c.name.split('/')[-1] for c in device.ai_physical_chans),
+                              key=channel_sort_key)
+            modules.append(ModuleInfo(device.name, getattr(device, "product_type", ""), channels))
+        except Exception as e:
+            modules.append(ModuleInfo(device.name, error=str(e)))
+    return tuple(modules)
+
+
+def get_topology(refresh=False, max_age_s=None):
+    """Topologie en cache ; rescannée si absente, trop vieille ou si `refresh`.
+
+    Appelable depuis un thread d'arrière-plan : un seul scan à la fois.
+    """
+    global _topology, _topology_time
+    with _topology_lock:
+        age = time.monotonic() - _topology_time
+        if refresh or _topology is None or (max_age_s is not None and age > max_age_s):
+            _topology = scan_topology()
+            _topology_time = time.monotonic()
+        return _topology
+
+
+def cached_topology():
+    """Dernière topologie connue, sans scan (None si jamais scannée)."""
+    return _topology
@@ -0,0 +1,232 @@
+import json
+import math
+
+import numpy as np
+
+try:
+    from scipy.signal import sosfilt
+except ImportError:  # scipy est optionnel : même résultat, boucle numpy par échantillon
+    sosfilt = None
+
+FILTER_TYPES = ("moving_average", "lowpass", "notch")
+MAX_LOWPASS_ORDER = 8
+# Section "filters" de config.json : "record" vaut "raw" (défaut) ou "filtered"
+RECORD_RAW = "raw"
+RECORD_FILTERED = "filtered"
+
+
+# --- Conception des filtres (sections du second ordre, forme [b0 b1 b2 1 a1 a2]) ---
+
+def _lowpass_sos(cutoff_hz, order, fs):
+    """Butterworth par transformée bilinéaire, en cascade de biquads."""
+    k = math.tan(math.pi * cutoff_hz / fs)
+    sections = []
+    for i in range(order // 2):
+        # Angle des pôles conjugués : décalé d'un demi-pas quand l'ordre est impair
+        angle = math.pi * (i + 1) / order if order % 2 else math.pi * (2 * i + 1) / (2 * order)
+        q = 1.0 / (2.0 * math.cos(angle))
+        norm = 1.0 / (1.0 + k / q + k * k)
+        b0 = k * k * norm
+        sections.append([b0, 2 * b0, b0, 1.0,
+                         2.0 * (k * k - 1.0) * norm, (1.0 - k / q + k * k) * norm])
+    if order % 2:
+        b0 = k / (1.0 + k)
+        sections.append([b0, b0, 0.0, 1.0, (k - 1.0) / (k + 1.0), 0.0])
+    return np.asarray(sections, dtype=np.float64)
+
+
+def _notch_sos(freq_hz, q, fs):
+    w0 = 2.0 * math.pi * freq_hz / fs
+    alpha = math.sin(w0) / (2.0 * q)
+    a0 = 1.0 + alpha
+    c = -2.0 * math.cos(w0) / a0
+    return np.asarray([[1.0 / a0, c, 1.0 / a0, 1.0, c, (1.0 - alpha) / a0]], dtype=np.float64)
+
+
+def _number(spec, key, path, default=None):
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"{path}.{key}: expected a positive number, got {value!r}")
+    return float(value)
+
+
+def _frequency(spec, key, fs, path):
+    freq = _number(spec, key, path)
+    if freq >= fs / 2:
+        raise ValueError(f"{path}.{key}: {freq:g} Hz is above the Nyquist frequency "
+                         f"({fs / 2:g} Hz at {fs:g} Hz sampling)")
+    return freq
+
+
+def design_stage(spec, fs, path="filter"):
+    """Un étage de filtre prêt à l'emploi à partir de sa description de config."""
+    kind = spec.get("type")
+    if kind == "moving_average":
+        if "window_s" in spec:
+            window = max(1, round(_number(spec, "window_s", path) * fs))
+        else:
+            window = int(_number(spec, "window", path))
+        return _MovingAverageStage(window)
+    if kind == "lowpass":
+        order = spec.get("order", 2)
+        if not isinstance(order, int) or not 1 <= order <= MAX_LOWPASS_ORDER:
+            raise ValueError(f"{path}.order: expected 1..{MAX_LOWPASS_ORDER}, got {order!r}")
+        return _SosStage(_lowpass_sos(_frequency(spec, "cutoff_hz", fs, path), order, fs))
+    if kind == "notch":
+        return _SosStage(_notch_sos(_frequency(spec, "freq_hz", fs, path),
+                                    _number(spec, "q", path, 30.0), fs))
+    raise ValueError(f"{path}.type: unknown filter {kind!r}")
+
+
+# --- Étages à état, vectorisés sur les lignes d'un groupe ---------------------
+
+class _SosStage:
+    """Cascade de biquads (forme directe II transposée), un état par ligne."""
+
+    def __init__(self, sos):
+        self.sos = sos
+        self.zi = None
+
+    def bind(self, n_rows):
+        self.zi = np.zeros((self.sos.shape[0], n_rows, 2))
+
+    def prime(self, rows, x):
+        """État de régime établi pour une entrée constante x ; renvoie la sortie."""
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            y = x * ((b0 + b1 + b2) / (1.0 + a1 + a2))
+            z2 = b2 * x - a2 * y
+            self.zi[s, rows, 0] = b1 * x - a1 * y + z2
+            self.zi[s, rows, 1] = z2
+            x = y
+        return x
+
+    def step(self, x):
+        zi = self.zi
+        for s, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            y = b0 * x + zi[s, :, 0]
+            zi[s, :, 0] = b1 * x - a1 * y + zi[s, :, 1]
+            zi[s, :, 1] = b2 * x - a2 * y
+            x = y
+        return x
+
+    def block(self, x):
+        if sosfilt is not None:
+            y, self.zi = sosfilt(self.sos, x, axis=1, zi=self.zi)
+            return y
+        return np.column_stack([self.step(x[:, j]) for j in range(x.shape[1])])
+
+
+class _MovingAverageStage:
+    """Moyenne glissante sur `window` échantillons (tampon circulaire par ligne)."""
+
+    def __init__(self, window):
+        self.window = int(window)
+        self.ring = None
+        self.pos = 0
+
+    def bind(self, n_rows):
+        self.ring = np.zeros((n_rows, self.window))
+        self.pos = 0
+
+    def prime(self, rows, x):
+        self.ring[rows] = x[:, None]
+        return x
+
+    def step(self, x):
+        self.ring[:, self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        return self.ring.mean(axis=1)
+
+    def block(self, x):
+        n = x.shape[1]
+        # Tampon remis dans l'ordre chronologique, puis somme cumulée sur [passé, bloc]
+        history = np.roll(self.ring, -self.pos, axis=1)
+        joined = np.concatenate([history, x], axis=1)
+        csum = np.cumsum(joined, axis=1)
+        csum = np.concatenate([np.zeros((x.shape[0], 1)), csum], axis=1)
+        y = (csum[:, self.window + 1:] - csum[:, 1:n + 1]) / self.window
+        self.ring = np.ascontiguousarray(joined[:, -self.window:])
+        self.pos = 0
+        return y
+
+
+class _FilterGroup:
+    """Canaux partageant la même chaîne de filtres : un état par canal, un calcul pour tous."""
+
+    def __init__(self, rows, stages):
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.stages = stages
+        for stage in stages:
+            stage.bind(len(self.rows))
+        # Faux au départ et après un NaN : l'état repart du régime établi au retour du canal
+        self.primed = np.zeros(len(self.rows), dtype=bool)
+
+    def apply(self, x):
+        if self.primed.all() and np.isfinite(x).all():
+            for stage in self.stages:
+                x = stage.block(x)
+            return x
+        out = np.empty_like(x)
+        for j in range(x.shape[1]):
+            column = x[:, j]
+            finite = np.isfinite(column)
+            start = finite & ~self.primed
+            if start.any():
+                value = column[start]
+                for stage in self.stages:
+                    value = stage.prime(start, value)
+            self.primed = finite
+            y = np.where(finite, column, 0.0)
+            for stage in self.stages:
+                y = stage.step(y)
+            out[:, j] = np.where(finite, y, np.nan)
+        return out
+
+
+def records_filtered(config):
+    """Vrai si le run enregistre les valeurs filtrées (config sous forme de dict)."""
+    return config.get("filters", {}).get("record", RECORD_RAW) == RECORD_FILTERED
+
+
+def filter_key(stages):
+    return json.dumps(stages, sort_keys=True)
+
+
+class FilterBank:
+    """Filtres par canal appliqués à la matrice (canaux x échantillons) de chaque bloc.
+
+    Les canaux de même chaîne de filtres sont regroupés : un seul calcul
+    vectorisé par groupe et par bloc, l'état (biquads, tampons) étant gardé
+    d'un bloc à l'autre. Les lignes sans filtre sont recopiées telles quelles.
+    """
+
+    def __init__(self, channels, fs):
+        self.fs = float(fs)
+        self.errors = {}
+        self.groups = []
+        rows_by_key = {}
+        for row, channel in enumerate(channels):
+            stages = getattr(channel, "filter", None)
+            if stages:
+                rows_by_key.setdefault(filter_key(stages), (stages, []))[1].append(row)
+        for stages, rows in rows_by_key.values():
+            try:
+                compiled = [design_stage(spec, self.fs, f"filter[{i}]")
+                            for i, spec in enumerate(stages)]
+            except ValueError as e:
+                for row in rows:
+                    self.errors[channels[row].channel_id] = str(e)
+                continue
+            self.groups.append(_FilterGroup(rows, compiled))
+        self.signature = (self.fs, tuple((ch.channel_id, filter_key(getattr(ch, "filter", None)))
+                                         for ch in channels))
+
+    def __bool__(self):
+        return bool(self.groups)
+
+    def apply(self, values):
+        """Copie filtrée de `values` ; `values` (données brutes) n'est pas modifié."""
+        out = values.copy()
+        for group in self.groups:
+            out[group.rows] = group.apply(values[group.rows])
+        return out
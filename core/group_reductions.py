@@ -0,0 +1,50 @@
+import numpy as np
+
+REDUCTION_KINDS = ("mean", "min", "max")
+
+
+class GroupReducer:
+    """Réductions moyenne / min / max par groupe de canaux (modules).
+
+    Les lignes de chaque groupe sont rendues contiguës par une permutation
+    calculée une fois ; chaque bloc est ensuite réduit en une passe avec
+    `reduceat`, quel que soit le nombre de groupes. Les NaN (canal en défaut)
+    sont ignorés ; un groupe entièrement NaN donne NaN.
+    """
+
+    def __init__(self, channel_ids, groups):
+        index = {ch_id: row for row, ch_id in enumerate(channel_ids)}
+        self.group_names = []
+        order, offsets = [], []
+        for name, members in groups.items():
+            rows = [index[ch_id] for ch_id in members if ch_id in index]
+            if not rows:
+                continue
+            self.group_names.append(name)
+            offsets.append(len(order))
+            order.extend(rows)
+        self.channel_ids = tuple(channel_ids)
+        self._order = np.asarray(order, dtype=np.intp)
+        self._offsets = np.asarray(offsets, dtype=np.intp)
+
+    def output_ids(self):
+        """Identifiants des lignes produites par `reduce`, groupe par groupe."""
+        return [(name, kind) for name in self.group_names for kind in REDUCTION_KINDS]
+
+    def reduce(self, values):
+        """(canaux x échantillons) -> (groupes * 3 x échantillons), ordre de `output_ids`."""
+        n_groups = len(self.group_names)
+        out = np.empty((n_groups, len(REDUCTION_KINDS), values.shape[1]), dtype=np.float64)
+        if not n_groups:
+            return out.reshape(0, values.shape[1])
+
+        grouped = values[self._order]
+        finite = np.isfinite(grouped)
+        counts = np.add.reduceat(finite, self._offsets, axis=0)
+        sums = np.add.reduceat(np.where(finite, grouped, 0.0), self._offsets, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, 0] = np.where(counts > 0, sums / counts, np.nan)
+        # fmin / fmax ignorent les NaN tant qu'une valeur finie existe
+        out[:, 1] = np.fmin.reduceat(grouped, self._offsets, axis=0)
+        out[:, 2] = np.fmax.reduceat(grouped, self._offsets, axis=0)
+        return out.reshape(n_groups * len(REDUCTION_KINDS), values.shape[1])
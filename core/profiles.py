@@ -0,0 +1,169 @@
+import os
+import re
+
+from core.config_manager import CONFIG_FILE, load_config, save_config
+from core.config_model import ThermotionConfig, ConfigError
+
+# Profils de banc : une config complète par fichier, à côté de config.json
+PROFILES_DIR = os.path.join(os.path.dirname(CONFIG_FILE), "profiles")
+PROFILE_EXT = ".json"
+# Section de config.json qui mémorise le profil appliqué (jamais copiée dans un profil)
+PROFILE_SECTION = "profiles"
+PROFILE_NAME = re.compile(r"^[\w][\w .-]*$")
+
+# Champs d'un canal qui ne changent que l'apparence (mise à jour sur place)
+COSMETIC_FIELDS = frozenset(("display_name", "color", "visible"))
+
+
+def profile_path(name, profiles_dir=PROFILES_DIR):
+    if not PROFILE_NAME.match(name or ""):
+        raise ConfigError(f"profile: invalid profile name {name!r}")
+    return os.path.join(profiles_dir, name + PROFILE_EXT)
+
+
+def list_profiles(profiles_dir=PROFILES_DIR):
+    if not os.path.isdir(profiles_dir):
+        return []
+    return sorted(f[:-len(PROFILE_EXT)] for f in os.listdir(profiles_dir)
+                  if f.endswith(PROFILE_EXT))
+
+
+def load_profile(name, profiles_dir=PROFILES_DIR):
+    """Charge (migre et valide) un profil ; OSError s'il n'existe pas."""
+    path = profile_path(name, profiles_dir)
+    if not os.path.exists(path):
+        raise OSError(f"profile {name!r} not found in {profiles_dir}")
+    return load_config(path)
+
+
+def save_profile(name, config, profiles_dir=PROFILES_DIR):
+    path = profile_path(name, profiles_dir)
+    os.makedirs(profiles_dir, exist_ok=True)
+    snapshot = ThermotionConfig.from_dict(config.to_dict())
+    snapshot.sections.pop(PROFILE_SECTION, None)
+    save_config(snapshot, path)
+    return path
+
+
+def delete_profile(name, profiles_dir=PROFILES_DIR):
+    os.remove(profile_path(name, profiles_dir))
+
+
+def active_profile(config):
+    return config.section(PROFILE_SECTION).get("active")
+
+
+def _active_ids(config):
+    virtual = [name for name, v in config.virtual_channels.items() if v.enabled]
+    return list(config.enabled_channel_ids) + virtual
+
+
+def _all_channels(config):
+    channels = {}
+    for device in config.devices.values():
+        channels.update(device.channels)
+    channels.update(config.virtual_channels)
+    return channels
+
+
+class ConfigDiff:
+    """Différences entre deux configs, classées selon ce qu'elles imposent.
+
+    - `acquisition_changed` : tâches DAQ, plan des canaux virtuels, filtres,
+      étalonnages, unité ou cadence à refaire (le worker se reconfigure, sans rescan matériel) ;
+    - `layout_changed` : canaux affichés, panneaux ou moteur de rendu
+      différents (l'affichage est reconstruit) ;
+    - sinon seuls des champs cosmétiques (nom, couleur, visibilité) changent,
+      et sont appliqués sur place.
+    """
+
+    __slots__ = ("channels_added", "channels_removed", "channels_changed",
+                 "modules_renamed", "virtual_changed", "sections_changed", "order_changed")
+
+    def __init__(self):
+        self.channels_added = []
+        self.channels_removed = []
+        self.channels_changed = {}      # canal -> {champ: (avant, après)}
+        self.modules_renamed = {}       # périphérique -> (ancien nom, nouveau nom)
+        self.virtual_changed = set()    # canaux virtuels dont l'expression change
+        self.sections_changed = set()
+        self.order_changed = False
+
+    def __bool__(self):
+        return bool(self.channels_added or self.channels_removed or self.channels_changed
+                    or self.modules_renamed or self.virtual_changed
+                    or self.sections_changed or self.order_changed)
+
+    @property
+    def acquisition_changed(self):
+        return bool(self.channels_added or self.channels_removed or self.order_changed
+                    or self.virtual_changed or "acquisition" in self.sections_changed
+                    or any("thermocouple_type" in fields or "filter" in fields
+                           or "calibration" in fields
+                           for fields in self.channels_changed.values()))
+
+    @property
+    def layout_changed(self):
+        return bool(self.channels_added or self.channels_removed or self.order_changed
+                    or self.modules_renamed or "display" in self.sections_changed)
+
+    def cosmetic_changes(self):
+        """{canal: {champ: nouvelle valeur}} limité aux champs d'apparence."""
+        changes = {}
+        for channel_id, fields in self.channels_changed.items():
+            cosmetic = {k: new for k, (old, new) in fields.items() if k in COSMETIC_FIELDS}
+            if cosmetic:
+                changes[channel_id] = cosmetic
+        return changes
+
+    def summary(self):
+        """Lignes lisibles, pour l'aperçu avant application."""
+        lines = []
+        lines += [f"+ {ch_id}" for ch_id in self.channels_added]
+        lines += [f"- {ch_id}" for ch_id in self.channels_removed]
+        if self.order_changed:
+            lines.append("~ channel order")
+        for device, (old, new) in self.modules_renamed.items():
+            lines.append(f"~ module {device}: {old!r} -> {new!r}")
+        for ch_id, fields in self.channels_changed.items():
+            for key, (old, new) in fields.items():
+                lines.append(f"~ {ch_id}.{key}: {old!r} -> {new!r}")
+        lines += [f"~ virtual {name}: expression" for name in sorted(self.virtual_changed)]
+        lines += [f"~ [{name}]" for name in sorted(self.sections_changed)]
+        return lines
+
+
+def diff_configs(old, new):
+    """Compare deux ThermotionConfig (l'état `online` et le profil actif sont ignorés)."""
+    diff = ConfigDiff()
+
+    old_ids, new_ids = _active_ids(old), _active_ids(new)
+    old_set, new_set = set(old_ids), set(new_ids)
+    diff.channels_added = [ch_id for ch_id in new_ids if ch_id not in old_set]
+    diff.channels_removed = [ch_id for ch_id in old_ids if ch_id not in new_set]
+    diff.order_changed = ([c for c in old_ids if c in new_set]
+                          != [c for c in new_ids if c in old_set])
+
+    old_channels = _all_channels(old)
+    for ch_id, channel in _all_channels(new).items():
+        previous = old_channels.get(ch_id)
+        if previous is None or ch_id not in old_set or ch_id not in new_set:
+            continue
+        before, after = previous.to_dict(), channel.to_dict()
+        fields = {k: (before.get(k), after.get(k))
+                  for k in before.keys() | after.keys()
+                  if k not in ("enabled", "expression") and before.get(k) != after.get(k)}
+        if fields:
+            diff.channels_changed[ch_id] = fields
+        if getattr(previous, "expression", None) != getattr(channel, "expression", None):
+            diff.virtual_changed.add(ch_id)
+
+    for name, device in new.devices.items():
+        previous = old.devices.get(name)
+        if previous is not None and previous.display_name != device.display_name:
+            diff.modules_renamed[name] = (previous.display_name, device.display_name)
+
+    for name in old.sections.keys() | new.sections.keys():
+        if name != PROFILE_SECTION and old.section(name) != new.section(name):
+            diff.sections_changed.add(name)
+    return diff
@@ -0,0 +1,282 @@
+"""Accès programmatique aux runs enregistrés.
+
+    python -m core.query 20240101-120000 -c "Four/TC1" -c cDAQ1Mod2/ai3 \\
+        --from 3600 --to 7200 --resolution 60 -o four.csv
+
+    from core.query import RunQuery
+    result = RunQuery("20240101-120000").fetch(["TC1"], 0, 3600, resolution=10)
+    result.values           # (n, k) ; result.to_dataframe() si pandas est installé
+
+Les canaux se désignent par identifiant, nom affiché ou "module/nom"
+(config du run, puis config.json actuelle). Sans résolution demandée, les
+données sont servies en pleine cadence depuis data.bin mappé en mémoire,
+ou depuis l'archive compressée (core.archive) si data.bin a été supprimé.
+Avec une résolution, le niveau pré-agrégé le plus grossier qui ne dépasse
+pas cette résolution est lu (mappé en mémoire) ; sans niveau adapté,
+min/moyenne/max sont calculés à la volée, tranche par tranche.
+"""
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from core.archive import ArchiveReader, BucketReducer, TIER_FIELDS, has_archive
+from core.config_manager import CONFIG_FILE, load_config
+from core.config_model import ThermotionConfig, ConfigError
+from core.recorder import DATA_FILE, RUNS_DIR, load_meta, open_run_data
+
+try:
+    import pandas
+except ImportError:  # pandas est optionnel : to_dataframe() seulement
+    pandas = None
+
+# Lignes de data.bin lues d'un coup pour les agrégations à la volée
+READ_CHUNK_ROWS = 65536
+VALUE_FIELD = "value"
+
+
+def run_dir_of(run, runs_dir=RUNS_DIR):
+    """Dossier d'un run : chemin existant, ou identifiant cherché dans `runs_dir`."""
+    if os.path.isdir(run):
+        return run
+    path = os.path.join(runs_dir, run)
+    if os.path.isdir(path):
+        return path
+    raise OSError(f"run {run!r} not found (neither a folder nor a run in {runs_dir})")
+
+
+class QueryResult:
+    """Données d'une requête : instants, et par champ une matrice (n, canaux).
+
+    Pleine cadence : un seul champ "value". Agrégé : "min", "mean" et "max",
+    chaque instant étant le début de son intervalle de `resolution_s`.
+    """
+
+    def __init__(self, channel_ids, names, t, fields, source, resolution_s=None):
+        self.channel_ids = list(channel_ids)
+        self.names = list(names)
+        self.t = t
+        self.fields = fields
+        self.source = source
+        self.resolution_s = resolution_s
+
+    def __len__(self):
+        return len(self.t)
+
+    @property
+    def values(self):
+        return self.fields.get(VALUE_FIELD, self.fields.get("mean"))
+
+    def columns(self):
+        if VALUE_FIELD in self.fields:
+            return ["t"] + self.names
+        return ["t"] + [f"{name} {field}" for field in self.fields for name in self.names]
+
+    def to_array(self):
+        """Matrice (n, 1 + k * champs) dans l'ordre de `columns()`."""
+        return np.column_stack([self.t] + list(self.fields.values()))
+
+    def to_dataframe(self):
+        if pandas is None:
+            raise ImportError("to_dataframe() needs pandas; use to_array() or .values instead")
+        columns = self.columns()
+        return pandas.DataFrame(self.to_array()[:, 1:], index=pandas.Index(self.t, name="t"),
+                                columns=columns[1:])
+
+
+class RunQuery:
+    """Un run ouvert en lecture : résolution des noms et choix de la source."""
+
+    def __init__(self, run, runs_dir=RUNS_DIR, config_path=CONFIG_FILE):
+        self.run_dir = run_dir_of(run, runs_dir)
+        self.meta = load_meta(self.run_dir)
+        self.channel_ids = list(self.meta["channel_ids"])
+        self.archive = ArchiveReader(self.run_dir) if has_archive(self.run_dir) else None
+        raw = open_run_data(self.run_dir, self.meta)
+        self.data = raw if len(raw) or self.archive is None else None
+        self.index = {ch_id: i + 1 for i, ch_id in enumerate(self.channel_ids)}  # colonne
+        # Config du run d'abord : les noms de l'époque de l'enregistrement priment
+        configs = [c for c in (self._run_config(), self._current_config(config_path))
+                   if c is not None]
+        self._alias_maps = [self._aliases(config) for config in configs]
+        self.names = {}
+        for ch_id in self.channel_ids:
+            channel = next((c.channel(ch_id) for c in configs if c.channel(ch_id) is not None),
+                           None)
+            self.names[ch_id] = getattr(channel, "display_name", None) or ch_id
+        self._step = None
+
+    def _run_config(self):
+        try:
+            return ThermotionConfig.from_dict(self.meta.get("config") or {})
+        except ConfigError:
+            return None
+
+    @staticmethod
+    def _current_config(path):
+        try:
+            return load_config(path)
+        except (OSError, ValueError):
+            return None
+
+    # --- Canaux -------------------------------------------------------------
+
+    def _aliases(self, config):
+        aliases = {}
+        for ch_id in self.channel_ids:
+            channel = config.channel(ch_id)
+            if channel is None:
+                continue
+            names = {channel.display_name}
+            device = config.device_of(ch_id)
+            if device is not None:
+                names.add(f"{device.display_name}/{channel.display_name}")
+            for name in names:
+                aliases.setdefault(name, []).append(ch_id)
+        return aliases
+
+    def resolve(self, names):
+        """Identifiants des canaux désignés ; ValueError si un nom est inconnu ou ambigu."""
+        resolved = []
+        for name in names:
+            if name in self.index:
+                resolved.append(name)
+                continue
+            matches = next((m[name] for m in self._alias_maps if name in m), None)
+            if not matches:
+                raise ValueError(f"channel {name!r} not recorded in run {self.meta.get('run_id')}")
+            if len(matches) > 1:
+                raise ValueError(f"channel name {name!r} is ambiguous: {', '.join(matches)} "
+                                 "(use the channel id or \"module/name\")")
+            resolved.append(matches[0])
+        return resolved
+
+    def stored_resolutions(self):
+        return sorted(self.archive.tiers) if self.archive is not None else []
+
+    # --- Lecture -------------------------------------------------------------
+
+    def _sample_step(self):
+        if self._step is None:
+            if self.data is not None:
+                head = np.asarray(self.data[:1024, 0])
+            else:
+                head = next(self.archive.iter_chunks([]), (np.empty(0),))[0][:1024]
+            self._step = float(np.median(np.diff(head))) if len(head) > 1 else 0.0
+        return self._step
+
+    def _full_rate_chunks(self, channel_ids, t0, t1):
+        if self.data is None:
+            yield from self.archive.iter_chunks(channel_ids, t0, t1)
+            return
+        cols = [0] + [self.index[ch_id] for ch_id in channel_ids]
+        times = self.data[:, 0]
+        i0 = int(np.searchsorted(times, t0, side="left"))
+        i1 = int(np.searchsorted(times, t1, side="right"))
+        for a in range(i0, i1, READ_CHUNK_ROWS):
+            block = np.asarray(self.data[a:min(a + READ_CHUNK_ROWS, i1)][:, cols])
+            yield block[:, 0], block[:, 1:]
+
+    def fetch(self, channels, t0=None, t1=None, resolution=None):
+        """Canaux `channels` sur [t0, t1] (s depuis le départ du run).
+
+        `resolution` (s) : pas maximal souhaité. Le résultat n'est jamais
+        plus grossier que demandé ; il peut être plus fin si c'est le niveau
+        stocké le plus proche.
+        """
+        channel_ids = self.resolve(channels)
+        names = [self.names[ch_id] for ch_id in channel_ids]
+        t0 = -np.inf if t0 is None else t0
+        t1 = np.inf if t1 is None else t1
+
+        if resolution and resolution > self._sample_step():
+            tiers = [w for w in self.stored_resolutions() if w <= resolution]
+            if tiers:
+                t, fields = self.archive.read_tier(tiers[-1], channel_ids, t0, t1)
+                return QueryResult(channel_ids, names, t, fields, f"tier {tiers[-1]:g} s", tiers[-1])
+            reducer = BucketReducer(resolution)
+            t_parts, parts = [], []
+            for t, values in self._full_rate_chunks(channel_ids, t0, t1):
+                if len(t):
+                    done_t, done = reducer.add(t, values)
+                    if len(done_t):
+                        t_parts.append(done_t)
+                        parts.append(done)
+            done_t, done = reducer.close()
+            if len(done_t):
+                t_parts.append(done_t)
+                parts.append(done)
+            rows = np.concatenate(parts) if parts else np.empty((0, 3, len(channel_ids)))
+            fields = {name: rows[:, k, :] for k, name in enumerate(TIER_FIELDS)}
+            return QueryResult(channel_ids, names, np.concatenate(t_parts) if t_parts else np.empty(0),
+                               fields, "aggregated", resolution)
+
+        parts = list(self._full_rate_chunks(channel_ids, t0, t1))
+        t = np.concatenate([p[0] for p in parts]) if parts else np.empty(0)
+        values = (np.concatenate([p[1] for p in parts]) if parts
+                  else np.empty((0, len(channel_ids))))
+        source = DATA_FILE if self.data is not None else "archive"
+        return QueryResult(channel_ids, names, t, {VALUE_FIELD: values}, source)
+
+
+def query(run, channels, t0=None, t1=None, resolution=None, runs_dir=RUNS_DIR):
+    """Raccourci : RunQuery(run).fetch(...)."""
+    return RunQuery(run, runs_dir).fetch(channels, t0, t1, resolution)
+
+
+def write_csv(result, out):
+    writer = csv.writer(out)
+    writer.writerow(result.columns())
+    for row in result.to_array():
+        writer.writerow([f"{x:.6f}" if i == 0 else ("" if np.isnan(x) else f"{x:.6g}")
+                         for i, x in enumerate(row)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.query",
+                                     description="Extract channels of a recorded run.")
+    parser.add_argument("run", help="run folder or run id (looked up in --runs-dir)")
+    parser.add_argument("-c", "--channel", action="append", dest="channels", default=[],
+                        metavar="NAME", help="channel id, display name or module/name "
+                                             "(repeatable, default: all)")
+    parser.add_argument("--from", type=float, default=None, dest="t0", metavar="S",
+                        help="start, seconds since the start of the run")
+    parser.add_argument("--to", type=float, default=None, dest="t1", metavar="S",
+                        help="end, seconds since the start of the run")
+    parser.add_argument("--resolution", type=float, default=None, metavar="S",
+                        help="coarsest acceptable time step (min/mean/max per step)")
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    parser.add_argument("--list", action="store_true", help="list recorded channels and tiers")
+    parser.add_argument("-o", "--out", default=None,
+                        help="output file, .csv or .npy (default: CSV on stdout)")
+    args = parser.parse_args(argv)
+
+    try:
+        run = RunQuery(args.run, args.runs_dir)
+        if args.list:
+            for ch_id in run.channel_ids:
+                print(f"{ch_id}\t{run.names[ch_id]}")
+            tiers = ", ".join(f"{w:g} s" for w in run.stored_resolutions()) or "none"
+            print(f"[INFO] stored tiers: {tiers}")
+            return 0
+        result = run.fetch(args.channels or run.channel_ids, args.t0, args.t1, args.resolution)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    if args.out and args.out.endswith(".npy"):
+        np.save(args.out, result.to_array())
+    elif args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_csv(result, f)
+    else:
+        write_csv(result, sys.stdout)
+    if args.out:
+        print(f"[INFO] Wrote {len(result)} rows from {result.source} to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Réétalonnage d'un run enregistré, sans nouvelle acquisition.
+
+    python -m core.recalibrate runs/20240101-120000 [--config config.json]
+
+Les colonnes du run sont ramenées à la lecture brute en °C avec l'étalonnage
+et l'unité de la config du run (meta.json), puis recalculées avec ceux de la
+config donnée : même transformation vectorisée qu'à l'acquisition
+(core.calibration). Seuls les canaux dont l'étalonnage ou l'unité change sont
+réécrits ; les canaux virtuels sont réévalués à partir des nouvelles valeurs.
+
+data.bin est réécrit à côté puis remplacé ; une archive (core.archive) est
+reconstruite avec le même codec et les mêmes niveaux. La config du run est
+mise à jour et l'opération notée dans events.jsonl. Un run enregistré filtré
+est refusé : les filtres s'appliquent après l'étalonnage et ne s'inversent pas.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from core.archive import ArchiveReader, archive_run, has_archive
+from core.calibration import CalibrationBank, units_of
+from core.config_manager import CONFIG_FILE, load_config
+from core.config_model import ThermotionConfig
+from core.filters import records_filtered
+from core.query import READ_CHUNK_ROWS, run_dir_of
+from core.recorder import DATA_FILE, EVENTS_FILE, META_FILE, RUNS_DIR, load_meta, open_run_data
+from core.virtual_channels import compile_virtual_channels
+
+
+def _chunks(run_dir, meta):
+    """Lignes [t, canal_0, ...] du run, tranche par tranche (data.bin ou archive)."""
+    data = open_run_data(run_dir, meta)
+    if len(data):
+        for a in range(0, len(data), READ_CHUNK_ROWS):
+            yield np.array(data[a:a + READ_CHUNK_ROWS])
+        return
+    if has_archive(run_dir):
+        for t, values in ArchiveReader(run_dir).iter_chunks(meta["channel_ids"]):
+            yield np.column_stack((t, values))
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def recalibrate_run(run_dir, config):
+    """Applique à un run les étalonnages et l'unité de `config` (ThermotionConfig).
+
+    Renvoie la liste des canaux réécrits (vide : rien à faire) ; ValueError
+    si le run ne peut pas être réétalonné.
+    """
+    meta = load_meta(run_dir)
+    raw_config = meta.get("config") or {}
+    if records_filtered(raw_config):
+        raise ValueError("run recorded filtered values: calibration cannot be changed afterwards")
+    old = ThermotionConfig.from_dict(raw_config)
+    old_units, new_units = units_of(old), units_of(config)
+
+    channel_ids = list(meta["channel_ids"])
+    physical = [ch_id for ch_id in channel_ids if old.device_of(ch_id) is not None]
+    old_channels = [old.channel(ch_id) for ch_id in physical]
+    # Canal absent de la nouvelle config : étalonnage d'origine conservé
+    new_channels = [config.channel(ch_id) if config.device_of(ch_id) is not None else channel
+                    for ch_id, channel in zip(physical, old_channels)]
+    rows = [i for i, (a, b) in enumerate(zip(old_channels, new_channels))
+            if old_units != new_units or a.calibration != b.calibration]
+    if not rows:
+        return []
+
+    old_bank = CalibrationBank([old_channels[i] for i in rows], old_units)
+    new_bank = CalibrationBank([new_channels[i] for i in rows], new_units)
+    errors = {**old_bank.errors, **new_bank.errors}
+    if errors:
+        raise ValueError("; ".join(f"{ch_id}: {e}" for ch_id, e in errors.items()))
+    index = {ch_id: i + 1 for i, ch_id in enumerate(channel_ids)}  # colonne
+    cols = [index[physical[i]] for i in rows]
+    physical_cols = [index[ch_id] for ch_id in physical]
+
+    plan, errors = compile_virtual_channels(old.virtual_channels, physical)
+    for name, error in errors.items():
+        print(f"[WARN] Virtual channel {name} not recomputed: {error}")
+    virtual = [(k, index[ch_id]) for k, ch_id in enumerate(plan.channel_ids) if ch_id in index]
+
+    had_raw = os.path.exists(os.path.join(run_dir, DATA_FILE))
+    manifest = ArchiveReader(run_dir).manifest if has_archive(run_dir) else None
+    tmp = os.path.join(run_dir, DATA_FILE + ".tmp")
+    n_rows = 0
+    with open(tmp, "wb") as f:
+        for block in _chunks(run_dir, meta):
+            block[:, cols] = new_bank.apply(old_bank.invert(block[:, cols].T)).T
+            if virtual:
+                with np.errstate(all="ignore"):
+                    values = plan.evaluate(block[:, physical_cols].T)
+                for k, col in virtual:
+                    block[:, col] = values[k]
+            f.write(block.tobytes())
+            n_rows += len(block)
+    if not n_rows:
+        os.remove(tmp)
+        raise ValueError("no recorded data")
+    os.replace(tmp, os.path.join(run_dir, DATA_FILE))
+
+    if manifest is not None:
+        resolution = manifest["chunks"][0]["columns"][1]["resolution"]
+        archive_run(run_dir, resolution, tuple(t["width_s"] for t in manifest["tiers"]),
+                    manifest["codec"], drop_raw=not had_raw)
+
+    changed = [physical[i] for i in rows]
+    for ch_id, channel in zip(changed, (new_channels[i] for i in rows)):
+        old.channel(ch_id).calibration = channel.calibration
+    old.sections.setdefault("acquisition", {})["units"] = new_units
+    meta["config"] = old.to_dict()
+    meta.setdefault("recalibrations", []).append(
+        {"wall_time": time.time(), "channels": changed, "units": [old_units, new_units]})
+    _write_json(os.path.join(run_dir, META_FILE), meta)
+    with open(os.path.join(run_dir, EVENTS_FILE), "a") as f:
+        f.write(json.dumps({"type": "recalibrated", "wall_time": time.time(),
+                            "channels": changed, "units": new_units}) + "\n")
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.recalibrate",
+                                     description="Re-apply calibrations and units to recorded runs.")
+    parser.add_argument("runs", nargs="+", metavar="run", help="run folder or run id")
+    parser.add_argument("--config", default=CONFIG_FILE,
+                        help=f"config holding the new calibrations (default {CONFIG_FILE})")
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {args.config}: {e}")
+        return 1
+    status = 0
+    for run in args.runs:
+        try:
+            changed = recalibrate_run(run_dir_of(run, args.runs_dir), config)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {run}: {e}")
+            status = 1
+            continue
+        if changed:
+            print(f"[INFO] {run}: recalibrated {len(changed)} channel(s), "
+                  f"values in {units_of(config)}")
+        else:
+            print(f"[INFO] {run}: calibration unchanged, nothing to do")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
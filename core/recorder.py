@@ -0,0 +1,158 @@
+import json
+import os
+import time
+
+import numpy as np
+
+RUNS_DIR = "runs"
+META_FILE = "meta.json"
+DATA_FILE = "data.bin"
+EVENTS_FILE = "events.jsonl"
+FORMAT_VERSION = 1
+
+
+def new_run_id():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+class RunRecorder:
+    """Enregistre les blocs d'un run dans un dossier runs/<run_id>/.
+
+    - meta.json   : canaux, heure de départ, copie de la config
+    - data.bin    : float64 en lignes [t, canal_0, ..., canal_n-1], t en
+                    secondes depuis le départ du run (lisible par np.memmap)
+    - events.jsonl: trous de données, reprises, ... (une ligne JSON par évènement)
+
+    Les écritures sont en ajout seul ; une ligne incomplète (coupure pendant
+    l'écriture) est tronquée à la reprise.
+    """
+
+    def __init__(self, run_dir, channel_ids, meta, time_offset=0.0):
+        self.run_dir = run_dir
+        self.channel_ids = tuple(channel_ids)
+        self.index = {ch_id: i for i, ch_id in enumerate(self.channel_ids)}
+        self.meta = meta
+        self.row_size = (1 + len(self.channel_ids)) * 8
+        # Décalage ajouté aux horodatages des blocs (non nul après une reprise)
+        self.time_offset = time_offset
+        self.last_time = None
+        self._row_maps = {}
+        self._data = open(os.path.join(run_dir, DATA_FILE), "ab")
+        self._events = open(os.path.join(run_dir, EVENTS_FILE), "a")
+        self.position = self._data.tell()
+
+    @classmethod
+    def create(cls, run_id, channel_ids, config, runs_dir=RUNS_DIR):
+        # Deux runs dans la même seconde (nouveau segment) : suffixe plutôt que mélange
+        base, n = run_id, 1
+        while os.path.exists(os.path.join(runs_dir, run_id)):
+            n += 1
+            run_id = f"{base}-{n}"
+        run_dir = os.path.join(runs_dir, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        start = time.time()
+        meta = {
+            "version": FORMAT_VERSION,
+            "run_id": run_id,
+            "start_time": start,
+            "start_iso": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start)),
+            "channel_ids": list(channel_ids),
+            "dtype": "float64",
+            "config": config,
+        }
+        with open(os.path.join(run_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        return cls(run_dir, channel_ids, meta)
+
+    @classmethod
+    def resume(cls, run_dir):
+        """Rouvre un run interrompu ; le temps repart de l'instant de reprise."""
+        meta = load_meta(run_dir)
+        row_size = (1 + len(meta["channel_ids"])) * 8
+        data_path = os.path.join(run_dir, DATA_FILE)
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        # On garde tout ce qui est sur disque, à la ligne complète près
+        size -= size % row_size
+        with open(data_path, "ab") as f:
+            f.truncate(size)
+
+        last_time = None
+        if size:
+            with open(data_path, "rb") as f:
+                f.seek(size - row_size)
+                last_time = float(np.frombuffer(f.read(8), dtype=np.float64)[0])
+
+        recorder = cls(run_dir, meta["channel_ids"], meta,
+                       time_offset=time.time() - meta["start_time"])
+        recorder.last_time = last_time
+        recorder.mark_gap(last_time, recorder.time_offset, "resumed after interruption")
+        return recorder
+
+    def _rows_for(self, channel_ids):
+        rows = self._row_maps.get(channel_ids)
+        if rows is None:
+            src = [i for i, ch_id in enumerate(channel_ids) if ch_id in self.index]
+            dst = [self.index[channel_ids[i]] + 1 for i in src]
+            rows = (np.asarray(src, dtype=np.intp), np.asarray(dst, dtype=np.intp))
+            self._row_maps[channel_ids] = rows
+        return rows
+
+    def write_block(self, block):
+        n = block.n_samples
+        if not n:
+            return self.position
+        out = np.full((n, 1 + len(self.channel_ids)), np.nan, dtype=np.float64)
+        out[:, 0] = block.timestamps + self.time_offset
+        src, dst = self._rows_for(block.channel_ids)
+        out[:, dst] = block.values[src].T
+        self._data.write(out.tobytes())
+        # Vidé vers l'OS à chaque bloc ; fsync seulement aux points de contrôle
+        self._data.flush()
+        self.position += out.nbytes
+        self.last_time = float(out[-1, 0])
+        return self.position
+
+    def mark_gap(self, t_start, t_end, reason):
+        """Signale un trou : une ligne NaN coupe les courbes, l'évènement le décrit."""
+        if t_start is not None:
+            row = np.full(1 + len(self.channel_ids), np.nan, dtype=np.float64)
+            row[0] = t_start
+            self._data.write(row.tobytes())
+            self._data.flush()
+            self.position += row.nbytes
+        self.log_event({"type": "gap", "t_start": t_start, "t_end": t_end, "reason": reason})
+
+    def log_event(self, event):
+        event.setdefault("wall_time", time.time())
+        self._events.write(json.dumps(event) + "\n")
+        self._events.flush()
+
+    def sync(self):
+        self._data.flush()
+        os.fsync(self._data.fileno())
+
+    def close(self):
+        if not self._data.closed:
+            self.sync()
+            self._data.close()
+        if not self._events.closed:
+            self._events.close()
+
+
+def load_meta(run_dir):
+    with open(os.path.join(run_dir, META_FILE), "r") as f:
+        return json.load(f)
+
+
+def open_run_data(run_dir, meta=None):
+    """data.bin d'un run en lecture seule : memmap (n_lignes, 1 + n_canaux).
+
+    Une ligne incomplète en fin de fichier (run en cours ou coupé) est ignorée.
+    """
+    meta = meta if meta is not None else load_meta(run_dir)
+    n_cols = 1 + len(meta["channel_ids"])
+    path = os.path.join(run_dir, DATA_FILE)
+    n_rows = (os.path.getsize(path) if os.path.exists(path) else 0) // (n_cols * 8)
+    if not n_rows:
+        return np.empty((0, n_cols), dtype=np.float64)
+    return np.memmap(path, dtype=np.float64, mode="r", shape=(n_rows, n_cols))
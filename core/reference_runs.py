@@ -0,0 +1,200 @@
+import os
+import warnings
+
+import numpy as np
+
+from core.annotations import load_annotations
+from core.archive import open_recorded_data
+from core.recorder import load_meta
+
+# Pyramide min/max : paquets de 256 lignes, puis x16 à chaque niveau
+BASE_BUCKET = 256
+LEVEL_FACTOR = 16
+# Lignes lues d'un coup sur le fichier (mémoire bornée pendant les réductions)
+READ_CHUNK_ROWS = 65536
+ALIGN_START = None
+
+
+def _minmax_buckets(values, bucket):
+    """(min, max) par paquet de `bucket` lignes ; un paquet tout NaN donne NaN."""
+    n_buckets = -(-values.shape[0] // bucket)
+    pad = n_buckets * bucket - values.shape[0]
+    low = np.where(np.isnan(values), np.inf, values)
+    high = np.where(np.isnan(values), -np.inf, values)
+    if pad:
+        low = np.concatenate([low, np.full((pad, values.shape[1]), np.inf)])
+        high = np.concatenate([high, np.full((pad, values.shape[1]), -np.inf)])
+    low = low.reshape(n_buckets, bucket, -1).min(axis=1)
+    high = high.reshape(n_buckets, bucket, -1).max(axis=1)
+    low[np.isinf(low)] = np.nan
+    high[np.isinf(high)] = np.nan
+    return low, high
+
+
+def _reduce_level(t, low, high, factor):
+    """Regroupe `factor` paquets d'un niveau en un paquet du niveau suivant."""
+    n_buckets = -(-len(t) // factor)
+    pad = n_buckets * factor - len(t)
+    if pad:
+        low = np.concatenate([low, np.full((pad, low.shape[1]), np.nan)])
+        high = np.concatenate([high, np.full((pad, high.shape[1]), np.nan)])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # paquet tout NaN
+        low = np.nanmin(low.reshape(n_buckets, factor, -1), axis=1)
+        high = np.nanmax(high.reshape(n_buckets, factor, -1), axis=1)
+    return t[::factor], low, high
+
+
+class ReferenceRun:
+    """Run enregistré superposé aux courbes en direct.
+
+    data.bin reste mappé en mémoire (archive décompressée par tranches si
+    data.bin a été supprimé) : seule une pyramide min/max (un paquet
+    pour 256 lignes, puis x16 par niveau) est calculée au chargement. Une
+    fenêtre de la vue est servie par le niveau le plus grossier qui garde au
+    moins un paquet par pixel, ou, zoomé, par les lignes brutes lues par
+    tranches : le coût d'affichage dépend de la largeur de la vue, pas de la
+    durée du run.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.meta = load_meta(run_dir)
+        self.run_id = self.meta.get("run_id", os.path.basename(os.path.normpath(run_dir)))
+        self.channel_ids = list(self.meta["channel_ids"])
+        self.index = {ch_id: i + 1 for i, ch_id in enumerate(self.channel_ids)}  # colonne
+        self.data = open_recorded_data(run_dir, self.meta)
+        self.times = self.data[:, 0]   # triée (recherche dichotomique)
+        self.annotations = load_annotations(run_dir)
+        self.align_marker = ALIGN_START
+        # Décalage ajouté aux temps du run de référence pour rejoindre ceux du direct
+        self.shift = 0.0
+        self.aligned = True
+        self.levels = self._build_pyramid()
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def _build_pyramid(self):
+        levels = []
+        n_rows = len(self)
+        if n_rows <= BASE_BUCKET:
+            return levels
+        t_parts, low_parts, high_parts = [], [], []
+        step = READ_CHUNK_ROWS - READ_CHUNK_ROWS % BASE_BUCKET
+        for a in range(0, n_rows, step):
+            block = np.asarray(self.data[a:a + step])
+            low, high = _minmax_buckets(block[:, 1:], BASE_BUCKET)
+            t_parts.append(block[::BASE_BUCKET, 0])
+            low_parts.append(low)
+            high_parts.append(high)
+        level = (np.concatenate(t_parts), np.concatenate(low_parts), np.concatenate(high_parts))
+        bucket = BASE_BUCKET
+        while True:
+            levels.append((bucket,) + level)
+            if len(level[0]) <= LEVEL_FACTOR:
+                return levels
+            level = _reduce_level(*level, LEVEL_FACTOR)
+            bucket *= LEVEL_FACTOR
+
+    def marker_texts(self):
+        return [a.text for a in self.annotations if not a.is_region]
+
+    def align(self, marker_text, live_annotations):
+        """Aligne sur le départ (marker_text None) ou sur un repère présent dans les deux runs.
+
+        Tant que le repère n'est pas encore posé en direct, l'alignement reste
+        sur le départ et `aligned` est faux.
+        """
+        self.align_marker = marker_text
+        self.shift, self.aligned = 0.0, True
+        if marker_text is ALIGN_START:
+            return
+        reference = next((a for a in self.annotations if a.text == marker_text), None)
+        live = [a for a in live_annotations if a.text == marker_text]
+        if reference is None or not live:
+            self.aligned = False
+            return
+        self.shift = live[-1].t - reference.t
+
+    def common_channels(self, channel_ids):
+        return [ch_id for ch_id in channel_ids if ch_id in self.index]
+
+    def _row_range(self, t0, t1):
+        i0 = int(np.searchsorted(self.times, t0 - self.shift, side="left"))
+        i1 = int(np.searchsorted(self.times, t1 - self.shift, side="right"))
+        # Un point de part et d'autre : la courbe touche les bords de la vue
+        return max(i0 - 1, 0), min(i1 + 1, len(self))
+
+    def envelope(self, channel_ids, t0, t1, n_pixels):
+        """Courbes décimées de la fenêtre [t0, t1] (temps du direct).
+
+        Renvoie (t, {canal: y}) où, décimé, chaque paquet donne deux points
+        (min puis max) : le tracé en zigzag couvre exactement l'enveloppe.
+        """
+        cols = [self.index[ch_id] for ch_id in channel_ids]
+        i0, i1 = self._row_range(t0, t1)
+        if i1 <= i0 or not cols:
+            return np.empty(0), {ch_id: np.empty(0) for ch_id in channel_ids}
+        rows_per_pixel = (i1 - i0) / max(n_pixels, 1)
+
+        if rows_per_pixel <= 2:
+            block = np.asarray(self.data[i0:i1][:, [0] + cols])
+            return (block[:, 0] + self.shift,
+                    {ch_id: block[:, k + 1] for k, ch_id in enumerate(channel_ids)})
+
+        level = None
+        for candidate in self.levels:
+            if candidate[0] <= rows_per_pixel:
+                level = candidate
+        if level is None:
+            # Zoom fin : lignes brutes réduites tranche par tranche
+            bucket = int(rows_per_pixel)
+            step = max(READ_CHUNK_ROWS - READ_CHUNK_ROWS % bucket, bucket)
+            t_parts, low_parts, high_parts = [], [], []
+            for a in range(i0, i1, step):
+                block = np.asarray(self.data[a:min(a + step, i1)][:, [0] + cols])
+                low, high = _minmax_buckets(block[:, 1:], bucket)
+                t_parts.append(block[::bucket, 0])
+                low_parts.append(low)
+                high_parts.append(high)
+            t, low, high = (np.concatenate(t_parts), np.concatenate(low_parts),
+                            np.concatenate(high_parts))
+        else:
+            bucket, level_t, level_low, level_high = level
+            b0, b1 = i0 // bucket, -(-i1 // bucket)
+            t, low, high = _reduce_level(level_t[b0:b1],
+                                         level_low[b0:b1][:, [c - 1 for c in cols]],
+                                         level_high[b0:b1][:, [c - 1 for c in cols]],
+                                         max(int(rows_per_pixel // bucket), 1))
+
+        t = np.repeat(t + self.shift, 2)
+        curves = {}
+        for k, ch_id in enumerate(channel_ids):
+            y = np.empty(2 * len(low))
+            y[0::2], y[1::2] = low[:, k], high[:, k]
+            curves[ch_id] = y
+        return t, curves
+
+    def values_at(self, channel_ids, t):
+        """Valeurs interpolées linéairement aux instants `t` (temps du direct).
+
+        Ne lit que les deux lignes qui encadrent chaque instant ; NaN hors du run.
+        """
+        cols = [self.index[ch_id] for ch_id in channel_ids]
+        result = np.full((len(cols), len(t)), np.nan)
+        if not len(self) or not len(t) or not cols:
+            return result
+        ref_t = np.asarray(t, dtype=np.float64) - self.shift
+        right = np.searchsorted(self.times, ref_t, side="left")
+        inside = (right > 0) & (right < len(self))
+        if not inside.any():
+            return result
+        right = right[inside]
+        after = np.asarray(self.data[right][:, [0] + cols])
+        before = np.asarray(self.data[right - 1][:, [0] + cols])
+        span = after[:, 0] - before[:, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(span > 0, (ref_t[inside] - before[:, 0]) / span, 0.0)
+        result[:, inside] = (before[:, 1:] + (after[:, 1:] - before[:, 1:]) * weight[:, None]).T
+        return result
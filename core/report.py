@@ -0,0 +1,384 @@
+"""Rapport de fin d'essai, sans interface graphique.
+
+    python -m core.report runs/20240101-120000 --above 50 --above 80 --band 0.5
+
+Les statistiques par canal (min, max, moyenne, écart-type, temps passé
+au-dessus de seuils, instant de stabilisation) sont calculées sur data.bin
+mappé en mémoire (ou l'archive si data.bin a été supprimé), par tranches de lignes : la mémoire reste bornée quelle que
+soit la durée du run. Les tranches de temps sont réparties sur un pool de
+processus puis fusionnées.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.archive import open_recorded_data
+from core.calibration import UNIT_SYMBOLS, units_of
+from core.config_model import ThermotionConfig, ConfigError
+from core.recorder import load_meta
+
+REPORT_DIR = "report"
+SUMMARY_CSV = "summary.csv"
+SUMMARY_TXT = "summary.txt"
+# Taille visée d'une tranche lue d'un coup (octets)
+CHUNK_BYTES = 32 * 1024 * 1024
+# Points par courbe dans les graphes (enveloppe min/max par paquet de lignes)
+PLOT_POINTS = 2000
+# En dessous, un seul processus va plus vite que le démarrage du pool
+MIN_PARALLEL_ROWS = 200_000
+
+
+def _chunk_rows(n_cols, bucket_rows):
+    rows = max(CHUNK_BYTES // (n_cols * 8), bucket_rows)
+    return rows - rows % bucket_rows
+
+
+def _segment_stats(run_dir, r0, r1, thresholds, bucket_rows):
+    """Agrégats partiels des lignes [r0, r1) ; r0 et r1 sont alignés sur les paquets.
+
+    Chaque échantillon pèse la durée jusqu'à la ligne suivante (0 pour la
+    dernière du run) ; les NaN (trous, modules absents) ne comptent pas.
+    """
+    data = open_recorded_data(run_dir)
+    n_rows, n_cols = data.shape
+    n = n_cols - 1
+    count = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n)
+    total_sq = np.zeros(n)
+    lo = np.full(n, np.inf)
+    hi = np.full(n, -np.inf)
+    valid_time = np.zeros(n)
+    above = np.zeros((len(thresholds), n))
+    env_t, env_lo, env_hi = [], [], []
+
+    step = _chunk_rows(n_cols, bucket_rows)
+    for a in range(r0, r1, step):
+        b = min(a + step, r1)
+        # Une ligne de plus pour la durée du dernier échantillon de la tranche
+        block = np.asarray(data[a:min(b + 1, n_rows)])
+        t = block[:, 0]
+        dt = np.diff(t, append=t[-1]) if b == n_rows else np.diff(t)
+        values = block[:b - a, 1:]
+        t = t[:b - a]
+
+        valid = np.isfinite(values)
+        filled = np.where(valid, values, 0.0)
+        weights = valid * dt[:, None]
+        count += valid.sum(axis=0)
+        total += filled.sum(axis=0)
+        total_sq += (filled * filled).sum(axis=0)
+        valid_time += weights.sum(axis=0)
+        low = np.where(valid, values, np.inf)
+        high = np.where(valid, values, -np.inf)
+        lo = np.minimum(lo, low.min(axis=0))
+        hi = np.maximum(hi, high.max(axis=0))
+        for k, threshold in enumerate(thresholds):
+            # NaN > seuil est faux : les trous ne comptent pas
+            above[k] += ((values > threshold) * dt[:, None]).sum(axis=0)
+
+        # Enveloppe pour les graphes : min/max par paquet de bucket_rows lignes
+        n_buckets = -(-(b - a) // bucket_rows)
+        pad = n_buckets * bucket_rows - (b - a)
+        if pad:
+            low = np.concatenate([low, np.full((pad, n), np.inf)])
+            high = np.concatenate([high, np.full((pad, n), -np.inf)])
+        env_t.append(t[::bucket_rows])
+        env_lo.append(low.reshape(n_buckets, bucket_rows, n).min(axis=1))
+        env_hi.append(high.reshape(n_buckets, bucket_rows, n).max(axis=1))
+
+    return {
+        "count": count, "sum": total, "sum_sq": total_sq, "min": lo, "max": hi,
+        "valid_time": valid_time, "above": above,
+        "env_t": np.concatenate(env_t) if env_t else np.empty(0),
+        "env_lo": np.concatenate(env_lo) if env_lo else np.empty((0, n)),
+        "env_hi": np.concatenate(env_hi) if env_hi else np.empty((0, n)),
+    }
+
+
+def _merge(parts):
+    merged = {
+        "count": sum(p["count"] for p in parts),
+        "sum": sum(p["sum"] for p in parts),
+        "sum_sq": sum(p["sum_sq"] for p in parts),
+        "min": np.minimum.reduce([p["min"] for p in parts]),
+        "max": np.maximum.reduce([p["max"] for p in parts]),
+        "valid_time": sum(p["valid_time"] for p in parts),
+        "above": sum(p["above"] for p in parts),
+    }
+    for key in ("env_t", "env_lo", "env_hi"):
+        merged[key] = np.concatenate([p[key] for p in parts])
+    return merged
+
+
+def _final_values(data, window_s):
+    """Moyenne de chaque canal sur les `window_s` dernières secondes."""
+    n_rows, n_cols = data.shape
+    t_end = float(data[-1, 0])
+    step = _chunk_rows(n_cols, 1)
+    count = np.zeros(n_cols - 1, dtype=np.int64)
+    total = np.zeros(n_cols - 1)
+    for b in range(n_rows, 0, -step):
+        block = np.asarray(data[max(b - step, 0):b])
+        block = block[block[:, 0] >= t_end - window_s]
+        valid = np.isfinite(block[:, 1:])
+        count += valid.sum(axis=0)
+        total += np.where(valid, block[:, 1:], 0.0).sum(axis=0)
+        if len(block) < b - max(b - step, 0):
+            break
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
+def _stabilization(data, final, band):
+    """Instant (depuis le début) après lequel chaque canal reste à ±band de sa valeur finale.
+
+    Parcours à rebours par tranches : on cherche la dernière sortie de la
+    bande, ce qui s'arrête en général dans les dernières tranches.
+    """
+    n_rows, n_cols = data.shape
+    n = n_cols - 1
+    last_out = np.full(n, -1, dtype=np.int64)
+    pending = np.isfinite(final)
+    step = _chunk_rows(n_cols, 1)
+    for b in range(n_rows, 0, -step):
+        if not pending.any():
+            break
+        a = max(b - step, 0)
+        values = np.asarray(data[a:b, 1:])[:, pending]
+        outside = np.abs(values - final[pending]) > band   # NaN -> faux
+        hit = outside.any(axis=0)
+        if hit.any():
+            rows = a + (len(values) - 1 - np.argmax(outside[::-1], axis=0))
+            idx = np.flatnonzero(pending)[hit]
+            last_out[idx] = rows[hit]
+            pending[idx] = False
+
+    t0 = float(data[0, 0])
+    result = np.full(n, np.nan)
+    stable = np.isfinite(final)
+    never_out = stable & (last_out < 0)
+    result[never_out] = 0.0
+    settled = stable & (last_out >= 0) & (last_out + 1 < n_rows)
+    result[settled] = data[last_out[settled] + 1, 0] - t0
+    return result
+
+
+class RunReport:
+    """Statistiques d'un run, prêtes à écrire en tableau ou en graphes."""
+
+    def __init__(self, run_dir, meta, thresholds, band, stats, stabilization, duration):
+        self.run_dir = run_dir
+        self.meta = meta
+        self.thresholds = tuple(thresholds)
+        self.band = band
+        self.channel_ids = list(meta["channel_ids"])
+        self.duration = duration
+        self.stats = stats
+        self.stabilization = stabilization
+        self.units = UNIT_SYMBOLS[units_of(meta.get("config") or {})]
+        try:
+            config = ThermotionConfig.from_dict(meta.get("config") or {})
+        except ConfigError:
+            config = None
+        self.names, self.colors = [], []
+        for ch_id in self.channel_ids:
+            channel = config.channel(ch_id) if config is not None else None
+            self.names.append(getattr(channel, "display_name", None) or ch_id)
+            # Couleur du canal dans la config du run, sinon celle de matplotlib
+            self.colors.append((getattr(channel, "color", None) or "").strip() or None)
+
+    def rows(self):
+        """Une ligne par canal : (en-têtes, lignes) du tableau de synthèse."""
+        s = self.stats
+        count = s["count"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s["sum"] / count
+            std = np.sqrt(np.maximum(s["sum_sq"] / count - mean * mean, 0.0))
+        headers = ["channel", "name", "samples", "recorded_s", "min", "max", "mean", "std"]
+        headers += [f"time_above_{threshold:g}_s" for threshold in self.thresholds]
+        headers.append("stabilized_at_s")
+        rows = []
+        for i, ch_id in enumerate(self.channel_ids):
+            empty = count[i] == 0
+            row = [ch_id, self.names[i], int(count[i]), float(s["valid_time"][i])]
+            row += [math.nan if empty else float(v[i]) for v in (s["min"], s["max"], mean, std)]
+            row += [float(s["above"][k, i]) for k in range(len(self.thresholds))]
+            row.append(float(self.stabilization[i]))
+            rows.append(row)
+        return headers, rows
+
+
+def compute_report(run_dir, thresholds=(), band=0.5, final_window_s=60.0, workers=None):
+    meta = load_meta(run_dir)
+    data = open_recorded_data(run_dir, meta)
+    n_rows, n_cols = data.shape
+    if not n_rows:
+        raise ValueError(f"{run_dir}: no recorded data")
+    thresholds = tuple(float(t) for t in thresholds)
+
+    bucket_rows = max(1, -(-n_rows // PLOT_POINTS))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if n_rows < MIN_PARALLEL_ROWS:
+        workers = 1
+    # Tranches alignées sur les paquets de l'enveloppe
+    n_buckets = -(-n_rows // bucket_rows)
+    bounds = [min(round(n_buckets * k / workers) * bucket_rows, n_rows) for k in range(workers + 1)]
+    segments = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+    if len(segments) == 1:
+        parts = [_segment_stats(run_dir, 0, n_rows, thresholds, bucket_rows)]
+    else:
+        with ProcessPoolExecutor(max_workers=len(segments)) as pool:
+            futures = [pool.submit(_segment_stats, run_dir, a, b, thresholds, bucket_rows)
+                       for a, b in segments]
+            parts = [f.result() for f in futures]
+    stats = _merge(parts)
+
+    final = _final_values(data, final_window_s)
+    stabilization = _stabilization(data, final, band)
+    duration = float(data[-1, 0] - data[0, 0])
+    return RunReport(run_dir, meta, thresholds, band, stats, stabilization, duration)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return "-" if math.isnan(value) else f"{value:.3f}"
+    return str(value)
+
+
+def write_summary(report, out_dir):
+    """summary.csv (valeurs brutes) et summary.txt (tableau aligné). Renvoie les chemins."""
+    os.makedirs(out_dir, exist_ok=True)
+    headers, rows = report.rows()
+
+    csv_path = os.path.join(out_dir, SUMMARY_CSV)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+    cells = [headers] + [[_format(v) for v in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = [
+        f"Run {report.meta.get('run_id', os.path.basename(report.run_dir))}"
+        f" - start {report.meta.get('start_iso', '?')} - duration {report.duration:.1f} s"
+        f" - values in {report.units}",
+        f"Stabilization band: ±{report.band:g} {report.units}",
+        "",
+    ]
+    for i, row in enumerate(cells):
+        lines.append("  ".join(cell.ljust(w) if j < 2 else cell.rjust(w)
+                               for j, (cell, w) in enumerate(zip(row, widths))))
+        if i == 0:
+            lines.append("  ".join("-" * w for w in widths))
+    txt_path = os.path.join(out_dir, SUMMARY_TXT)
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return [csv_path, txt_path]
+
+
+def _time_axis(seconds, duration):
+    if duration > 3 * 3600:
+        return seconds / 3600, "Time (h)"
+    if duration > 3 * 60:
+        return seconds / 60, "Time (min)"
+    return seconds, "Time (s)"
+
+
+def write_plots(report, out_dir, formats=("png",)):
+    """Un graphe par module (enveloppe min/max de chaque canal) ; matplotlib optionnel."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_pdf import PdfPages
+    except ImportError:
+        print("[WARN] matplotlib not installed: plots skipped (pip install matplotlib)")
+        return []
+
+    os.makedirs(out_dir, exist_ok=True)
+    stats = report.stats
+    t, x_label = _time_axis(stats["env_t"] - stats["env_t"][0], report.duration)
+    groups = {}
+    for i, ch_id in enumerate(report.channel_ids):
+        groups.setdefault(ch_id.split("/")[0], []).append(i)
+
+    figures = []
+    for device, indexes in groups.items():
+        fig, ax = plt.subplots(figsize=(11, 5))
+        for i in indexes:
+            lo = np.where(np.isfinite(stats["env_lo"][:, i]), stats["env_lo"][:, i], np.nan)
+            hi = np.where(np.isfinite(stats["env_hi"][:, i]), stats["env_hi"][:, i], np.nan)
+            line, = ax.plot(t, (lo + hi) / 2, color=report.colors[i], linewidth=0.8,
+                            label=report.names[i])
+            ax.fill_between(t, lo, hi, color=line.get_color(), alpha=0.35, linewidth=0)
+        for threshold in report.thresholds:
+            ax.axhline(threshold, color="grey", linestyle="--", linewidth=0.8)
+        ax.set_title(device)
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(f"Temperature ({report.units})")
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc="upper left", fontsize="small", ncol=2)
+        fig.tight_layout()
+        figures.append((device, fig))
+
+    paths = []
+    if "png" in formats:
+        for device, fig in figures:
+            path = os.path.join(out_dir, f"{device}.png")
+            fig.savefig(path, dpi=120)
+            paths.append(path)
+    if "pdf" in formats:
+        path = os.path.join(out_dir, "report.pdf")
+        with PdfPages(path) as pdf:
+            for _, fig in figures:
+                pdf.savefig(fig)
+        paths.append(path)
+    for _, fig in figures:
+        plt.close(fig)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.report",
+                                     description="Summary table and plots of a recorded run.")
+    parser.add_argument("run_dir", help="run folder (runs/<run_id>)")
+    parser.add_argument("--above", type=float, action="append", default=[], metavar="T",
+                        help="report time spent above T (repeatable)")
+    parser.add_argument("--band", type=float, default=0.5,
+                        help="stabilization band around the final value (default 0.5)")
+    parser.add_argument("--final-window", type=float, default=60.0, metavar="S",
+                        help="seconds averaged at the end of the run for the final value")
+    parser.add_argument("--format", action="append", choices=("png", "pdf"), dest="formats",
+                        help="plot format (repeatable, default png)")
+    parser.add_argument("--no-plots", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPUs)")
+    parser.add_argument("-o", "--out", default=None,
+                        help=f"output folder (default <run_dir>/{REPORT_DIR})")
+    args = parser.parse_args(argv)
+
+    try:
+        report = compute_report(args.run_dir, args.above, args.band,
+                                args.final_window, args.workers)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    out_dir = args.out or os.path.join(args.run_dir, REPORT_DIR)
+    paths = write_summary(report, out_dir)
+    if not args.no_plots:
+        paths += write_plots(report, out_dir, tuple(args.formats or ("png",)))
+    with open(paths[1], "r", encoding="utf-8") as f:
+        print(f.read())
+    for path in paths:
+        print(f"[INFO] Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
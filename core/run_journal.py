@@ -0,0 +1,89 @@
+import json
+import os
+import time
+
+JOURNAL_FILE = "run_journal.jsonl"
+
+
+class RunJournal:
+    """Journal d'exécution en ajout seul (une ligne JSON par évènement).
+
+    Évènements : "start" (id du run, dossier, copie de la config), "checkpoint"
+    (position dans le fichier de données, limité à un toutes les
+    `checkpoint_s` secondes), "resume" et "stop". Un run dont le dernier
+    évènement n'est pas "stop" a été interrompu (plantage, coupure secteur).
+    """
+
+    def __init__(self, path=JOURNAL_FILE, checkpoint_s=10.0):
+        self.path = path
+        self.checkpoint_s = checkpoint_s
+        self._file = None
+        self._last_checkpoint = 0.0
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        record["wall_time"] = time.time()
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start_run(self, run_id, run_dir, config):
+        # Aucun run en cours : on repart d'un journal vide pour qu'il reste petit
+        self.close()
+        self._file = open(self.path, "w")
+        self._append({"event": "start", "run_id": run_id, "run_dir": run_dir, "config": config})
+        self._last_checkpoint = time.monotonic()
+
+    def resume_run(self, run_id, position):
+        self._append({"event": "resume", "run_id": run_id, "position": position})
+        self._last_checkpoint = time.monotonic()
+
+    def checkpoint(self, run_id, position, force=False):
+        """Note la position d'enregistrement ; ne fait rien entre deux échéances."""
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint < self.checkpoint_s:
+            return False
+        self._last_checkpoint = now
+        self._append({"event": "checkpoint", "run_id": run_id, "position": position})
+        return True
+
+    def stop_run(self, run_id, position=None, abandoned=False):
+        self._append({"event": "stop", "run_id": run_id, "position": position,
+                      "abandoned": abandoned})
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def find_interrupted_run(path=JOURNAL_FILE):
+    """Renvoie l'état du dernier run non terminé, ou None.
+
+    {"run_id", "run_dir", "config", "start_time", "position"}
+    """
+    if not os.path.exists(path):
+        return None
+    run = None
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # dernière ligne tronquée par la coupure
+            event = record.get("event")
+            if event == "start":
+                run = {"run_id": record["run_id"], "run_dir": record["run_dir"],
+                       "config": record["config"], "start_time": record["wall_time"],
+                       "position": 0}
+            elif run is None or record.get("run_id") != run["run_id"]:
+                continue
+            elif event in ("checkpoint", "resume"):
+                run["position"] = record.get("position", run["position"])
+            elif event == "stop":
+                run = None
+    if run is not None and not os.path.isdir(run["run_dir"]):
+        return None
+    return run
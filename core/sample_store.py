@@ -0,0 +1,165 @@
+import numpy as np
+
+# Index min/max : paquets de 32 positions du tampon, puis x32 à chaque niveau
+INDEX_BUCKET = 32
+
+
+def _reduce_buckets(low, high, a, b):
+    """(min, max) par paquet de INDEX_BUCKET colonnes de [a, b) ; `a` aligné sur un paquet."""
+    n_buckets = -(-(b - a) // INDEX_BUCKET)
+    low, high = low[:, a:b], high[:, a:b]
+    pad = n_buckets * INDEX_BUCKET - (b - a)
+    if pad:
+        fill = np.full((low.shape[0], pad), np.nan)
+        low, high = np.hstack((low, fill)), np.hstack((high, fill))
+    shape = (low.shape[0], n_buckets, INDEX_BUCKET)
+    # fmin/fmax ignorent les NaN ; un paquet tout NaN donne NaN
+    return np.fmin.reduce(low.reshape(shape), axis=2), np.fmax.reduce(high.reshape(shape), axis=2)
+
+
+class _MinMaxPyramid:
+    """Min/max par canal des positions du tampon, par paquets emboîtés.
+
+    Un ajout ne recalcule que les paquets qu'il touche, à chaque niveau. Une
+    plage [a, b) se résout en remontant les niveaux : à chacun, seuls les
+    bouts non alignés (au plus 2 x INDEX_BUCKET éléments) sont lus, soit
+    O(log n) quelle que soit la largeur de la plage.
+    """
+
+    def __init__(self, n_rows, width):
+        self.levels = []  # (min, max), (canaux x paquets), du plus fin au plus grossier
+        while width > INDEX_BUCKET:
+            width = -(-width // INDEX_BUCKET)
+            self.levels.append((np.full((n_rows, width), np.nan), np.full((n_rows, width), np.nan)))
+
+    def update(self, buffer, a, b):
+        """Positions [a, b) écrites ; les données valides s'arrêtent à b."""
+        low, high = buffer, buffer
+        for level_low, level_high in self.levels:
+            first, n_valid = a // INDEX_BUCKET, -(-b // INDEX_BUCKET)
+            # Au-delà de b, le niveau inférieur garde des restes périmés : jamais lus
+            level_low[:, first:n_valid], level_high[:, first:n_valid] = _reduce_buckets(
+                low, high, first * INDEX_BUCKET, b)
+            a, b = first, n_valid
+            low, high = level_low, level_high
+
+    def query(self, buffer, rows, a, b):
+        """(min, max) des lignes `rows` sur les positions [a, b) ; NaN si aucune valeur."""
+        parts_low, parts_high = [], []
+        low, high = buffer, buffer
+
+        def take(x, y):
+            if y > x:
+                parts_low.append(np.fmin.reduce(low[rows, x:y], axis=None))
+                parts_high.append(np.fmax.reduce(high[rows, x:y], axis=None))
+
+        for level_low, level_high in self.levels:
+            if b - a <= 2 * INDEX_BUCKET:
+                break
+            up_a, up_b = -(-a // INDEX_BUCKET), b // INDEX_BUCKET
+            take(a, up_a * INDEX_BUCKET)
+            take(up_b * INDEX_BUCKET, b)
+            a, b = up_a, up_b
+            low, high = level_low, level_high
+        take(a, b)
+        if not parts_low:
+            return np.nan, np.nan
+        return float(np.fmin.reduce(parts_low)), float(np.fmax.reduce(parts_high))
+
+
+class SampleStore:
+    """Historique glissant des échantillons, stocké en matrice (canaux x temps).
+
+    Le tampon fait deux fois la capacité : quand il est plein, on recopie la
+    moitié la plus récente au début (coût amorti O(1) par échantillon). Les
+    données visibles restent ainsi contiguës et `timestamps()` / `values()` /
+    `series()` renvoient des vues numpy, sans copie.
+
+    Un index min/max par canal est tenu à jour à chaque ajout : `value_range()`
+    donne les bornes d'une fenêtre de temps en O(log n), sans parcourir les
+    échantillons (autoscale de l'affichage).
+    """
+
+    def __init__(self, channel_ids, capacity=3600):
+        self.channel_ids = tuple(channel_ids)
+        self.index = {ch_id: row for row, ch_id in enumerate(self.channel_ids)}
+        self.capacity = int(capacity)
+        self._t = np.empty(2 * self.capacity, dtype=np.float64)
+        self._v = np.full((len(self.channel_ids), 2 * self.capacity), np.nan, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._row_maps = {}
+        self._index = _MinMaxPyramid(len(self.channel_ids), self._t.shape[0])
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def _rows_for(self, channel_ids):
+        # Correspondance lignes du bloc -> lignes du store, calculée une fois par agencement
+        rows = self._row_maps.get(channel_ids)
+        if rows is None:
+            src, dst = [], []
+            for i, ch_id in enumerate(channel_ids):
+                row = self.index.get(ch_id)
+                if row is not None:
+                    src.append(i)
+                    dst.append(row)
+            identity = src == dst and len(dst) == len(self.channel_ids)
+            rows = (identity, np.asarray(src, dtype=np.intp), np.asarray(dst, dtype=np.intp))
+            self._row_maps[channel_ids] = rows
+        return rows
+
+    def append(self, block):
+        n = block.n_samples
+        if n == 0:
+            return
+        timestamps, values = block.timestamps, block.values
+        if n > self.capacity:
+            timestamps, values, n = timestamps[-self.capacity:], values[:, -self.capacity:], self.capacity
+
+        dirty = self._end
+        if self._end + n > self._t.shape[0]:
+            keep = min(len(self), self.capacity - n)
+            src = slice(self._end - keep, self._end)
+            self._t[:keep] = self._t[src]
+            self._v[:, :keep] = self._v[:, src]
+            self._start, self._end = 0, keep
+            dirty = 0  # tout a bougé : index reconstruit (coût amorti, comme la recopie)
+
+        dst = slice(self._end, self._end + n)
+        self._t[dst] = timestamps
+        identity, src_rows, dst_rows = self._rows_for(block.channel_ids)
+        if identity:
+            self._v[:, dst] = values
+        else:
+            self._v[:, dst] = np.nan
+            self._v[dst_rows, dst] = values[src_rows]
+        self._end += n
+        self._index.update(self._v, dirty, self._end)
+        if len(self) > self.capacity:
+            self._start = self._end - self.capacity
+
+    def timestamps(self):
+        return self._t[self._start:self._end]
+
+    def values(self):
+        return self._v[:, self._start:self._end]
+
+    def series(self, channel_id):
+        """(temps, valeurs) d'un canal, en vues sur le tampon."""
+        row = self.index[channel_id]
+        return self._t[self._start:self._end], self._v[row, self._start:self._end]
+
+    def value_range(self, t0=None, t1=None, rows=None):
+        """(min, max) des lignes `rows` (toutes par défaut) entre t0 et t1 ; NaN si rien."""
+        t = self.timestamps()
+        a = 0 if t0 is None else int(np.searchsorted(t, t0, side="left"))
+        b = len(t) if t1 is None else int(np.searchsorted(t, t1, side="right"))
+        if rows is None:
+            rows = slice(None)
+        elif not len(rows) or not len(self.channel_ids):
+            return np.nan, np.nan
+        return self._index.query(self._v, rows, self._start + a, self._start + b)
@@ -0,0 +1,489 @@
+"""Séquenceur d'essai : un plan d'étapes exécuté au rythme des blocs d'acquisition.
+
+Plan (fichier JSON, dossier sequences/ à côté de config.json) :
+
+    {"name": "Palier 80",
+     "steps": [
+        {"type": "record", "action": "start"},
+        {"type": "setpoint", "value": 80},
+        {"type": "wait_until", "channels": ["Four"], "above": 75, "timeout_s": 3600},
+        {"type": "wait_stable", "channels": ["Four"], "band": 0.5, "window_s": 300,
+         "target": "setpoint"},
+        {"type": "mark", "text": "Palier atteint"},
+        {"type": "wait", "duration_s": 600},
+        {"type": "record", "action": "stop"}]}
+
+Les canaux se désignent par identifiant, nom affiché, "module/nom" ou nom
+de module (tous ses canaux actifs). Aucun minuteur : `on_block()` reçoit
+chaque bloc, les durées se mesurent sur ses instants (horloge du moteur
+d'acquisition) et les conditions sur ses valeurs. Les actions à exécuter
+(repères, segments d'enregistrement, évènements d'étape) sont renvoyées à
+l'appelant, seul à toucher à l'interface et à l'enregistreur.
+"""
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from core.config_manager import CONFIG_FILE
+from core.recorder import RUNS_DIR
+
+PLANS_DIR = os.path.join(os.path.dirname(CONFIG_FILE), "sequences")
+# Journal de chaque exécution : une ligne JSON par évènement d'étape
+LOG_DIR = os.path.join(RUNS_DIR, "sequences")
+
+STEP_TYPES = ("wait", "wait_stable", "wait_until", "setpoint", "mark", "record")
+TIMEOUT_ACTIONS = ("abort", "continue")
+RECORD_ACTIONS = ("start", "stop")
+
+IDLE = "idle"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ABORTED = "aborted"
+
+
+class PlanError(ValueError):
+    """Plan de séquence invalide (chemin de la clé fautive en tête du message)."""
+
+
+def _number(spec, key, path, default=None, positive=True):
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or (positive and value <= 0):
+        kind = "a positive number" if positive else "a number"
+        raise PlanError(f"{path}.{key}: expected {kind}, got {value!r}")
+    return float(value)
+
+
+def _channel_names(spec, path):
+    names = spec.get("channels")
+    if isinstance(names, str):
+        names = [names]
+    if not names or not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        raise PlanError(f"{path}.channels: expected a channel name or a list of names")
+    return names
+
+
+def resolve_channels(config, names, path="channels"):
+    """Identifiants désignés par `names` (identifiant, nom, "module/nom" ou module)."""
+    aliases = {}
+    for channel in list(config.enabled_channels) + list(config.virtual_channels.values()):
+        ch_id = channel.channel_id
+        device = config.device_of(ch_id)
+        keys = {channel.display_name}
+        if device is not None:
+            keys.add(f"{device.display_name}/{channel.display_name}")
+        for key in keys:
+            aliases.setdefault(key, []).append(ch_id)
+    resolved = []
+    for name in names:
+        if config.channel(name) is not None:
+            resolved.append(name)
+            continue
+        device = config.device_by_module_name(name)
+        if device is not None and name not in aliases:
+            ids = [ch_id for ch_id, ch in device.channels.items() if ch.enabled]
+            if not ids:
+                raise PlanError(f"{path}: module {name!r} has no enabled channel")
+            resolved.extend(ids)
+            continue
+        matches = aliases.get(name)
+        if not matches:
+            raise PlanError(f"{path}: unknown channel or module {name!r}")
+        if len(matches) > 1:
+            raise PlanError(f"{path}: channel name {name!r} is ambiguous: {', '.join(matches)} "
+                            "(use the channel id or \"module/name\")")
+        resolved.append(matches[0])
+    return list(dict.fromkeys(resolved))
+
+
+# --- Étapes -------------------------------------------------------------------
+
+class _Step:
+    """Étape d'un plan ; les étapes instantanées n'ont pas de `update()`."""
+
+    waits = False
+
+    def __init__(self, spec, path):
+        self.spec = spec
+        self.kind = spec["type"]
+        self.name = spec.get("name")
+        if self.name is not None and not isinstance(self.name, str):
+            raise PlanError(f"{path}.name: expected a string, got {self.name!r}")
+        self.timeout_s = None
+        self.on_timeout = "abort"
+        self.started = None
+
+    @property
+    def label(self):
+        return self.name or self.describe()
+
+    def describe(self):
+        return self.kind
+
+    def begin(self, t, sequencer):
+        self.started = t
+
+
+class _WaitingStep(_Step):
+    waits = True
+
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        if "timeout_s" in spec:
+            self.timeout_s = _number(spec, "timeout_s", path)
+        self.on_timeout = spec.get("on_timeout", "abort")
+        if self.on_timeout not in TIMEOUT_ACTIONS:
+            raise PlanError(f"{path}.on_timeout: expected one of {', '.join(TIMEOUT_ACTIONS)}, "
+                            f"got {self.on_timeout!r}")
+        self.channel_ids = []
+
+    def update(self, t, timestamps, values):
+        """None tant que l'étape attend ; son résultat ("done") sinon."""
+        raise NotImplementedError
+
+    def progress(self, t):
+        return f"{t - self.started:.0f} s"
+
+
+class _Wait(_WaitingStep):
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.duration_s = _number(spec, "duration_s", path)
+
+    def describe(self):
+        return f"wait {self.duration_s:g} s"
+
+    def update(self, t, timestamps, values):
+        return "done" if t - self.started >= self.duration_s else None
+
+    def progress(self, t):
+        return f"{min(t - self.started, self.duration_s):.0f} / {self.duration_s:g} s"
+
+
+class _WaitStable(_WaitingStep):
+    """Écart max - min de chaque canal sous `band` sur les `window_s` dernières secondes
+    (autour de `target` si donné). Chaque bloc est résumé par ses min/max par canal :
+    la fenêtre ne garde que ces résumés, pas les échantillons."""
+
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.names = _channel_names(spec, path)
+        self.band = _number(spec, "band", path)
+        self.window_s = _number(spec, "window_s", path)
+        target = spec.get("target")
+        if target is not None and target != "setpoint":
+            target = _number(spec, "target", path, positive=False)
+        self.target_spec = target
+        self.target = None
+        self.window = deque()
+        self.spread = np.nan
+
+    def describe(self):
+        around = "" if self.target_spec is None else f" at {self.target_spec}"
+        return f"stable {', '.join(self.names)} ±{self.band:g}{around} for {self.window_s:g} s"
+
+    def begin(self, t, sequencer):
+        super().begin(t, sequencer)
+        self.target = sequencer.setpoint if self.target_spec == "setpoint" else self.target_spec
+        self.window.clear()
+        self.spread = np.nan
+
+    def update(self, t, timestamps, values):
+        self.window.append((t, np.fmin.reduce(values, axis=1), np.fmax.reduce(values, axis=1)))
+        while self.window and self.window[0][0] < t - self.window_s:
+            self.window.popleft()
+        lo = np.min([entry[1] for entry in self.window], axis=0)
+        hi = np.max([entry[2] for entry in self.window], axis=0)
+        # Canal absent (NaN) sur un bloc de la fenêtre : jamais stable
+        self.spread = float(np.max(hi - lo)) if lo.shape[0] else np.nan
+        if t - self.started < self.window_s or not np.isfinite(self.spread):
+            return None
+        if self.spread > self.band:
+            return None
+        if self.target is not None and (np.max(np.abs(hi - self.target)) > self.band
+                                        or np.max(np.abs(lo - self.target)) > self.band):
+            return None
+        return "done"
+
+    def progress(self, t):
+        return (f"spread {self.spread:.2f} / {self.band:g}, "
+                f"{min(t - self.started, self.window_s):.0f} / {self.window_s:g} s")
+
+
+class _WaitUntil(_WaitingStep):
+    """Attend qu'un échantillon passe au-dessus (`above`) ou au-dessous (`below`) du seuil,
+    sur tous les canaux ("all", défaut) ou sur au moins un ("any")."""
+
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.names = _channel_names(spec, path)
+        if ("above" in spec) == ("below" in spec):
+            raise PlanError(f"{path}: expected exactly one of \"above\" or \"below\"")
+        self.above = "above" in spec
+        self.threshold = _number(spec, "above" if self.above else "below", path, positive=False)
+        self.mode = spec.get("mode", "all")
+        if self.mode not in ("all", "any"):
+            raise PlanError(f"{path}.mode: expected \"all\" or \"any\", got {self.mode!r}")
+        self.latest = np.nan
+
+    def describe(self):
+        sign = ">" if self.above else "<"
+        return f"{self.mode} {', '.join(self.names)} {sign} {self.threshold:g}"
+
+    def update(self, t, timestamps, values):
+        # Comparaisons avec NaN fausses : un canal absent ne déclenche rien
+        reached = values > self.threshold if self.above else values < self.threshold
+        reached = reached.all(axis=0) if self.mode == "all" else reached.any(axis=0)
+        last = values[:, -1]
+        if np.isfinite(last).any():
+            self.latest = float(np.nanmin(last) if self.above == (self.mode == "all")
+                                else np.nanmax(last))
+        return "done" if reached.any() else None
+
+    def progress(self, t):
+        return f"{self.latest:.2f}, {t - self.started:.0f} s"
+
+
+class _Setpoint(_Step):
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.value = _number(spec, "value", path, positive=False)
+
+    def describe(self):
+        return f"setpoint {self.value:g}"
+
+
+class _Mark(_Step):
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.text = spec.get("text")
+        if not isinstance(self.text, str) or not self.text:
+            raise PlanError(f"{path}.text: expected a non-empty string")
+
+    def describe(self):
+        return f"mark '{self.text}'"
+
+
+class _Record(_Step):
+    def __init__(self, spec, path):
+        super().__init__(spec, path)
+        self.action = spec.get("action")
+        if self.action not in RECORD_ACTIONS:
+            raise PlanError(f"{path}.action: expected \"start\" or \"stop\", got {self.action!r}")
+
+    def describe(self):
+        return f"record {self.action}"
+
+
+_STEP_CLASSES = {"wait": _Wait, "wait_stable": _WaitStable, "wait_until": _WaitUntil,
+                 "setpoint": _Setpoint, "mark": _Mark, "record": _Record}
+
+
+# --- Plan -------------------------------------------------------------------
+
+class TestPlan:
+    """Plan validé : nom et étapes, dans l'ordre d'exécution."""
+
+    def __init__(self, name, steps, source=None):
+        self.name = name
+        self.steps = steps
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, raw, source=None):
+        if not isinstance(raw, dict):
+            raise PlanError("plan: expected an object")
+        name = raw.get("name") or (os.path.splitext(os.path.basename(source))[0] if source
+                                   else "sequence")
+        if not isinstance(name, str):
+            raise PlanError(f"name: expected a string, got {name!r}")
+        specs = raw.get("steps")
+        if not isinstance(specs, list) or not specs:
+            raise PlanError("steps: expected a non-empty list")
+        steps = []
+        for i, spec in enumerate(specs):
+            path = f"steps[{i}]"
+            if not isinstance(spec, dict) or spec.get("type") not in STEP_TYPES:
+                raise PlanError(f"{path}: expected an object with \"type\" in "
+                                f"{', '.join(STEP_TYPES)}")
+            steps.append(_STEP_CLASSES[spec["type"]](spec, path))
+        return cls(name, steps, source)
+
+    @classmethod
+    def load(cls, path):
+        """Charge et valide un plan ; OSError ou PlanError."""
+        with open(path, encoding="utf-8") as f:
+            try:
+                raw = json.load(f)
+            except ValueError as e:
+                raise PlanError(f"{os.path.basename(path)}: invalid JSON ({e})") from None
+        return cls.from_dict(raw, path)
+
+    def resolve(self, config):
+        """Canaux de chaque étape d'après la config affichée ; PlanError si un nom est inconnu."""
+        for i, step in enumerate(self.steps):
+            if isinstance(step, (_WaitStable, _WaitUntil)):
+                step.channel_ids = resolve_channels(config, step.names, f"steps[{i}].channels")
+            if isinstance(step, _WaitStable) and step.target_spec == "setpoint" and not any(
+                    isinstance(s, _Setpoint) for s in self.steps[:i]):
+                raise PlanError(f"steps[{i}].target: no setpoint step before this one")
+
+
+class Sequencer:
+    """Exécution d'un plan, pilotée par les blocs d'acquisition.
+
+    `on_block()` et `abort()` renvoient des actions, exécutées par l'appelant :
+    ("mark", t, texte), ("record", "start" | "stop"), ("event", dict) pour les
+    bornes d'étape et ("finished", état). Les instants sont ceux des blocs.
+    """
+
+    def __init__(self, plan, config):
+        plan.resolve(config)
+        self.plan = plan
+        self.sequence_id = time.strftime("%Y%m%d-%H%M%S")
+        self.state = IDLE
+        self.index = -1
+        self.setpoint = None
+        self.t = None
+        self._rows_layout = None
+        self._rows = {}
+
+    @property
+    def current(self):
+        return self.plan.steps[self.index] if 0 <= self.index < len(self.plan.steps) else None
+
+    @property
+    def running(self):
+        return self.state == RUNNING
+
+    def start(self):
+        """Armé : la première étape part avec le prochain bloc."""
+        self.state = RUNNING
+        self.index = -1
+
+    def _values(self, block, channel_ids):
+        """Lignes des canaux de l'étape (NaN pour un canal absent du bloc)."""
+        if self._rows_layout != block.channel_ids:
+            self._rows_layout = block.channel_ids
+            self._rows = {ch_id: row for row, ch_id in enumerate(block.channel_ids)}
+        values = np.full((len(channel_ids), block.n_samples), np.nan)
+        for i, ch_id in enumerate(channel_ids):
+            row = self._rows.get(ch_id)
+            if row is not None:
+                values[i] = block.values[row]
+        return values
+
+    def on_block(self, block):
+        if self.state != RUNNING or not block.n_samples:
+            return []
+        t = float(block.timestamps[-1])
+        self.t = t
+        actions = []
+        if self.index < 0:
+            self._advance(t, actions)
+            return actions
+        step = self.current
+        result = step.update(t, block.timestamps, self._values(block, step.channel_ids))
+        if result is None and step.timeout_s is not None and t - step.started >= step.timeout_s:
+            result = "timeout"
+        if result is not None:
+            self._end_step(t, result, actions)
+        return actions
+
+    def abort(self, reason="aborted by user"):
+        if self.state != RUNNING:
+            return []
+        actions = []
+        if self.current is not None and self.t is not None:
+            actions.append(("event", self._event(self.current, self.t, "end", ABORTED)))
+        self._finish(ABORTED, self.t, actions, reason)
+        return actions
+
+    # --- Enchaînement -------------------------------------------------------
+
+    def _event(self, step, t, state, result=None):
+        event = {"type": "step", "sequence": self.plan.name, "sequence_id": self.sequence_id,
+                 "index": self.index, "step": step.kind, "label": step.label,
+                 "state": state, "t": t}
+        if result is not None:
+            event["result"] = result
+        if state == "end":
+            event["duration_s"] = t - step.started
+        return event
+
+    def _end_step(self, t, result, actions):
+        step = self.current
+        actions.append(("event", self._event(step, t, "end", result)))
+        if result == "timeout" and step.on_timeout == "abort":
+            self._finish(FAILED, t, actions, f"step {self.index + 1} ({step.label}) timed out")
+            return
+        self._advance(t, actions)
+
+    def _advance(self, t, actions):
+        """Étape suivante ; les étapes instantanées s'exécutent d'un coup, jusqu'à une attente."""
+        while True:
+            self.index += 1
+            step = self.current
+            if step is None:
+                self._finish(DONE, t, actions)
+                return
+            step.begin(t, self)
+            if step.waits:
+                actions.append(("event", self._event(step, t, "start")))
+                actions.append(("mark", t, f"{self.index + 1}. {step.label}"))
+                return
+            event = self._event(step, t, "done")
+            if isinstance(step, _Setpoint):
+                self.setpoint = step.value
+                event["value"] = step.value
+                actions.append(("event", event))
+            elif isinstance(step, _Mark):
+                actions.append(("event", event))
+                actions.append(("mark", t, step.text))
+            elif step.action == "start":
+                # Évènement après l'ouverture du segment : il figure dans le nouveau run
+                actions.append(("record", "start"))
+                actions.append(("event", event))
+            else:
+                actions.append(("event", event))
+                actions.append(("record", "stop"))
+
+    def _finish(self, state, t, actions, detail=""):
+        self.state = state
+        actions.append(("event", {"type": "sequence", "sequence": self.plan.name,
+                                  "sequence_id": self.sequence_id, "state": state,
+                                  "t": t, "detail": detail}))
+        actions.append(("finished", state))
+
+    def status_text(self):
+        if self.state == RUNNING and self.current is None:
+            return f"{self.plan.name}: waiting for data"
+        if self.state != RUNNING:
+            return f"{self.plan.name}: {self.state}"
+        step = self.current
+        return (f"{self.plan.name} - step {self.index + 1}/{len(self.plan.steps)} "
+                f"{step.label}: {step.progress(self.t)}")
+
+
+class SequenceLog:
+    """Journal d'une exécution (runs/sequences/<id>.jsonl) : plan, évènements d'étape, runs."""
+
+    def __init__(self, sequencer, log_dir=LOG_DIR):
+        os.makedirs(log_dir, exist_ok=True)
+        self.path = os.path.join(log_dir, f"{sequencer.sequence_id}.jsonl")
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.write({"type": "plan", "sequence": sequencer.plan.name,
+                    "source": sequencer.plan.source,
+                    "steps": [step.spec for step in sequencer.plan.steps]})
+
+    def write(self, event):
+        event.setdefault("wall_time", time.time())
+        self._file.write(json.dumps(event) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
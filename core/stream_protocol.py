@@ -0,0 +1,99 @@
+"""Protocole binaire entre une station d'acquisition et ses abonnés.
+
+Chaque message est une trame : en-tête "<2sBBI" (b"TM", version, type,
+longueur du contenu) suivi du contenu.
+
+- HELLO    (abonné -> station, JSON) : {"name", "max_rate_hz", "batch_ms"}
+- CHANNELS (station -> abonné, JSON) : {"station", "generation", "channels":
+  [{"id", "name", "module", "device", "color"}, ...]}, renvoyé à chaque
+  changement de canaux (la génération augmente)
+- DATA     (station -> abonné, binaire) : "<IIH" (génération, échantillons n,
+  canaux k) puis n instants float64 et la matrice (k x n) en float32, dans
+  l'ordre du dernier CHANNELS
+- STATUS   (station -> abonné, JSON) : {"source", "online", "t"}
+
+Les valeurs passent en float32 (7 chiffres significatifs, NaN conservés) :
+l'affichage n'a pas besoin de plus, la moitié du débit est gagnée.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"TM"
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+DATA_HEADER = struct.Struct("<IIH")
+# Au-delà, la trame est considérée comme corrompue (flux désynchronisé)
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+HELLO = 1
+CHANNELS = 2
+DATA = 3
+STATUS = 4
+FRAME_TYPES = (HELLO, CHANNELS, DATA, STATUS)
+
+
+class ProtocolError(ValueError):
+    """Trame illisible : la connexion doit être fermée."""
+
+
+def frame(kind, payload):
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, kind, len(payload)) + payload
+
+
+def json_frame(kind, message):
+    return frame(kind, json.dumps(message, separators=(",", ":")).encode("utf-8"))
+
+
+def data_frame(generation, timestamps, values):
+    """Trame DATA d'un lot : `values` (canaux x échantillons)."""
+    timestamps = np.ascontiguousarray(timestamps, dtype="<f8")
+    values = np.ascontiguousarray(values, dtype="<f4")
+    header = DATA_HEADER.pack(generation, timestamps.shape[0], values.shape[0])
+    return frame(DATA, header + timestamps.tobytes() + values.tobytes())
+
+
+def decode_data(payload):
+    """(génération, instants, valeurs (canaux x échantillons) en float64)."""
+    if len(payload) < DATA_HEADER.size:
+        raise ProtocolError("truncated DATA frame")
+    generation, n, k = DATA_HEADER.unpack_from(payload)
+    expected = DATA_HEADER.size + 8 * n + 4 * n * k
+    if len(payload) != expected:
+        raise ProtocolError(f"DATA frame of {len(payload)} bytes, expected {expected}")
+    timestamps = np.frombuffer(payload, dtype="<f8", count=n, offset=DATA_HEADER.size)
+    values = np.frombuffer(payload, dtype="<f4", count=n * k, offset=DATA_HEADER.size + 8 * n)
+    return generation, timestamps.astype(np.float64), values.reshape(k, n).astype(np.float64)
+
+
+def decode_json(payload):
+    try:
+        return json.loads(payload.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"unreadable JSON frame: {e}") from None
+
+
+class FrameReader:
+    """Découpe un flux d'octets en trames (type, contenu), quel que soit le découpage TCP."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+        offset = 0
+        while len(self._buffer) - offset >= HEADER.size:
+            magic, version, kind, length = HEADER.unpack_from(self._buffer, offset)
+            if magic != MAGIC or version != PROTOCOL_VERSION:
+                raise ProtocolError(f"bad frame header {bytes(self._buffer[offset:offset + 4])!r}")
+            if kind not in FRAME_TYPES or length > MAX_FRAME_BYTES:
+                raise ProtocolError(f"bad frame (type {kind}, {length} bytes)")
+            end = offset + HEADER.size + length
+            if end > len(self._buffer):
+                break
+            frames.append((kind, bytes(self._buffer[offset + HEADER.size:end])))
+            offset = end
+        del self._buffer[:offset]
+        return frames
@@ -0,0 +1,232 @@
+import ast
+import fnmatch
+import re
+import warnings
+
+import numpy as np
+
+# Référence à un canal physique dans une expression : "cDAQ2Mod1/ai0", "cDAQ2Mod*/ai*".
+# Tout mot contenant un "/" est une référence : entourer les opérateurs d'espaces.
+CHANNEL_REF = re.compile(r"[A-Za-z_][\w*?]*/[\w*?]+")
+VIRTUAL_NAME = re.compile(r"^[A-Za-z_]\w*$")
+
+# Réductions disponibles ; elles s'appliquent sur l'axe des canaux (axe 0)
+REDUCTIONS = {
+    "mean": np.mean,
+    "min": np.min,
+    "max": np.max,
+    "sum": np.sum,
+    "nanmean": np.nanmean,
+    "nanmin": np.nanmin,
+    "nanmax": np.nanmax,
+}
+ELEMENTWISE = {
+    "abs": np.abs,
+}
+BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+}
+
+
+class _Row:
+    """Référence directe à une ligne de la matrice (vue, sans copie)."""
+
+    __slots__ = ("row",)
+
+    def __init__(self, row):
+        self.row = row
+
+    def __call__(self, m):
+        return m[self.row]
+
+
+class _Group:
+    """Ensemble de lignes de la matrice (issu d'un motif avec joker)."""
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows):
+        self.rows = np.asarray(rows, dtype=np.intp)
+
+
+class _Compiler:
+    def __init__(self, index, virtual_rows):
+        self.index = index
+        self.virtual_rows = virtual_rows
+
+    def compile(self, expression):
+        refs = []
+
+        def _placeholder(match):
+            refs.append(match.group(0))
+            return f"__ref{len(refs) - 1}__"
+
+        source = CHANNEL_REF.sub(_placeholder, expression)
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"invalid expression: {e.msg}") from None
+        self.refs = refs
+        node = self._node(tree.body)
+        if isinstance(node, _Group):
+            raise ValueError("a channel pattern must be wrapped in a reduction, e.g. mean(...)")
+        return node
+
+    def _resolve(self, pattern):
+        if any(c in pattern for c in "*?"):
+            rows = [row for ch_id, row in self.index.items() if fnmatch.fnmatchcase(ch_id, pattern)]
+            if not rows:
+                raise ValueError(f"no enabled channel matches {pattern!r}")
+            return _Group(sorted(rows))
+        if pattern not in self.index:
+            raise ValueError(f"unknown or disabled channel {pattern!r}")
+        return _Row(self.index[pattern])
+
+    def _node(self, node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            value = float(node.value)
+            return lambda m: value
+        if isinstance(node, ast.Name):
+            if node.id.startswith("__ref"):
+                return self._resolve(self.refs[int(node.id[5:-2])])
+            if node.id in self.virtual_rows:
+                return _Row(self.virtual_rows[node.id])
+            raise ValueError(f"unknown name {node.id!r}")
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self._scalar(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return lambda m: np.negative(operand(m))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            op = BINARY_OPS[type(node.op)]
+            left, right = self._scalar(node.left), self._scalar(node.right)
+            return lambda m: op(left(m), right(m))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in ELEMENTWISE and len(node.args) == 1:
+                func, arg = ELEMENTWISE[name], self._scalar(node.args[0])
+                return lambda m: func(arg(m))
+            if name in REDUCTIONS and node.args:
+                return self._reduction(REDUCTIONS[name], [self._node(a) for a in node.args])
+        raise ValueError(f"unsupported syntax: {ast.unparse(node)}")
+
+    def _scalar(self, node):
+        compiled = self._node(node)
+        if isinstance(compiled, _Group):
+            raise ValueError("a channel pattern must be wrapped in a reduction, e.g. mean(...)")
+        return compiled
+
+    def _reduction(self, func, args):
+        # Les références directes sont regroupées en un seul index : un seul
+        # "gather" + une réduction numpy, quel que soit le nombre de canaux.
+        rows, others = [], []
+        for arg in args:
+            if isinstance(arg, _Group):
+                rows.extend(arg.rows.tolist())
+            elif isinstance(arg, _Row):
+                rows.append(arg.row)
+            else:
+                others.append(arg)
+        rows = np.asarray(rows, dtype=np.intp)
+
+        if not others:
+            return lambda m: func(m[rows], axis=0)
+
+        def _evaluate(m):
+            parts = [np.broadcast_to(f(m), m.shape[1:]) for f in others]
+            stacked = np.vstack((m[rows], *parts)) if rows.size else np.vstack(parts)
+            return func(stacked, axis=0)
+        return _evaluate
+
+
+class VirtualChannelPlan:
+    """Plan d'évaluation compilé une fois, appliqué à chaque bloc.
+
+    `evaluate(matrix)` prend la matrice (canaux physiques x échantillons) et
+    renvoie la matrice (canaux virtuels x échantillons) : le coût dépend du
+    nombre d'opérations numpy, pas du nombre d'échantillons.
+    """
+
+    def __init__(self, channel_ids, steps):
+        self.channel_ids = tuple(channel_ids)
+        self._steps = steps
+
+    def __bool__(self):
+        return bool(self._steps)
+
+    def evaluate(self, matrix):
+        n_physical = matrix.shape[0]
+        out = np.empty((n_physical + len(self._steps), matrix.shape[1]), dtype=np.float64)
+        out[:n_physical] = matrix
+        # Un thermocouple déconnecté donne NaN : pas d'avertissement à chaque bloc
+        with warnings.catch_warnings(), np.errstate(all="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for i, step in enumerate(self._steps):
+                out[n_physical + i] = step(out)
+        return out[n_physical:]
+
+
+def _dependencies(expression, names):
+    source = CHANNEL_REF.sub("0", expression)
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError:
+        return set()
+    return {n.id for n in ast.walk(tree) if isinstance(n, ast.Name) and n.id in names}
+
+
+def compile_virtual_channels(definitions, physical_channel_ids):
+    """Compile les canaux virtuels de la config.
+
+    `definitions` est {nom: VirtualChannelConfig} (config.virtual_channels).
+    Renvoie (plan, erreurs) ; une définition invalide est écartée et son
+    erreur ajoutée à la liste {nom: message}.
+    """
+    index = {ch_id: row for row, ch_id in enumerate(physical_channel_ids)}
+    errors = {}
+    pending = {}
+    for name, definition in (definitions or {}).items():
+        if not VIRTUAL_NAME.match(name):
+            errors[name] = "name must be an identifier (letters, digits, underscore)"
+        elif not definition.enabled:
+            continue
+        else:
+            pending[name] = definition.expression
+
+    # Ordre topologique : un canal virtuel peut en référencer un autre
+    order, state = [], {}
+
+    def _visit(name):
+        if state.get(name) == "done":
+            return True
+        if state.get(name) == "visiting":
+            errors[name] = "circular reference"
+            return False
+        state[name] = "visiting"
+        ok = all(_visit(dep) for dep in _dependencies(pending[name], pending))
+        state[name] = "done"
+        if ok:
+            order.append(name)
+        else:
+            errors.setdefault(name, "depends on an invalid virtual channel")
+        return ok
+
+    for name in pending:
+        _visit(name)
+
+    steps, names, virtual_rows = [], [], {}
+    for name in order:
+        compiler = _Compiler(index, virtual_rows)
+        try:
+            step = compiler.compile(pending[name])
+        except ValueError as e:
+            errors[name] = str(e)
+            continue
+        virtual_rows[name] = len(index) + len(steps)
+        steps.append(step)
+        names.append(name)
+
+    return VirtualChannelPlan(names, steps), errors
@@ -2,9 +2,10 @@ import sys
 import os
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QTimer, QCoreApplication, Qt
 from ui.main_window import MainWindow
 from ui.loading_dialog import LoadingDialog
+from core.config_manager import load_config
 
 # 👇 Déclare window en global pour éviter qu’il soit détruit
 window = None
@@ -15,7 +16,23 @@ def launch_main_window(loading):
     loading.close()
     window.show()
 
+def use_software_opengl(display_cfg):
+    """OpenGL logiciel si demandé, ou par défaut sur un Linux sans écran (CI headless)"""
+    if display_cfg.get("renderer") != "opengl":
+        return False
+    headless = sys.platform.startswith("linux") and not os.environ.get("DISPLAY") \
+        and not os.environ.get("WAYLAND_DISPLAY")
+    return display_cfg.get("software_opengl", headless)
+
 if __name__ == "__main__":
+    # Doit être fixé avant la création de QApplication
+    try:
+        display_cfg = load_config().section("display")
+    except (OSError, ValueError):
+        display_cfg = {}  # la fenêtre principale signalera l'erreur
+    if use_software_opengl(display_cfg):
+        QCoreApplication.setAttribute(Qt.AA_UseSoftwareOpenGL)
+
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
 
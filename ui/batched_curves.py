@@ -0,0 +1,154 @@
+from functools import lru_cache
+
+import numpy as np
+import pyqtgraph as pg
+from PySide6.QtCore import QRectF
+from PySide6.QtGui import QPainterPath, QOpenGLContext, QOffscreenSurface
+
+from utils.palette import cached_pen
+
+# Moteurs de rendu disponibles pour les courbes de canaux (config["display"]["renderer"])
+RENDERERS = ("items", "batched", "opengl")
+
+
+@lru_cache(maxsize=None)
+def opengl_available():
+    """Vérifie qu'un contexte OpenGL (matériel ou logiciel) peut être créé."""
+    context = QOpenGLContext()
+    if not context.create():
+        return False
+    surface = QOffscreenSurface()
+    surface.create()
+    ok = context.makeCurrent(surface)
+    if ok:
+        context.doneCurrent()
+    return ok
+
+
+class MultiCurveItem(pg.GraphicsObject):
+    """Dessine toutes les courbes d'une matrice (canaux x temps) en un seul item.
+
+    Les canaux partageant la même couleur sont regroupés dans un seul
+    QPainterPath : un `drawPath` par couleur au lieu d'un PlotDataItem par
+    canal. La visibilité est un masque booléen par ligne, pas un setVisible
+    par item.
+
+    `rows` restreint l'item à un sous-ensemble de lignes de la matrice (un
+    panneau) : plusieurs items peuvent ainsi lire la même matrice.
+    """
+
+    def __init__(self, colors, rows=None, width=2):
+        super().__init__()
+        self._x = np.empty(0)
+        self._values = np.empty((len(colors), 0))
+        self._member = np.zeros(len(colors), dtype=bool)
+        self._member[list(range(len(colors))) if rows is None else list(rows)] = True
+        self._mask = self._member.copy()
+        self._bounds = None
+        self._paths = None
+        self._width = width
+        self.setColors(colors)
+
+    def setColors(self, colors):
+        """Regroupe les lignes par couleur, avec un stylo par couleur (créé une fois)."""
+        groups = {}
+        for row, color in enumerate(colors):
+            if self._member[row]:
+                groups.setdefault(color.strip(), []).append(row)
+        self._groups = [(cached_pen(color, self._width), np.asarray(rows, dtype=np.intp))
+                        for color, rows in groups.items()]
+        self._paths = None
+        self.update()
+
+    def setData(self, x, values, y_range=None):
+        """`x` : temps (n,) ; `values` : matrice (canaux x n), typiquement une vue du SampleStore.
+
+        `y_range` : (min, max) des lignes visibles s'il est déjà connu (index du
+        store) ; sinon calculé sur la matrice au premier besoin.
+        """
+        self._x = x
+        self._values = values
+        self._invalidate()
+        if y_range is not None and x.shape[0] and np.isfinite(y_range).all():
+            self._bounds = (float(x[0]), float(x[-1])) + tuple(map(float, y_range))
+
+    def setVisibleMask(self, mask):
+        mask = np.asarray(mask, dtype=bool) & self._member
+        if not np.array_equal(mask, self._mask):
+            self._mask = mask
+            self._invalidate()
+
+    def setRowVisible(self, row, visible):
+        visible = bool(visible) and self._member[row]
+        if self._mask[row] != visible:
+            self._mask = self._mask.copy()
+            self._mask[row] = visible
+            self._invalidate()
+
+    def visibleRows(self):
+        return np.flatnonzero(self._mask)
+
+    def _invalidate(self):
+        self.prepareGeometryChange()
+        self._bounds = None
+        self._paths = None
+        self.informViewBoundsChanged()
+        self.update()
+
+    def _build_paths(self):
+        paths = []
+        n = self._x.shape[0]
+        if n:
+            for pen, rows in self._groups:
+                rows = rows[self._mask[rows]]
+                if not rows.size:
+                    continue
+                # Toutes les courbes du groupe bout à bout, sans relier la fin
+                # d'une courbe au début de la suivante
+                x = np.tile(self._x, rows.size)
+                y = self._values[rows].ravel()
+                connect = np.ones(x.shape[0], dtype=np.int32)
+                connect[n - 1::n] = 0
+                # NaN (voie déconnectée, trou enregistré) : ni segment entrant ni sortant
+                finite = np.isfinite(y)
+                if not finite.all():
+                    connect &= finite & np.r_[finite[1:], False]
+                    y = np.where(finite, y, 0.0)  # point isolé, jamais tracé
+                paths.append((pen, pg.arrayToQPath(x, y, connect=connect)))
+        return paths
+
+    def _data_bounds(self):
+        if self._bounds is None:
+            visible = self._values[self._mask] if self._x.shape[0] else self._values[:0]
+            if visible.size and np.isfinite(visible).any():
+                self._bounds = (float(self._x[0]), float(self._x[-1]),
+                                float(np.nanmin(visible)), float(np.nanmax(visible)))
+            else:
+                self._bounds = ()
+        return self._bounds
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        bounds = self._data_bounds()
+        if not bounds:
+            return None
+        return bounds[0:2] if ax == 0 else bounds[2:4]
+
+    def boundingRect(self):
+        bounds = self._data_bounds()
+        if not bounds:
+            return QRectF()
+        x0, x1, y0, y1 = bounds
+        return QRectF(x0, y0, x1 - x0, y1 - y0)
+
+    def paint(self, p, *args):
+        if self._paths is None:
+            self._paths = self._build_paths()
+        p.setRenderHint(p.RenderHint.Antialiasing, pg.getConfigOption("antialias"))
+        for pen, path in self._paths:
+            p.setPen(pen)
+            p.drawPath(path)
+
+    def shape(self):
+        path = QPainterPath()
+        path.addRect(self.boundingRect())
+        return path
@@ -1,12 +1,22 @@
 import os
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QColorDialog, QCheckBox, QScrollArea, QWidget, QGroupBox, QMessageBox, QScrollArea,QComboBox
+    QColorDialog, QCheckBox, QScrollArea, QWidget, QGroupBox, QMessageBox, QScrollArea,QComboBox,
+    QListWidget, QPlainTextEdit, QInputDialog, QTreeView, QAbstractItemView, QHeaderView,
+    QFileDialog
 )
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QColor
+from PySide6.QtCore import Qt, Signal, QObject, QThread
+from PySide6.QtGui import QColor, QStandardItemModel, QStandardItem
 from functools import partial
-import nidaqmx.system
+
+from core.config_model import (ThermotionConfig, DeviceConfig, ChannelConfig, ConfigError,
+                               THERMOCOUPLE_TYPES)
+from core.device_manager import get_topology, cached_topology
+from utils.palette import channel_color
+from core.profiles import (list_profiles, load_profile, save_profile, delete_profile,
+                           diff_configs, active_profile, PROFILES_DIR)
+from core.recorder import RUNS_DIR
+from core.reference_runs import ReferenceRun, ALIGN_START
 
 
 class ChannelConfigDialog(QDialog):
@@ -93,138 +103,166 @@ class ChannelConfigDialog(QDialog):
             "thermocouple_type": self.thermo_combo.currentText()
         }
 
-class DeviceScannerDialog(QDialog):
-    config_updated = Signal(dict)
-
-    def __init__(self, parent=None, existing_config=None):
-        super().__init__(parent)
-        self.setWindowTitle("Device Configuration")
-        self.setMinimumSize(800, 600)
-        self.setStyleSheet("""
-            QDialog { font-size: 12px; }
-            QGroupBox { font-size: 12px; font-weight: bold; }
-        """)
-        self.existing_config = existing_config or {}
-        self.channel_custom_data = {}
-        self.channel_labels = {}
-        self.channel_checkboxes = {}
-        self.main_layout = QVBoxLayout(self)
-        self.devices = self.detect_devices()
-        self.init_ui()
-
-    def detect_devices(self):
-        try:
-            system = nidaqmx.system.System.local()
-            return [d for d in system.devices if "Mod" in d.name]
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Device detection failed:\n{str(e)}")
-            return []
+class BulkChannelDialog(QDialog):
+    """Édition groupée : seuls les champs modifiés sont appliqués à tous les canaux.
 
-    def init_ui(self):
-        layout = self.main_layout
-        # vider le layout explicitement
-        while layout.count():
-            item = layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-        self.module_channels = {}
-        if not self.devices:
-            layout.addWidget(QLabel("No NI-DAQmx modules detected"))
-            retry_btn = QPushButton("Retry")
-            retry_btn.clicked.connect(self.retry_detection)
-            layout.addWidget(retry_btn)
-            return
+    Les cases Enabled / Visible sont à trois états ; l'état intermédiaire
+    (par défaut) laisse la valeur de chaque canal inchangée.
+    """
+    UNCHANGED = "(unchanged)"
+    COLOR_SINGLE = "Single color"
+    COLOR_PALETTE = "Distinct palette"
+    COLOR_DEFAULT = "Default per channel"
 
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        content = QWidget()
-        scroll_layout = QVBoxLayout(content)
-        self.device_widgets = []
-
-        self.module_channels = {}  # Initialise une fois en haut de init_ui()
-
-        for device in self.devices:
-            device_name = device.name
-            self.module_channels[device_name] = []  # ✅ Init liste des canaux pour ce module
-
-            mod_num = device.name.split("Mod")[1]
-            chassis = device.name.split("Mod")[0] + "Chassis"
-            online_devices = [d.name for d in nidaqmx.system.System.local().devices]
-            is_online = device.name in online_devices
-
-            display_name = f"{chassis} > Module {mod_num}"
-            if not is_online:
-                display_name += " (offline)"
-
-            group = QGroupBox(display_name)
-            group.setCheckable(True)
-            group.setChecked(True)
-            layout_inner = QVBoxLayout()
+    def __init__(self, channel_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Edit Channels")
+        self.setFixedSize(400, 260)
+        self.setStyleSheet("font-size: 12px;")
+        self.color = "#ffffff"
 
-            name_layout = QHBoxLayout()
-            name_layout.addWidget(QLabel("Module Name:"))
-            saved_name = self.existing_config.get("devices", {}).get(device.name, {}).get("display_name", device.name)
-            name_edit = QLineEdit(saved_name)
-            name_edit.setStyleSheet("font-size: 12px;")
-            name_layout.addWidget(name_edit)
-            layout_inner.addLayout(name_layout)
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{channel_count} channels selected"))
 
-            channels_group = QGroupBox("Channels")
-            channels_group.setStyleSheet("font-size: 12px;")
-            channels_layout = QVBoxLayout()
+        thermo_layout = QHBoxLayout()
+        thermo_layout.addWidget(QLabel("Thermocouple Type:"))
+        self.thermo_combo = QComboBox()
+        self.thermo_combo.addItems([self.UNCHANGED, *THERMOCOUPLE_TYPES])
+        thermo_layout.addWidget(self.thermo_combo)
+        layout.addLayout(thermo_layout)
 
-            try:
-                channels = [c.name.split('/')[-1] for c in device.ai_physical_chans]
-                for ch in sorted(channels):
-                    channel_id = f"{device.name}/{ch}"
+        color_layout = QHBoxLayout()
+        color_layout.addWidget(QLabel("Color:"))
+        self.color_combo = QComboBox()
+        self.color_combo.addItems([self.UNCHANGED, self.COLOR_SINGLE, self.COLOR_PALETTE,
+                                   self.COLOR_DEFAULT])
+        self.color_combo.currentTextChanged.connect(
+            lambda text: self.color_btn.setEnabled(text == self.COLOR_SINGLE))
+        color_layout.addWidget(self.color_combo)
+        self.color_btn = QPushButton()
+        self.color_btn.setFixedSize(50, 30)
+        self.color_btn.setEnabled(False)
+        self.color_btn.setStyleSheet(f"background-color: {self.color};")
+        self.color_btn.clicked.connect(self.pick_color)
+        color_layout.addWidget(self.color_btn)
+        layout.addLayout(color_layout)
 
-                    ch_config = {
-                        "display_name": ch,
-                        "color": "#{:06x}".format(hash(channel_id) % 0xffffff),
-                        "visible": True
-                    }
+        self.enabled_cb = QCheckBox("Enabled (acquired)")
+        self.visible_cb = QCheckBox("Visible")
+        for cb in (self.enabled_cb, self.visible_cb):
+            cb.setTristate(True)
+            cb.setCheckState(Qt.PartiallyChecked)
+            layout.addWidget(cb)
 
-                    if device.name in self.existing_config.get("devices", {}):
-                        ch_saved = self.existing_config["devices"][device.name]["channels"].get(channel_id)
-                        if ch_saved:
-                            ch_config.update(ch_saved)
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        apply_btn = QPushButton("Apply")
+        apply_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(apply_btn)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(cancel_btn)
+        layout.addLayout(btn_layout)
 
-                    self.channel_custom_data[channel_id] = ch_config
-                    self.module_channels[device_name].append(channel_id)  # ✅ Ajout ici
+    def pick_color(self):
+        color = QColorDialog.getColor(QColor(self.color))
+        if color.isValid():
+            self.color = color.name()
+            self.color_btn.setStyleSheet(f"background-color: {self.color};")
+
+    def use_palette(self):
+        return self.color_combo.currentText() == self.COLOR_PALETTE
+
+    def use_channel_defaults(self):
+        return self.color_combo.currentText() == self.COLOR_DEFAULT
+
+    def get_changes(self):
+        """Champs communs à appliquer (sans la couleur en mode palette)."""
+        changes = {}
+        if self.thermo_combo.currentText() != self.UNCHANGED:
+            changes["thermocouple_type"] = self.thermo_combo.currentText()
+        if self.color_combo.currentText() == self.COLOR_SINGLE:
+            changes["color"] = self.color
+        for key, cb in (("enabled", self.enabled_cb), ("visible", self.visible_cb)):
+            if cb.checkState() != Qt.PartiallyChecked:
+                changes[key] = cb.checkState() == Qt.Checked
+        return changes
+
+
+class TopologyScanWorker(QObject):
+    """Énumère la topologie dans un thread, pour ne pas figer l'ouverture du dialogue."""
+    finished = Signal(object)  # tuple de ModuleInfo
+    failed = Signal(str)
+
+    def __init__(self, refresh=False):
+        super().__init__()
+        self.refresh = refresh
+
+    def run(self):
+        try:
+            self.finished.emit(get_topology(refresh=self.refresh))
+        except Exception as e:
+            self.failed.emit(str(e))
 
-                    ch_layout = QHBoxLayout()
-                    cb = QCheckBox()
-                    cb.setChecked(ch_config["visible"])
-                    cb.stateChanged.connect(lambda state, cid=channel_id: self.set_channel_visibility(cid, state))
-                    self.channel_checkboxes[channel_id] = cb
-                    ch_layout.addWidget(cb)
 
-                    label = QLabel(f"{ch}: {ch_config['display_name']}")
-                    self.channel_labels[channel_id] = label
-                    ch_layout.addWidget(label)
-                    ch_layout.addStretch()
+# Rôles des items de l'arbre des modules
+ROLE_DEVICE = Qt.UserRole + 1      # nom du module (lignes module et canal)
+ROLE_CHANNEL = Qt.UserRole + 2     # identifiant du canal (lignes canal seulement)
+ROLE_PLACEHOLDER = Qt.UserRole + 3  # enfant factice d'un module pas encore déplié
 
-                    edit_btn = QPushButton("Edit")
-                    edit_btn.setFixedWidth(80)
-                    edit_btn.setStyleSheet("font-size: 12px;")
-                    edit_btn.clicked.connect(partial(self.edit_channel, device.name, ch))
-                    ch_layout.addWidget(edit_btn)
+COL_ITEM, COL_NAME, COL_TYPE, COL_COLOR = range(4)
 
-                    channels_layout.addLayout(ch_layout)
 
-                channels_group.setLayout(channels_layout)
-                layout_inner.addWidget(channels_group)
+class DeviceScannerDialog(QDialog):
+    config_updated = Signal(object)  # ThermotionConfig
 
-            except Exception as e:
-                QMessageBox.warning(self, "Warning", f"Could not read channels:\n{str(e)}")
+    def __init__(self, parent=None, existing_config=None):
+        super().__init__(parent)
+        self.setWindowTitle("Device Configuration")
+        self.setMinimumSize(800, 600)
+        self.setStyleSheet("""
+            QDialog { font-size: 12px; }
+        """)
+        self.existing_config = existing_config or ThermotionConfig()
+        self.topology = ()
+        self.channel_custom_data = {}   # rempli à la demande (dépliage, édition, sélection)
+        self.module_items = {}          # module -> (item case à cocher, item nom)
+        self.channel_items = {}         # canal -> ligne d'items, pour les modules dépliés
+        self.scan_thread = None
+        self._updating = False
+        self.init_ui()
 
-            group.setLayout(layout_inner)
-            scroll_layout.addWidget(group)
-            self.device_widgets.append((group, name_edit, device))
+        topology = cached_topology()
+        if topology is not None:
+            self.set_topology(topology)
+        else:
+            self.start_scan()
 
-        scroll.setWidget(content)
-        layout.addWidget(scroll)
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        status_layout.addWidget(self.status_label, 1)
+        self.rescan_btn = QPushButton("Rescan")
+        self.rescan_btn.clicked.connect(lambda: self.start_scan(refresh=True))
+        status_layout.addWidget(self.rescan_btn)
+        layout.addLayout(status_layout)
+
+        # Modules repliés par défaut ; les canaux ne sont créés qu'au dépliage
+        self.model = QStandardItemModel(0, 4, self)
+        self.model.setHorizontalHeaderLabels(["Module / Channel", "Name", "Type", "Color"])
+        self.model.itemChanged.connect(self.on_item_changed)
+        self.tree = QTreeView()
+        self.tree.setModel(self.model)
+        self.tree.setUniformRowHeights(True)
+        self.tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tree.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        self.tree.expanded.connect(self.load_channels)
+        self.tree.doubleClicked.connect(self.on_double_click)
+        self.tree.header().setSectionResizeMode(COL_ITEM, QHeaderView.ResizeToContents)
+        self.tree.header().setSectionResizeMode(COL_NAME, QHeaderView.Stretch)
+        layout.addWidget(self.tree)
 
         toggle_layout = QHBoxLayout()
         select_all_btn = QPushButton("Select All")
@@ -233,119 +271,481 @@ class DeviceScannerDialog(QDialog):
         unselect_all_btn.clicked.connect(lambda: self.set_all_visibility(False))
         toggle_layout.addWidget(select_all_btn)
         toggle_layout.addWidget(unselect_all_btn)
+        select_sel_btn = QPushButton("Enable Selected")
+        unselect_sel_btn = QPushButton("Disable Selected")
+        select_sel_btn.clicked.connect(lambda: self.set_selected_visibility(True))
+        unselect_sel_btn.clicked.connect(lambda: self.set_selected_visibility(False))
+        toggle_layout.addWidget(select_sel_btn)
+        toggle_layout.addWidget(unselect_sel_btn)
         layout.addLayout(toggle_layout)
 
         btn_layout = QHBoxLayout()
         btn_layout.addStretch()
-        apply_btn = QPushButton("Apply")
-        apply_btn.setStyleSheet("font-size: 12px;")
-        apply_btn.clicked.connect(self.apply_config)
+        self.apply_btn = QPushButton("Apply")
+        self.apply_btn.setStyleSheet("font-size: 12px;")
+        self.apply_btn.clicked.connect(self.apply_config)
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setStyleSheet("font-size: 12px;")
         cancel_btn.clicked.connect(self.reject)
-        btn_layout.addWidget(apply_btn)
+        btn_layout.addWidget(self.apply_btn)
         btn_layout.addWidget(cancel_btn)
         layout.addLayout(btn_layout)
 
+    # --- Scan en arrière-plan ---------------------------------------------------
+
+    def start_scan(self, refresh=False):
+        if self.scan_thread is not None:
+            return
+        self.status_label.setText("Scanning devices...")
+        self.rescan_btn.setEnabled(False)
+        self.apply_btn.setEnabled(False)
+
+        self.scan_worker = TopologyScanWorker(refresh)
+        self.scan_thread = QThread(self)
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.finished.connect(self.set_topology)
+        self.scan_worker.failed.connect(self.show_scan_error)
+        self.scan_worker.finished.connect(self.end_scan)
+        self.scan_worker.failed.connect(self.end_scan)
+        self.scan_thread.start()
+
+    def end_scan(self, *args):
+        if self.scan_thread is not None:
+            self.scan_thread.quit()
+            self.scan_thread.wait()
+            self.scan_worker.deleteLater()
+            self.scan_thread.deleteLater()
+            self.scan_thread = None
+        self.rescan_btn.setEnabled(True)
+
+    def show_scan_error(self, message):
+        self.status_label.setText(f"Device detection failed: {message}")
+
+    def done(self, result):
+        # Pas de fermeture avec un scan en cours dans un thread orphelin
+        self.end_scan()
+        super().done(result)
+
+    # --- Arbre ------------------------------------------------------------------
+
+    def set_topology(self, topology):
+        """(Re)remplit l'arbre : une ligne par module, canaux chargés au dépliage."""
+        self.topology = topology
+        self.module_items.clear()
+        self.channel_items.clear()
+        self._updating = True
+        self.model.removeRows(0, self.model.rowCount())
+        for module in topology:
+            saved_device = self.existing_config.devices.get(module.name)
+            check_item = QStandardItem(f"{module.chassis}Chassis > Module {module.module_number}")
+            check_item.setCheckable(True)
+            check_item.setCheckState(Qt.Checked if saved_device is None or saved_device.enabled
+                                     else Qt.Unchecked)
+            check_item.setEditable(False)
+            check_item.setData(module.name, ROLE_DEVICE)
+            name_item = QStandardItem(saved_device.display_name if saved_device else module.name)
+            type_item = QStandardItem(f"error: {module.error}" if module.error else
+                                      f"{module.product_type} ({len(module.channels)} ch)".strip())
+            type_item.setEditable(False)
+            info_item = QStandardItem()
+            info_item.setEditable(False)
+
+            placeholder = QStandardItem()
+            placeholder.setData(True, ROLE_PLACEHOLDER)
+            placeholder.setEditable(False)
+            if module.channels:
+                check_item.appendRow(placeholder)
+            self.model.appendRow([check_item, name_item, type_item, info_item])
+            self.module_items[module.name] = (check_item, name_item)
+        self._updating = False
+
+        if topology:
+            total = sum(len(m.channels) for m in topology)
+            self.status_label.setText(f"{len(topology)} modules, {total} channels")
+        else:
+            self.status_label.setText("No NI-DAQmx modules detected")
+        self.apply_btn.setEnabled(bool(topology))
+
+    def module_info(self, device_name):
+        for module in self.topology:
+            if module.name == device_name:
+                return module
+        return None
+
+    def load_channels(self, index):
+        """Crée les lignes de canaux d'un module à son premier dépliage."""
+        check_item = self.model.itemFromIndex(index.siblingAtColumn(COL_ITEM))
+        if check_item is None or check_item.parent() is not None:
+            return
+        first = check_item.child(0)
+        if first is None or not first.data(ROLE_PLACEHOLDER):
+            return
+        module = self.module_info(check_item.data(ROLE_DEVICE))
+        self._updating = True
+        check_item.removeRow(0)
+        for ch in module.channels:
+            channel_id = f"{module.name}/{ch}"
+            data = self.channel_data(channel_id)
+            item = QStandardItem(ch)
+            item.setCheckable(True)
+            item.setCheckState(Qt.Checked if self.is_channel_checked(data) else Qt.Unchecked)
+            item.setEditable(False)
+            item.setData(module.name, ROLE_DEVICE)
+            item.setData(channel_id, ROLE_CHANNEL)
+            name_item = QStandardItem(data["display_name"])
+            name_item.setData(channel_id, ROLE_CHANNEL)
+            type_item = QStandardItem(data.get("thermocouple_type", "T"))
+            type_item.setEditable(False)
+            color_item = QStandardItem(data["color"])
+            color_item.setData(QColor(data["color"]), Qt.DecorationRole)
+            color_item.setEditable(False)
+            row = [item, name_item, type_item, color_item]
+            check_item.appendRow(row)
+            self.channel_items[channel_id] = row
+        self._updating = False
+
+    def channel_data(self, channel_id):
+        """Réglages d'un canal (défauts + config existante), créés au premier accès."""
+        data = self.channel_custom_data.get(channel_id)
+        if data is None:
+            data = {
+                "display_name": channel_id.split("/")[-1],
+                "color": channel_color(channel_id),
+                "visible": True,
+                "thermocouple_type": "T"  # ✅ par défaut
+            }
+            ch_saved = self.existing_config.channel(channel_id)
+            if ch_saved:
+                data.update(ch_saved.to_dict())
+            self.channel_custom_data[channel_id] = data
+        return data
+
+    @staticmethod
+    def is_channel_checked(data):
+        return data.get("enabled", True) and data["visible"]
+
+    def set_channel_checked(self, channel_id, checked):
+        data = self.channel_data(channel_id)
+        data["visible"] = data["enabled"] = bool(checked)
+        row = self.channel_items.get(channel_id)
+        if row is not None:
+            self._updating = True
+            row[COL_ITEM].setCheckState(Qt.Checked if checked else Qt.Unchecked)
+            self._updating = False
+
+    def on_item_changed(self, item):
+        if self._updating:
+            return
+        channel_id = item.data(ROLE_CHANNEL)
+        if channel_id is None:
+            return  # module : case et nom relus à l'application
+        if item.column() == COL_ITEM:
+            self.set_channel_checked(channel_id, item.checkState() == Qt.Checked)
+        elif item.column() == COL_NAME:
+            self.channel_data(channel_id)["display_name"] = item.text()
+
+    def on_double_click(self, index):
+        channel_id = index.siblingAtColumn(COL_ITEM).data(ROLE_CHANNEL)
+        if channel_id is not None and index.column() != COL_NAME:
+            device_name, channel_name = channel_id.split("/", 1)
+            self.edit_channel(device_name, channel_name)
+
     def edit_channel(self, device_name, channel_name):
         channel_id = f"{device_name}/{channel_name}"
-        default_data = {
-            "display_name": channel_name,
-            "color": "#{:06x}".format(hash(channel_id) % 0xffffff),
-            "visible": True
-        }
-
-        data = self.channel_custom_data.get(channel_id, default_data)
-        dialog = ChannelConfigDialog(data, self)
+        data = self.channel_data(channel_id)
+        dialog = ChannelConfigDialog(dict(data), self)
         if dialog.exec() == QDialog.Accepted:
             updated = dialog.get_config()
-            self.channel_custom_data[channel_id] = updated
-            if channel_id in self.channel_labels:
-                self.channel_labels[channel_id].setText(f"{channel_name}: {updated['display_name']}")
-
-    def set_channel_visibility(self, channel_id, state):
-        if channel_id in self.channel_custom_data:
-            self.channel_custom_data[channel_id]["visible"] = bool(state)
+            updated["visible"] = data["visible"]
+            data.update(updated)
+            row = self.channel_items.get(channel_id)
+            if row is not None:
+                self._updating = True
+                row[COL_NAME].setText(data["display_name"])
+                row[COL_TYPE].setText(data["thermocouple_type"])
+                row[COL_COLOR].setText(data["color"])
+                row[COL_COLOR].setData(QColor(data["color"]), Qt.DecorationRole)
+                self._updating = False
+
+    # --- Sélection groupée -----------------------------------------------------
+
+    def set_module_checked(self, device_name, checked, channels=True):
+        self._updating = True
+        self.module_items[device_name][0].setCheckState(Qt.Checked if checked else Qt.Unchecked)
+        self._updating = False
+        if channels:
+            # Sans créer les lignes d'un module replié : seuls les réglages changent
+            for channel_id in self.module_info(device_name).channel_ids():
+                self.set_channel_checked(channel_id, checked)
 
     def set_all_visibility(self, visible):
-        for group, _, device in self.device_widgets:
-            group.setChecked(visible)
-            device_name = device.name
-            for ch in self.module_channels.get(device_name, []):
-                cb = self.channel_checkboxes.get(ch)
-                if cb:
-                    cb.setChecked(visible)
-                    self.channel_custom_data[ch]["visible"] = visible
-                    
+        for device_name in self.module_items:
+            self.set_module_checked(device_name, visible)
+
+    def set_selected_visibility(self, visible):
+        """Module sélectionné : lui et tous ses canaux ; canal sélectionné : ce canal."""
+        for index in self.tree.selectionModel().selectedRows(COL_ITEM):
+            item = self.model.itemFromIndex(index)
+            channel_id = item.data(ROLE_CHANNEL)
+            if channel_id is not None:
+                self.set_channel_checked(channel_id, visible)
+                if visible:
+                    self.set_module_checked(item.data(ROLE_DEVICE), True, channels=False)
+            elif item.data(ROLE_DEVICE) is not None:
+                self.set_module_checked(item.data(ROLE_DEVICE), visible)
 
     def apply_config(self):
-        config = {
-            "version": 1,
-            "devices": {}
-        }
-
-        for group, name_edit, device in self.device_widgets:
-            device_name = device.name
-            device_enabled = group.isChecked()
+        devices = {}
+
+        # Voies issues du scan en cache : pas de nouvelle requête au matériel
+        for module in self.topology:
+            device_name = module.name
+            check_item, name_item = self.module_items[device_name]
+
+            if module.error:
+                # Module illisible : on garde ce que la config en sait déjà
+                saved_device = self.existing_config.devices.get(device_name)
+                if saved_device is not None:
+                    devices[device_name] = saved_device
+                continue
+
+            # au moment du scan, on sait qu’il est connecté
+            device_entry = DeviceConfig(device_name, name_item.text(),
+                                        enabled=check_item.checkState() == Qt.Checked,  # ✅ on garde l'état du module
+                                        online=True)
+            try:
+                for channel_id in module.channel_ids():
+                    ch_data = dict(self.channel_data(channel_id))
+                    ch_data["enabled"] = self.is_channel_checked(ch_data)
+                    device_entry.channels[channel_id] = ChannelConfig.from_dict(channel_id, ch_data)
+            except ConfigError as e:
+                QMessageBox.warning(self, "Warning", f"Invalid channel settings:\n{str(e)}")
+                return
+
+            devices[device_name] = device_entry
+
+        # On conserve les canaux virtuels et les autres sections (acquisition, ...)
+        config = ThermotionConfig(devices, self.existing_config.virtual_channels,
+                                  dict(self.existing_config.sections))
+        self.config_updated.emit(config)
+        self.accept()
 
-            device_entry = {
-                "display_name": name_edit.text(),
-                "enabled": device_enabled,  # ✅ on garde l'état du module
-                "channels": {}
-            }
-            device_entry["online"] = True  # au moment du scan, on sait qu’il est connecté
 
-            try:
-                channels = [c.name.split('/')[-1] for c in device.ai_physical_chans]
-                for ch in sorted(channels):
-                    channel_id = f"{device_name}/{ch}"
+class ProfileDialog(QDialog):
+    """Profils de banc : aperçu du diff avec la config courante, application sans rescan."""
+    profile_selected = Signal(str, object)  # nom, ThermotionConfig
 
-                    ch_data = self.channel_custom_data.get(channel_id, {
-                        "display_name": ch,
-                        "color": "#{:06x}".format(hash(channel_id) % 0xffffff),
-                        "visible": True,
-                        "thermocouple_type": "T"  # ✅ par défaut
-                    })
+    def __init__(self, current_config, parent=None, profiles_dir=PROFILES_DIR):
+        super().__init__(parent)
+        self.setWindowTitle("Configuration Profiles")
+        self.setMinimumSize(600, 400)
+        self.setStyleSheet("font-size: 12px;")
+        self.current_config = current_config
+        self.profiles_dir = profiles_dir
+        self.selected_config = None
+
+        layout = QVBoxLayout(self)
+        active = active_profile(current_config)
+        layout.addWidget(QLabel(f"Applied profile: {active or '(none)'}"))
+
+        content = QHBoxLayout()
+        self.profile_list = QListWidget()
+        self.profile_list.currentTextChanged.connect(self.show_diff)
+        content.addWidget(self.profile_list, 1)
+        self.diff_view = QPlainTextEdit()
+        self.diff_view.setReadOnly(True)
+        content.addWidget(self.diff_view, 2)
+        layout.addLayout(content)
 
-                    checkbox = self.channel_checkboxes.get(channel_id)
-                    ch_data["enabled"] = checkbox.isChecked() if checkbox else True
+        btn_layout = QHBoxLayout()
+        save_btn = QPushButton("Save current as...")
+        save_btn.clicked.connect(self.save_current)
+        btn_layout.addWidget(save_btn)
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(self.delete_selected)
+        btn_layout.addWidget(delete_btn)
+        btn_layout.addStretch()
+        self.apply_btn = QPushButton("Apply")
+        self.apply_btn.setEnabled(False)
+        self.apply_btn.clicked.connect(self.apply_selected)
+        btn_layout.addWidget(self.apply_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
 
-                    device_entry["channels"][channel_id] = ch_data
+        self.refresh_list(active)
 
-            except Exception as e:
-                QMessageBox.warning(self, "Warning", f"Error collecting channels:\n{str(e)}")
+    def refresh_list(self, select=None):
+        self.profile_list.clear()
+        self.profile_list.addItems(list_profiles(self.profiles_dir))
+        matches = self.profile_list.findItems(select or "", Qt.MatchExactly)
+        if matches:
+            self.profile_list.setCurrentItem(matches[0])
 
-            config["devices"][device_name] = device_entry
+    def show_diff(self, name):
+        self.selected_config = None
+        self.apply_btn.setEnabled(False)
+        if not name:
+            self.diff_view.clear()
+            return
+        try:
+            self.selected_config = load_profile(name, self.profiles_dir)
+        except (OSError, ValueError) as e:
+            self.diff_view.setPlainText(f"Could not load profile:\n{str(e)}")
+            return
+        lines = diff_configs(self.current_config, self.selected_config).summary()
+        self.diff_view.setPlainText("\n".join(lines) if lines else "No differences with the current configuration.")
+        self.apply_btn.setEnabled(True)
+
+    def save_current(self):
+        name, ok = QInputDialog.getText(self, "Save Profile", "Profile name:", QLineEdit.Normal,
+                                        active_profile(self.current_config) or "")
+        if not ok or not name:
+            return
+        if name in list_profiles(self.profiles_dir) and QMessageBox.question(
+                self, "Save Profile", f"Overwrite profile {name!r}?") != QMessageBox.Yes:
+            return
+        try:
+            save_profile(name, self.current_config, self.profiles_dir)
+        except (OSError, ConfigError) as e:
+            QMessageBox.warning(self, "Warning", f"Could not save profile:\n{str(e)}")
+            return
+        self.refresh_list(name)
 
-        self.config_updated.emit(config)
+    def delete_selected(self):
+        item = self.profile_list.currentItem()
+        if item is None:
+            return
+        if QMessageBox.question(self, "Delete Profile", f"Delete profile {item.text()!r}?") != QMessageBox.Yes:
+            return
+        try:
+            delete_profile(item.text(), self.profiles_dir)
+        except OSError as e:
+            QMessageBox.warning(self, "Warning", f"Could not delete profile:\n{str(e)}")
+        self.refresh_list()
+
+    def apply_selected(self):
+        item = self.profile_list.currentItem()
+        if item is None or self.selected_config is None:
+            return
+        self.profile_selected.emit(item.text(), self.selected_config)
         self.accept()
 
 
-    def retry_detection(self):
-        self.devices = self.detect_devices()
+class ReferenceRunDialog(QDialog):
+    """Runs de référence superposés au direct : ajout, retrait, alignement, différence.
+
+    Les runs ne sont pas modifiés ici : le repère choisi par ligne
+    (`align_markers`) n'est appliqué qu'à la validation, par la fenêtre.
+    """
+
+    def __init__(self, references, show_difference, live_annotations, parent=None,
+                 runs_dir=RUNS_DIR):
+        super().__init__(parent)
+        self.setWindowTitle("Reference Runs")
+        self.setMinimumSize(500, 300)
+        self.setStyleSheet("font-size: 12px;")
+        self.references = list(references)
+        self.align_markers = [reference.align_marker for reference in self.references]
+        self.live_annotations = live_annotations
+        self.runs_dir = runs_dir
+
+        layout = QVBoxLayout(self)
+        self.run_list = QListWidget()
+        self.run_list.currentRowChanged.connect(self.show_alignment)
+        layout.addWidget(self.run_list)
+
+        align_layout = QHBoxLayout()
+        align_layout.addWidget(QLabel("Align on:"))
+        self.align_combo = QComboBox()
+        self.align_combo.activated.connect(self.set_alignment)
+        align_layout.addWidget(self.align_combo, 1)
+        layout.addLayout(align_layout)
+
+        self.difference_cb = QCheckBox("Show live − reference difference")
+        self.difference_cb.setChecked(show_difference)
+        layout.addWidget(self.difference_cb)
+
+        btn_layout = QHBoxLayout()
+        add_btn = QPushButton("Add...")
+        add_btn.clicked.connect(self.add_reference)
+        btn_layout.addWidget(add_btn)
+        remove_btn = QPushButton("Remove")
+        remove_btn.clicked.connect(self.remove_selected)
+        btn_layout.addWidget(remove_btn)
+        btn_layout.addStretch()
+        ok_btn = QPushButton("OK")
+        ok_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(ok_btn)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.clicked.connect(self.reject)
+        btn_layout.addWidget(cancel_btn)
+        layout.addLayout(btn_layout)
+
+        self.refresh_list()
+
+    @property
+    def show_difference(self):
+        return self.difference_cb.isChecked()
 
-        if not self.devices:
-            self.show_no_device_message()
+    def describe(self, reference, marker):
+        if marker is ALIGN_START:
+            alignment = "aligned on start"
         else:
-            self.init_ui()
-
-    def show_no_device_message(self):
-        # Nettoie la fenêtre
-        layout = self.layout()
-        if layout is not None:
-            while layout.count():
-                item = layout.takeAt(0)
-                widget = item.widget()
-                if widget is not None:
-                    widget.setParent(None)
-
-        # Message
-        label = QLabel("No devices found.")
-        label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(label)
-
-        # Bouton Retry
-        retry_btn = QPushButton("Retry")
-        retry_btn.setFixedWidth(100)
-        retry_btn.clicked.connect(self.retry_detection)
-        layout.addWidget(retry_btn)
+            alignment = f"aligned on '{marker}'"
+            if not any(a.text == marker for a in self.live_annotations):
+                alignment += " (waiting for live marker)"
+        return f"{reference.run_id} - {len(reference.channel_ids)} channels, {alignment}"
+
+    def refresh_list(self, select=0):
+        self.run_list.clear()
+        self.run_list.addItems([self.describe(ref, marker)
+                                for ref, marker in zip(self.references, self.align_markers)])
+        if self.references:
+            self.run_list.setCurrentRow(min(select, len(self.references) - 1))
+        else:
+            self.show_alignment(-1)
+
+    def show_alignment(self, row):
+        self.align_combo.clear()
+        self.align_combo.setEnabled(0 <= row < len(self.references))
+        if not self.align_combo.isEnabled():
+            return
+        reference = self.references[row]
+        self.align_combo.addItem("Run start", ALIGN_START)
+        for text in dict.fromkeys(reference.marker_texts()):
+            self.align_combo.addItem(f"Marker: {text}", text)
+        index = self.align_combo.findData(self.align_markers[row])
+        self.align_combo.setCurrentIndex(max(index, 0))
+
+    def set_alignment(self, index):
+        row = self.run_list.currentRow()
+        if not 0 <= row < len(self.references):
+            return
+        self.align_markers[row] = self.align_combo.itemData(index)
+        self.run_list.item(row).setText(self.describe(self.references[row], self.align_markers[row]))
+
+    def add_reference(self):
+        run_dir = QFileDialog.getExistingDirectory(self, "Select Reference Run", self.runs_dir)
+        if not run_dir:
+            return
+        try:
+            reference = ReferenceRun(run_dir)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Warning", f"Could not load run:\n{str(e)}")
+            return
+        if not len(reference):
+            QMessageBox.warning(self, "Warning", f"Run {reference.run_id} has no recorded data.")
+            return
+        self.references.append(reference)
+        self.align_markers.append(reference.align_marker)
+        self.refresh_list(len(self.references) - 1)
+
+    def remove_selected(self):
+        row = self.run_list.currentRow()
+        if 0 <= row < len(self.references):
+            del self.references[row]
+            del self.align_markers[row]
+            self.refresh_list(row)
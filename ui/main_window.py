@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import time
 from functools import partial
 
 # Ajouter la racine du projet au PYTHONPATH si nécessaire
@@ -11,23 +12,74 @@ if PROJECT_ROOT not in sys.path:
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                               QPushButton, QLabel, QDialog, QLineEdit, QColorDialog, QListWidget,
                               QListWidgetItem, QCheckBox, QScrollArea, QGroupBox, QMessageBox,
-                              QFrame, QSizePolicy,QInputDialog)
-from PySide6.QtCore import Qt, Signal, QSize, QThread, QTimer
-from PySide6.QtGui import QColor, QIcon, QFont, QPixmap
+                              QFrame, QSizePolicy,QInputDialog, QAbstractItemView, QFileDialog)
+from PySide6.QtCore import Qt, Signal, QSize, QThread, QTimer, QMetaObject
+from PySide6.QtGui import QColor, QIcon, QFont, QPixmap, QShortcut, QKeySequence
 import pyqtgraph as pg
+from PySide6.QtNetwork import QHostInfo
 import nidaqmx.system
 from nidaqmx.errors import DaqError
 
-from ui.dialogs import ChannelConfigDialog, DeviceScannerDialog
+from ui.dialogs import (ChannelConfigDialog, DeviceScannerDialog, ProfileDialog, BulkChannelDialog,
+                        ReferenceRunDialog)
 from ui.widgets import ChannelListWidget
+from ui.batched_curves import MultiCurveItem, RENDERERS, opengl_available
+from ui.plot_panes import resolve_panes, build_panes, LiveViewport
 from utils.style import MAIN_WINDOW_STYLE
-from acquisition.acquisition_worker import AcquisitionWorker
+from utils.palette import cached_pen, cached_brush, distinct_colors, channel_color
+from acquisition.supervisor import AcquisitionSupervisor, ENGINE_SOURCE, HEALTH_RUNNING, HEALTH_STOPPED
+from acquisition.chassis_tasks import chassis_of
+from acquisition.device_watcher import DeviceWatcher
+from acquisition.block import DataBlock
+from acquisition.block_queue import BlockPipeline, PROCESS, DISPLAY, RECORD_QUEUE_MB
+from acquisition.record_writer import RecordWriter
+from acquisition.plugins import PluginHost
+from acquisition.remote import RemoteViewer, StationServer, DEFAULT_PORT, STATION_SEP
+from core.annotations import Annotation, AnnotationIndex, load_annotations
+from core.calibration import UNIT_AXIS_LABELS, UNIT_SYMBOLS, units_of
+from core.config_manager import load_config, save_config
+from core.config_model import ThermotionConfig, ConfigError
+from core.filters import records_filtered
+from core.group_reductions import GroupReducer
+from core.profiles import diff_configs, PROFILE_SECTION
+from core.recorder import RunRecorder, RUNS_DIR, new_run_id
+from core.run_journal import RunJournal, find_interrupted_run
+from core.sample_store import SampleStore
+from core.sequencer import Sequencer, SequenceLog, TestPlan, PlanError, PLANS_DIR
+from core.virtual_channels import compile_virtual_channels
 import numpy as np
 from nidaqmx.system import System
 
-CONFIG_FILE = "config.json"
+VIRTUAL_GROUP = "Virtual"
+# Au-delà, seul un repère sur n de la plage visible est dessiné
+MAX_VISIBLE_ANNOTATIONS = 200
+ANNOTATION_COLOR = "#f1c40f"
+# Runs de référence : un style de trait par run, différence dans un panneau dédié
+REFERENCE_STYLES = (Qt.DashLine, Qt.DotLine, Qt.DashDotLine, Qt.DashDotDotLine)
+REFERENCE_DIFF_PANE = "Live − Reference"
+
+
+def status_style(online):
+    # Pastille ronde : verte en ligne, rouge hors ligne
+    return f"""
+        background-color: {"#2ecc71" if online else "#e74c3c"};
+        border-radius: 6px;
+        border: 1px solid #333;
+    """
+
+
+def swatch_style(color):
+    return f"""
+        background-color: {color};
+        border: 1px solid #000;
+        border-radius: 3px;
+    """
+
 
 class MainWindow(QMainWindow):
+    reconfigure_requested = Signal(object, int)  # ThermotionConfig et son numéro, appliqués par le worker
+    device_online_changed = Signal(str, bool)  # relayé au worker (module, en ligne)
+
     def __init__(self):
         super().__init__()
         
@@ -51,26 +103,71 @@ class MainWindow(QMainWindow):
             }
         """)
 
-        self.config = {}
+        self.config = ThermotionConfig()
         self.module_widgets = {}  # Initialisation du dictionnaire
         self.graph_items = {}
+        self.sample_store = SampleStore(())
+        self.group_reducer = GroupReducer((), {})
+        self.summary_store = SampleStore(())
+        self.summary_items = {}
+        self.summary_mode = False
+        self.panes = {}
+        self.batched_items = {}
+        self.opengl_enabled = False
+        self.recorder = None            # run ouvert ; écrit par self.record_writer, dans son thread
+        self.units_symbol = UNIT_SYMBOLS[units_of(self.config)]
+        self.annotations = AnnotationIndex()
+        self.annotation_items = {}  # panneau -> {"lines": [...], "regions": [...]} réutilisés
+        self.region_start = None
+        self.references = []        # ReferenceRun superposés
+        self.reference_diff = False
+        self.reference_items = {}   # (run, canal) -> {"overlay": courbe, "diff": courbe ou None}
+        self.sequencer = None       # plan d'essai en cours, avancé bloc par bloc
+        self.config_generation = 0  # numéro de la dernière config envoyée au worker
+        self.sequence_log = None
         self.init_ui()
-        self.acquisition_thread = None        
+        # Enregistrement dans son propre thread : une interface lente ne fait rien perdre au run
+        self.record_writer = RecordWriter(parent=self)
+        self.record_writer.lost.connect(self.on_record_lost, Qt.QueuedConnection)
+        self.record_writer.failed.connect(self.on_record_failed, Qt.QueuedConnection)
+        # Blocs du worker ou des stations : files bornées, vidées d'un coup par l'interface
+        self.pipeline = BlockPipeline(self, recorder=self.record_writer)
+        self.pipeline.ready.connect(self.drain_pipeline, Qt.QueuedConnection)
+        # Worker d'acquisition et son thread, surveillés et relancés si besoin
+        self.supervisor = AcquisitionSupervisor(self, pipeline=self.pipeline)
+        self.supervisor.timing_updated.connect(self.update_timing_status)
+        self.supervisor.device_status.connect(self.on_device_status)
+        self.supervisor.health_changed.connect(self.on_health_changed)
+        self.device_online_changed.connect(self.supervisor.set_device_online)
+        self.reconfigure_requested.connect(self.supervisor.reconfigure)
+        self.on_health_changed(self.supervisor.state, "")
+        # Poste visualiseur : stations distantes fusionnées à la place du worker local
+        self.remote_viewer = RemoteViewer(self)
+        self.remote_viewer.new_data.connect(self.pipeline.put)
+        self.remote_viewer.channels_changed.connect(self.update_display)
+        self.remote_viewer.station_status.connect(self.on_station_status)
+        self.remote_viewer.device_status.connect(self.on_device_status)
+        self.station_server = None  # publication des blocs de ce poste, si "remote.serve"
+        self.recording_pending = False  # visualiseur : on attend les canaux des stations
+        # Traitements propres au site, chacun dans son thread, alimentés à chaque bloc
+        self.plugins = PluginHost()
+        self.plugin_timer = QTimer(self)
+        self.plugin_timer.timeout.connect(self.update_plugin_status)
         self.load_config()
+        self.apply_remote_config()
+        self.apply_plugin_config()
         self.check_devices_online()
     
-        if self.config.get("devices"):
+        if self.config.devices:
             self.update_display()
             self.check_devices_online()  # Ajoutez cette ligne
 
-        self.worker = None
-        self.worker_thread = None
+        # Présence des modules surveillée hors du thread GUI ; seuls les changements remontent
+        self.offline_since = {}
+        self.start_device_watcher()
 
-        self.device_poll_timer = QTimer(self)
-        self.device_poll_timer.setInterval(3000)  # Toutes les 3 secondes
-        self.device_poll_timer.timeout.connect(self.check_device_status)
-        self.device_poll_timer.start()
-        self.acquisition_thread = None
+        # Run interrompu (plantage, coupure) : proposé à la reprise une fois la fenêtre affichée
+        QTimer.singleShot(0, self.check_interrupted_run)
 
     def init_ui(self):
         central = QWidget()
@@ -79,13 +176,13 @@ class MainWindow(QMainWindow):
         layout = QHBoxLayout(central)
         layout.setContentsMargins(5, 5, 5, 5)
 
-        # Graph Area
-        self.plot_widget = pg.PlotWidget()
-        self.plot_widget.addLegend()
-        self.plot_widget.showGrid(x=True, y=True)
-        self.plot_widget.setLabel('left', 'Temperature', 'degC')
-        self.plot_widget.setLabel('bottom', 'Time', 's')
-        layout.addWidget(self.plot_widget, 75)  # 75% width
+        # Graph Area : un ou plusieurs panneaux empilés, axes X liés
+        self.plot_view = pg.GraphicsLayoutWidget()
+        # Cadrage (suivi du dernier échantillon, Y d'après l'index min/max) à la place de l'autoscale
+        self.viewport = LiveViewport(on_follow_changed=self.on_follow_changed)
+        self.panes = build_panes(self.plot_view, resolve_panes([], {})[0])
+        self.connect_view_range()
+        layout.addWidget(self.plot_view, 75)  # 75% width
 
         # Control Panel
         control_panel = QFrame()
@@ -100,8 +197,61 @@ class MainWindow(QMainWindow):
 
         # Channel List
         self.channel_list = ChannelListWidget(self)
+        self.channel_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         control_layout.addWidget(self.channel_list)
 
+        # Édition groupée des canaux sélectionnés (Ctrl/Maj + clic)
+        self.bulk_edit_btn = QPushButton("Edit Selected Channels...")
+        self.bulk_edit_btn.clicked.connect(self.edit_selected_channels)
+        control_layout.addWidget(self.bulk_edit_btn)
+
+        # Vue résumée : une bande min/max + moyenne par module
+        self.summary_cb = QCheckBox("Module summary (mean + min/max)")
+        self.summary_cb.toggled.connect(self.set_summary_mode)
+        control_layout.addWidget(self.summary_cb)
+
+        # Suivi du dernier échantillon : la vue glisse sans réajuster tout l'historique
+        self.follow_cb = QCheckBox("Follow latest")
+        self.follow_cb.setChecked(True)
+        self.follow_cb.setToolTip("Scroll with the latest sample; mouse pan/zoom pauses following")
+        self.follow_cb.toggled.connect(lambda checked: self.viewport.set_follow(checked))
+        control_layout.addWidget(self.follow_cb)
+
+        # Enregistrement sur disque (runs/<run_id>/) pendant l'acquisition
+        self.record_cb = QCheckBox("Record to disk")
+        self.record_cb.toggled.connect(self.set_recording_enabled)
+        control_layout.addWidget(self.record_cb)
+
+        # Runs enregistrés superposés au direct (alignés au départ ou sur un repère)
+        self.references_btn = QPushButton("Reference Runs...")
+        self.references_btn.clicked.connect(self.open_references)
+        control_layout.addWidget(self.references_btn)
+
+        # Plan d'essai (attentes, stabilité, repères, segments d'enregistrement)
+        self.sequence_btn = QPushButton("Run Sequence...")
+        self.sequence_btn.clicked.connect(self.toggle_sequence)
+        control_layout.addWidget(self.sequence_btn)
+
+        # Repères d'évènements (Ctrl+M : repère immédiat, sans saisie)
+        mark_layout = QHBoxLayout()
+        self.mark_btn = QPushButton("Mark...")
+        self.mark_btn.setToolTip("Add an event marker at the latest sample (Ctrl+M: quick marker)")
+        self.mark_btn.clicked.connect(self.add_marker)
+        mark_layout.addWidget(self.mark_btn)
+        self.region_btn = QPushButton("Start Region")
+        self.region_btn.clicked.connect(self.toggle_region)
+        mark_layout.addWidget(self.region_btn)
+        prev_btn = QPushButton("◀")
+        prev_btn.setFixedWidth(30)
+        prev_btn.clicked.connect(lambda: self.jump_to_annotation(-1))
+        mark_layout.addWidget(prev_btn)
+        next_btn = QPushButton("▶")
+        next_btn.setFixedWidth(30)
+        next_btn.clicked.connect(lambda: self.jump_to_annotation(1))
+        mark_layout.addWidget(next_btn)
+        control_layout.addLayout(mark_layout)
+        QShortcut(QKeySequence("Ctrl+M"), self, activated=partial(self.add_marker, quick=True))
+
         # Buttons
         btn_layout = QHBoxLayout()
 
@@ -109,6 +259,10 @@ class MainWindow(QMainWindow):
         self.scan_btn.clicked.connect(self.configure_devices)
         btn_layout.addWidget(self.scan_btn)
 
+        self.profiles_btn = QPushButton("Profiles")
+        self.profiles_btn.clicked.connect(self.open_profiles)
+        btn_layout.addWidget(self.profiles_btn)
+
         self.start_btn = QPushButton("Start")
         self.start_btn.setEnabled(False)
         self.start_btn.clicked.connect(self.start_acquisition)
@@ -123,31 +277,84 @@ class MainWindow(QMainWindow):
         control_layout.addLayout(btn_layout)
         layout.addWidget(control_panel, 25)  # 25% width
 
+        # Cadence d'acquisition (cible / atteinte / dépassements)
+        self.timing_label = QLabel()
+        self.statusBar().addPermanentWidget(self.timing_label)
+        # Santé du moteur d'acquisition (superviseur)
+        self.health_label = QLabel()
+        self.statusBar().addPermanentWidget(self.health_label)
+        # Étape en cours du séquenceur
+        self.sequence_label = QLabel()
+        self.sequence_label.hide()
+        self.statusBar().addPermanentWidget(self.sequence_label)
+        # Plugins : temps de traitement et pertes (détail dans l'infobulle)
+        self.plugin_label = QLabel()
+        self.plugin_label.hide()
+        self.statusBar().addPermanentWidget(self.plugin_label)
+
     def load_config(self):
-        """Load config from file"""
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f:
-                    self.config = json.load(f)
-                    self.update_display()
-            except Exception as e:
-                QMessageBox.warning(self, "Warning", f"Could not load config:\n{str(e)}")
+        """Load config from file (migrée et validée)"""
+        try:
+            self.config = load_config()
+            self.update_display()
+        except (OSError, ValueError) as e:
+            # ValueError couvre le JSON illisible et ConfigError (validation)
+            QMessageBox.warning(self, "Warning", f"Could not load config:\n{str(e)}")
+            return
+        self.check_virtual_channels()
+        self.record_cb.blockSignals(True)
+        self.record_cb.setChecked(self.config.section("recording").get("enabled", False))
+        self.record_cb.blockSignals(False)
+
+    def check_virtual_channels(self):
+        """Signale les canaux virtuels dont l'expression ne compile pas"""
+        _, errors = compile_virtual_channels(self.config.virtual_channels,
+                                             self.config.enabled_channel_ids)
+        if errors:
+            details = "\n".join(f"{name}: {error}" for name, error in errors.items())
+            QMessageBox.warning(self, "Warning", f"Invalid virtual channels ignored:\n{details}")
 
     def toggle_channel_visibility(self, channel_id, state):
         """Afficher ou masquer une courbe en fonction de la checkbox"""
         if channel_id in self.graph_items:
             visible = bool(state)
-            self.graph_items[channel_id]["curve"].setVisible(visible)
-            self.graph_items[channel_id]["config"]["visible"] = visible
+            self.set_curve_visible(channel_id, visible and not self.summary_mode)
+            self.graph_items[channel_id]["config"].visible = visible
+            self.refresh_references()
+            self.update_viewport()
             self.save_config()
 
+    def set_curve_visible(self, channel_id, visible):
+        entry = self.graph_items[channel_id]
+        if entry["curve"] is not None:
+            entry["curve"].setVisible(visible)
+        elif entry["pane"] in self.batched_items:
+            # Rendu groupé : la visibilité est un masque par ligne
+            self.batched_items[entry["pane"]].setRowVisible(entry["row"], visible)
+
+    def set_summary_mode(self, enabled):
+        """Bascule entre une courbe par canal et une bande min/max par module"""
+        self.summary_mode = bool(enabled)
+        self.apply_curve_visibility()
+        self.refresh_curves()
+
+    def apply_curve_visibility(self):
+        for channel_id, entry in self.graph_items.items():
+            self.set_curve_visible(channel_id, entry["checkbox"].isChecked() and not self.summary_mode)
+        for module_name, items in self.summary_items.items():
+            module_cb = self.module_widgets.get(module_name, {}).get("checkbox")
+            visible = self.summary_mode and (module_cb is None or module_cb.isChecked())
+            items["mean"].setVisible(visible)
+            items["band"].setVisible(visible)
+        self.refresh_references()
+
     def check_devices_online(self):
         try:
             system = nidaqmx.system.System.local()
             online_device_names = [d.name for d in system.devices]
 
-            for device_name, device_info in self.config.get("devices", {}).items():
-                display_name = device_info.get("display_name", device_name)
+            for device_name, device_info in self.config.devices.items():
+                display_name = device_info.display_name
                 is_online = device_name in online_device_names
 
                 for i in range(self.channel_list.count()):
@@ -171,8 +378,7 @@ class MainWindow(QMainWindow):
     def save_config(self):
         """Save config to file"""
         try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            save_config(self.config)
         except Exception as e:
             QMessageBox.warning(self, "Warning", f"Could not save config:\n{str(e)}")
 
@@ -184,7 +390,10 @@ class MainWindow(QMainWindow):
 
     def update_display(self):
         """Update UI based on current config"""
-        self.plot_widget.clear()
+        for plot in self.panes.values():
+            plot.clear()
+        self.annotation_items = {}  # retirés par clear()
+        self.reference_items = {}
         self.channel_list.clear()
         self.graph_items = {}
 
@@ -194,34 +403,53 @@ class MainWindow(QMainWindow):
         else:
             self.module_widgets.clear()
 
-        if not self.config.get("devices"):
-            self.start_btn.setEnabled(False)
+        # En visualiseur, modules et canaux viennent des stations abonnées
+        display_config = self.remote_viewer.merged_config() if self.viewer_mode else self.config
+        if not display_config.devices:
+            self.start_btn.setEnabled(self.viewer_mode)
             return
 
+        renderer = self.config.section("display").get("renderer", "items")
+        if renderer not in RENDERERS:
+            print(f"[WARN] Unknown renderer {renderer!r}, using 'items'")
+            renderer = "items"
+        self.set_opengl(renderer == "opengl")
+
         # Organize channels by module
         modules = {}
-        for device_name, device_cfg in self.config["devices"].items():
-            if not device_cfg.get("enabled", True):
-                continue  # ❌ Ignorer module désactivé
-
-            module_name = device_cfg.get("display_name", device_name)
+        # (canaux actifs de modules actifs, déjà ordonnés par la config)
+        for channel in display_config.enabled_channels:
+            device_cfg = display_config.device_of(channel.channel_id)
+            module_name = device_cfg.display_name
 
             if module_name not in modules:
                 modules[module_name] = {
-                    "device_name": device_name,
+                    "device_name": device_cfg.name,
                     "channels": []
                 }
-
-            # Add simulated channels (replace with real channels)
-            for channel_id, channel_data in device_cfg.get("channels", {}).items():
-                if not channel_data.get("enabled", True):
-                    continue  # ❌ Ignorer canal désactivé
-                modules[module_name]["channels"].append({
-                    "id": channel_id,
-                    "display_name": channel_data["display_name"],
-                    "color": channel_data["color"],
-                    "visible": channel_data["visible"]
-                })
+            modules[module_name]["channels"].append(channel)
+
+        # Canaux virtuels : regroupés sous un pseudo-module sans périphérique
+        virtual_channels = [
+            definition for definition in display_config.virtual_channels.values() if definition.enabled
+        ]
+        if virtual_channels:
+            modules[VIRTUAL_GROUP] = {"device_name": None, "channels": virtual_channels}
+
+        # Panneaux : reconstruits seulement si leur liste change
+        pane_names, pane_of = resolve_panes(self.config.section("display").get("panes"), modules)
+        if self.reference_diff and self.references:
+            pane_names = pane_names + [REFERENCE_DIFF_PANE]
+        self.viewport.window_s = self.config.section("display").get("follow_window_s")
+        if list(self.panes) != pane_names:
+            self.panes = build_panes(self.plot_view, pane_names)
+            self.connect_view_range()
+        # Unité des valeurs : celle de l'acquisition (étalonnage et conversion dans le worker)
+        units = units_of(self.config)
+        self.units_symbol = UNIT_SYMBOLS[units]
+        for pane_name, plot in self.panes.items():
+            plot.setLabel('left', 'Live − Reference' if pane_name == REFERENCE_DIFF_PANE
+                          else 'Temperature', UNIT_AXIS_LABELS[units])
 
         # Add modules to display
         for i, (module_name, module_data) in enumerate(modules.items()):
@@ -269,12 +497,8 @@ class MainWindow(QMainWindow):
             # Round status indicator (green = online, red = offline)
             status_indicator = QLabel()
             status_indicator.setFixedSize(12, 12)
-            status_color = "#2ecc71" if device_cfg.get("online", True) else "#e74c3c"
-            status_indicator.setStyleSheet(f"""
-                background-color: {status_color};
-                border-radius: 6px;
-                border: 1px solid #333;
-            """)
+            device_cfg = display_config.devices.get(module_data["device_name"])
+            status_indicator.setStyleSheet(status_style(device_cfg is None or device_cfg.online))
 
             # Ajouter les éléments à droite du nom
             status_layout.addWidget(name_label, 1)  # Stretchable
@@ -288,14 +512,15 @@ class MainWindow(QMainWindow):
 
 
             # 🖊️ Edit button for module name
-            edit_btn = QPushButton()
-            edit_icon_path = os.path.join(os.path.dirname(__file__), "../resources/edit_white.png")
-            edit_btn.setIcon(QIcon(edit_icon_path))
-            edit_btn.setIconSize(QSize(16, 16))
-            edit_btn.setStyleSheet("background-color: transparent; border: none;")
-            edit_btn.setFixedSize(24, 24)
-            edit_btn.clicked.connect(partial(self.edit_module_name, module_name))
-            header_layout.addWidget(edit_btn)
+            if module_data["device_name"] in self.config.devices:
+                edit_btn = QPushButton()
+                edit_icon_path = os.path.join(os.path.dirname(__file__), "../resources/edit_white.png")
+                edit_btn.setIcon(QIcon(edit_icon_path))
+                edit_btn.setIconSize(QSize(16, 16))
+                edit_btn.setStyleSheet("background-color: transparent; border: none;")
+                edit_btn.setFixedSize(24, 24)
+                edit_btn.clicked.connect(partial(self.edit_module_name, module_name))
+                header_layout.addWidget(edit_btn)
 
             header_item = QListWidgetItem()
             header_item.setFlags(header_item.flags() & ~Qt.ItemIsSelectable)
@@ -306,22 +531,25 @@ class MainWindow(QMainWindow):
             # Store module reference
             self.module_widgets[module_name] = {
                 'checkbox': module_cb,
-                'channels': [ch['id'] for ch in module_data["channels"]]
+                'channels': [ch.channel_id for ch in module_data["channels"]],
+                'status': status_indicator,
+                'device_name': module_data["device_name"]
             }
 
             # Add channels
             for channel in module_data["channels"]:
-                # Create plot item
-                curve = self.plot_widget.plot(
-                    [0, 1, 2, 3, 4],  # X values (time)
-                    [0, 1, 4, 9, 16], # Y values (simulated data)
-                    name=channel["display_name"],
-                    pen=pg.mkPen(color=channel["color"].strip(), width=2)
-                )
+                # Create plot item (en rendu groupé, un seul item pour tous les canaux)
+                curve = None
+                if renderer == "items":
+                    curve = self.panes[pane_of[channel.channel_id]].plot(
+                        [], [],
+                        name=channel.display_name,
+                        pen=cached_pen(channel.color, 2)
+                    )
 
                 # Create channel list item
                 item = QListWidgetItem()
-                item.setData(Qt.UserRole, channel["id"])
+                item.setData(Qt.UserRole, channel.channel_id)
 
                 widget = QWidget()
                 layout = QHBoxLayout(widget)
@@ -329,24 +557,20 @@ class MainWindow(QMainWindow):
 
                 # Visibility checkbox
                 cb = QCheckBox()
-                cb.setChecked(True)
+                cb.setChecked(channel.visible)
                 cb.stateChanged.connect(
-                    lambda state, cid=channel["id"]: self.toggle_channel_visibility(cid, state)
+                    lambda state, cid=channel.channel_id: self.toggle_channel_visibility(cid, state)
                 )
                 layout.addWidget(cb)
 
                 # Color indicator
                 color_label = QLabel()
                 color_label.setFixedSize(16, 16)
-                color_label.setStyleSheet(f"""
-                    background-color: {channel['color']};
-                    border: 1px solid #000;
-                    border-radius: 3px;
-                """)
+                color_label.setStyleSheet(swatch_style(channel.color))
                 layout.addWidget(color_label)
 
                 # Channel name
-                name_label = QLabel(channel["display_name"])
+                name_label = QLabel(channel.display_name)
                 name_label.setStyleSheet("font-size: 12px;")
                 layout.addWidget(name_label)
                 layout.addStretch()
@@ -359,7 +583,7 @@ class MainWindow(QMainWindow):
                 edit_btn.setStyleSheet("background-color: transparent; border: none;")
                 edit_btn.setFixedSize(24, 24)
                 edit_btn.clicked.connect(
-                    partial(self.edit_channel, channel["id"])
+                    partial(self.edit_channel, channel.channel_id)
                 )
                 layout.addWidget(edit_btn)
 
@@ -368,12 +592,62 @@ class MainWindow(QMainWindow):
                 self.channel_list.setItemWidget(item, widget)
 
                 # Store references
-                self.graph_items[channel["id"]] = {
+                self.graph_items[channel.channel_id] = {
                     "curve": curve,
+                    "row": len(self.graph_items),
+                    "pane": pane_of[channel.channel_id],
                     "config": channel,
-                    "checkbox": cb
+                    "checkbox": cb,
+                    "label": name_label,
+                    "swatch": color_label
                 }
 
+        # Historique partagé par toutes les courbes (physiques puis virtuelles)
+        history = self.config.section("display").get("history_samples", 3600)
+        self.configure_pipeline()
+        previous = self.sample_store
+        self.sample_store = SampleStore(self.graph_items.keys(), capacity=history)
+        # Reconfiguration (profil) en cours de mesure : les canaux conservés gardent leur historique
+        if len(previous):
+            self.sample_store.append(DataBlock(previous.channel_ids, previous.timestamps(),
+                                               previous.values()))
+
+        # Rendu groupé : un item par panneau, tous sur la même matrice du store
+        self.batched_items = {}
+        if renderer != "items":
+            colors = [entry["config"].color for entry in self.graph_items.values()]
+            for pane_name, plot in self.panes.items():
+                rows = [e["row"] for e in self.graph_items.values() if e["pane"] == pane_name]
+                if rows:
+                    self.batched_items[pane_name] = MultiCurveItem(colors, rows=rows)
+                    plot.addItem(self.batched_items[pane_name])
+
+        # Réductions par module (hors canaux virtuels), calculées à chaque bloc
+        groups = {name: [ch.channel_id for ch in data["channels"]]
+                  for name, data in modules.items() if data["device_name"] is not None}
+        self.group_reducer = GroupReducer(self.sample_store.channel_ids, groups)
+        self.summary_store = SampleStore(self.group_reducer.output_ids(), capacity=history)
+        self.summary_items = {}
+        group_colors = distinct_colors(len(self.group_reducer.group_names))
+        for module_name, color in zip(self.group_reducer.group_names, group_colors):
+            plot = self.panes[pane_of[modules[module_name]["channels"][0].channel_id]]
+            mean_curve = plot.plot([], [], name=f"{module_name} (mean)",
+                                   pen=cached_pen(color, 2))
+            min_curve = pg.PlotCurveItem([], [])
+            max_curve = pg.PlotCurveItem([], [])
+            band = pg.FillBetweenItem(min_curve, max_curve, brush=cached_brush(color, 60))
+            plot.addItem(band)
+            self.summary_items[module_name] = {
+                "mean": mean_curve, "min": min_curve, "max": max_curve, "band": band,
+                "pane": pane_of[modules[module_name]["channels"][0].channel_id]
+            }
+        self.apply_curve_visibility()
+        self.refresh_annotations()
+        self.build_reference_items()
+        self.publish_channel_metadata()
+        if self.recording_pending and self.remote_viewer.ready:
+            self.start_recording()
+
         self.start_btn.setEnabled(True)
 
     def create_channel_widget(self, channel):
@@ -385,22 +659,22 @@ class MainWindow(QMainWindow):
 
         # Visibility checkbox
         cb = QCheckBox()
-        cb.setChecked(channel["visible"])
-        cb.stateChanged.connect(partial(self.toggle_channel_visibility, channel["id"]))
+        cb.setChecked(channel.visible)
+        cb.stateChanged.connect(partial(self.toggle_channel_visibility, channel.channel_id))
         layout.addWidget(cb)
 
         # Color indicator
         color_label = QLabel()
         color_label.setFixedSize(16, 16)
         color_label.setStyleSheet(f"""
-            background-color: {channel['color']};
+            background-color: {channel.color};
             border: 1px solid #000;
             border-radius: 3px;
         """)
         layout.addWidget(color_label)
 
         # Channel name
-        name_label = QLabel(channel["display_name"])
+        name_label = QLabel(channel.display_name)
         name_label.setStyleSheet("font-size: 12px;")
         layout.addWidget(name_label)
         layout.addStretch()
@@ -409,7 +683,7 @@ class MainWindow(QMainWindow):
         edit_btn = QPushButton()
         edit_btn.setIcon(QIcon.fromTheme("document-edit"))
         edit_btn.setFixedSize(24, 24)
-        edit_btn.clicked.connect(partial(self.edit_channel, channel["id"]))
+        edit_btn.clicked.connect(partial(self.edit_channel, channel.channel_id))
         layout.addWidget(edit_btn)
 
         item.setSizeHint(widget.sizeHint())
@@ -422,13 +696,20 @@ class MainWindow(QMainWindow):
 
         # Update all channels in module
         any_visible = False
+        state = bool(state)
         for channel_id in self.module_widgets[module_name]['channels']:
             if channel_id in self.graph_items:
-                self.graph_items[channel_id]["curve"].setVisible(state)
+                self.set_curve_visible(channel_id, state and not self.summary_mode)
                 self.graph_items[channel_id]["checkbox"].setChecked(state)
-                self.graph_items[channel_id]["config"]["visible"] = state
+                self.graph_items[channel_id]["config"].visible = state
                 any_visible = any_visible or state
 
+        if module_name in self.summary_items:
+            self.summary_items[module_name]["mean"].setVisible(state and self.summary_mode)
+            self.summary_items[module_name]["band"].setVisible(state and self.summary_mode)
+
+        self.update_viewport()
+
         # Update module checkbox without triggering signal
         self.module_widgets[module_name]['checkbox'].blockSignals(True)
         self.module_widgets[module_name]['checkbox'].setChecked(any_visible)
@@ -439,24 +720,18 @@ class MainWindow(QMainWindow):
 
     def edit_channel(self, channel_id):
         """Edit channel configuration"""
-        if channel_id not in self.graph_items:
+        channel = self.config.channel(channel_id)
+        if channel is None:
             return
 
         # Pass a copy to avoid modifying config before confirmation
-        original_config = self.graph_items[channel_id]["config"].copy()
-        dialog = ChannelConfigDialog(original_config, self)
+        dialog = ChannelConfigDialog(channel.to_dict(), self)
 
         if dialog.exec() == QDialog.Accepted:
-            new_config = dialog.get_config()
-
-            # ✅ Update in self.config
-            for device_name, device in self.config.get("devices", {}).items():
-                if channel_id in device.get("channels", {}):
-                    device["channels"][channel_id].update(new_config)
-                    break
-
-            self.save_config()
-            self.update_display()
+            # ✅ Même chemin que l'édition groupée : pas de reconstruction complète
+            values = dialog.get_config()
+            values["visible"] = channel.visible
+            self.apply_channel_edits([channel_id], values)
 
     def stop_measurement(self):
         """Stop acquisition"""
@@ -475,82 +750,817 @@ class MainWindow(QMainWindow):
         dialog.config_updated.connect(self.update_config_and_refresh_channels)
         dialog.exec()
 
+    def open_profiles(self):
+        dialog = ProfileDialog(self.config, self)
+        dialog.profile_selected.connect(self.apply_profile)
+        dialog.exec()
+
+    def apply_profile(self, name, new_config):
+        """Bascule sur un profil sans rescan : seul ce que le diff impose est refait"""
+        # L'état en ligne des modules vient du matériel, pas du profil
+        for device_name, device in new_config.devices.items():
+            current = self.config.devices.get(device_name)
+            if current is not None:
+                device.online = current.online
+        new_config.sections[PROFILE_SECTION] = dict(self.config.section(PROFILE_SECTION), active=name)
+        changes = self.apply_config_change(new_config, {"profile": name})
+        self.show_status_message(f"Profile {name} applied ({changes} changes)")
+
+    def apply_config_change(self, new_config, event=None):
+        """Remplace la config en une transaction : une écriture, au plus une
+        reconfiguration du worker et une mise à jour de l'affichage.
+
+        Renvoie le nombre de changements détectés.
+        """
+        diff = diff_configs(self.config, new_config)
+        units_changed = units_of(self.config) != units_of(new_config)
+        calibration_changed = units_changed or any("calibration" in fields
+                                                   for fields in diff.channels_changed.values())
+        self.config = new_config
+
+        reconfiguring = diff.acquisition_changed and self.supervisor.running
+        if reconfiguring:
+            self.config_generation += 1
+            self.reconfigure_requested.emit(new_config, self.config_generation)
+            if self.recorder is not None:
+                self.record_writer.log_event(dict(event or {}, type="reconfigured",
+                                             changes=diff.summary()))
+        if calibration_changed and self.recorder is not None and not self.viewer_mode:
+            # Un run = un seul étalonnage et une seule unité (ceux de sa config) : nouveau segment.
+            # Le worker applique la config plus tard, dans son thread : le run courant garde les
+            # blocs encore acquis avec l'ancienne, le nouveau commence au premier bloc de la nouvelle
+            print("[INFO] Calibration or units changed, recording continues in a new run")
+            self.stop_recording(next_segment=reconfiguring)
+            self.start_recording(generation=self.config_generation if reconfiguring else None)
+        if units_changed:
+            # Historique dans l'ancienne unité : l'affichage repart de zéro
+            self.sample_store.clear()
+            self.summary_store.clear()
+        if diff.layout_changed or units_changed:
+            self.update_display()
+        else:
+            self.apply_channel_changes(diff.cosmetic_changes())
+        if "recording" in diff.sections_changed:
+            self.configure_pipeline()
+            self.record_cb.blockSignals(True)
+            self.record_cb.setChecked(self.config.section("recording").get("enabled", False))
+            self.record_cb.blockSignals(False)
+        if diff.virtual_changed:
+            self.check_virtual_channels()
+        if "remote" in diff.sections_changed:
+            self.apply_remote_config()
+        if "plugins" in diff.sections_changed:
+            self.apply_plugin_config()
+
+        self.save_config()
+        return len(diff.summary())
+
+    def edit_selected_channels(self):
+        channel_ids = [item.data(Qt.UserRole) for item in self.channel_list.selectedItems()
+                       if item.data(Qt.UserRole)]
+        if not channel_ids:
+            self.show_status_message("Select channels first (Ctrl/Shift + click)")
+            return
+        dialog = BulkChannelDialog(len(channel_ids), self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        palette = None
+        if dialog.use_palette():
+            palette = distinct_colors(len(channel_ids))
+        elif dialog.use_channel_defaults():
+            palette = [channel_color(channel_id) for channel_id in channel_ids]
+        self.apply_channel_edits(channel_ids, dialog.get_changes(), palette)
+
+    def apply_channel_edits(self, channel_ids, changes, colors=None):
+        """Applique les mêmes modifications (et une couleur chacun) à plusieurs canaux.
+
+        Travaille sur une copie : si un canal refuse la modification, rien n'est appliqué.
+        """
+        new_config = ThermotionConfig.from_dict(self.config.to_dict())
+        try:
+            for i, channel_id in enumerate(channel_ids):
+                values = dict(changes)
+                if colors:
+                    values["color"] = colors[i]
+                new_config.channel(channel_id).update(values)
+        except ConfigError as e:
+            QMessageBox.warning(self, "Warning", f"Invalid channel settings:\n{str(e)}")
+            return 0
+        new_config.reindex()
+        changed = self.apply_config_change(new_config, {"edited": list(channel_ids)})
+        self.show_status_message(f"{len(channel_ids)} channels updated ({changed} changes)")
+        return changed
+
+    def apply_channel_changes(self, changes):
+        """Met à jour sur place nom, couleur et visibilité des canaux modifiés"""
+        for channel_id, entry in self.graph_items.items():
+            entry["config"] = self.config.channel(channel_id)
+
+        recolor = False
+        for channel_id, fields in changes.items():
+            entry = self.graph_items.get(channel_id)
+            if entry is None:
+                continue
+            channel = entry["config"]
+            if "display_name" in fields:
+                entry["label"].setText(channel.display_name)
+                legend = self.panes[entry["pane"]].legend
+                if entry["curve"] is not None and legend is not None:
+                    legend_label = legend.getLabel(entry["curve"])
+                    if legend_label is not None:
+                        legend_label.setText(channel.display_name)
+            if "color" in fields:
+                entry["swatch"].setStyleSheet(swatch_style(channel.color))
+                if entry["curve"] is not None:
+                    entry["curve"].setPen(cached_pen(channel.color, 2))
+                else:
+                    recolor = True
+            if "visible" in fields:
+                entry["checkbox"].blockSignals(True)
+                entry["checkbox"].setChecked(channel.visible)
+                entry["checkbox"].blockSignals(False)
+                self.set_curve_visible(channel_id, channel.visible and not self.summary_mode)
+
+        if recolor:
+            colors = [entry["config"].color for entry in self.graph_items.values()]
+            for item in self.batched_items.values():
+                item.setColors(colors)
+
     def edit_module_name(self, module_name):
         text, ok = QInputDialog.getText(self, "Edit Module Name", "New name:", QLineEdit.Normal, module_name)
         if ok and text:
             # Trouver et mettre à jour le nom dans config
-            for device_name, device in self.config["devices"].items():
-                if device.get("display_name") == module_name:
-                    device["display_name"] = text
-                    break
+            device = self.config.device_by_module_name(module_name)
+            if device is not None:
+                device.display_name = text
+                self.config.reindex()
             self.save_config()
             self.update_display()
 
-    def start_acquisition(self):
+    # --- Stations distantes --------------------------------------------------------
+
+    @property
+    def viewer_mode(self):
+        return bool(RemoteViewer.station_configs(self.config))
+
+    def apply_remote_config(self):
+        """Abonnements (visualiseur) et publication (station) d'après la section "remote" """
+        remote_cfg = self.config.section("remote")
+        if self.viewer_mode:
+            self.remote_viewer.configure(self.config)
+        else:
+            self.remote_viewer.shutdown()
+        serve = remote_cfg.get("serve", False)
+        port = remote_cfg.get("port", DEFAULT_PORT)
+        if self.station_server is not None and (not serve or self.station_server.port != port):
+            self.station_server.stop()
+            self.station_server = None
+        if serve and self.station_server is None:
+            name = remote_cfg.get("station_name") or QHostInfo.localHostName()
+            self.station_server = StationServer(name, port, self)
+            if not self.station_server.start():
+                self.show_status_message(f"Could not publish on port {port}", 10000)
+                self.station_server = None
+                return
+            self.publish_channel_metadata()
+
+    def publish_channel_metadata(self):
+        """Noms, modules et couleurs envoyés aux abonnés et aux plugins avec la liste des canaux"""
+        if self.station_server is None and not self.plugins:
+            return
+        metadata = {}
+        for module_name, widgets in self.module_widgets.items():
+            for channel_id in widgets["channels"]:
+                entry = self.graph_items.get(channel_id)
+                if entry is not None:
+                    metadata[channel_id] = {"name": entry["config"].display_name,
+                                            "module": module_name,
+                                            "device": widgets["device_name"] or "",
+                                            "color": entry["config"].color}
+        if self.station_server is not None:
+            self.station_server.set_metadata(metadata)
+        if self.plugins:
+            units = units_of(self.config)
+            self.plugins.set_channels({ch_id: dict(meta, units=units)
+                                       for ch_id, meta in metadata.items()})
+
+    def apply_plugin_config(self):
+        """(Re)charge les plugins de la section "plugins" ; ceux qui n'ont pas changé continuent"""
+        self.plugins.configure(self.config)
+        for name, error in self.plugins.errors.items():
+            self.show_status_message(f"Plugin {name} ignored: {error}", 10000)
+        self.publish_channel_metadata()
+        self.plugin_label.setVisible(bool(self.plugins))
+        if self.plugins:
+            self.plugin_timer.start(1000)
+            self.update_plugin_status()
+        else:
+            self.plugin_timer.stop()
+
+    def update_plugin_status(self):
+        stats = self.plugins.stats()
+        lines, alert = [], False
+        for s in stats:
+            lines.append(f"{s['name']} ({s['mode']}, {s['state']}): {s['mean_ms']:.1f} ms mean, "
+                         f"{s['max_ms']:.1f} ms max, queue {s['queued']}, lag {s['lag_s']:.2f} s, "
+                         f"{s['dropped']} samples dropped, {s['errors']} errors"
+                         + (f", busy for {s['busy_s']:.0f} s" if s["busy_s"] >= 1 else "")
+                         + (f" - {s['last_error']}" if s["last_error"] else ""))
+            alert = (alert or s["state"] == "failed" or s["dropped"] or s["errors"]
+                     or s["queued"] >= s["queue_size"])
+        worst = max(stats, key=lambda s: s["mean_ms"], default=None)
+        text = f"Plugins: {len(stats)}"
+        if worst is not None and worst["calls"]:
+            text += f" | {worst['name']} {worst['mean_ms']:.1f} ms"
+        self.plugin_label.setText(text)
+        self.plugin_label.setToolTip("\n".join(lines))
+        self.plugin_label.setStyleSheet("color: #e67e22;" if alert else "")
+
+    def on_station_status(self, station, connected, detail):
+        """Station jointe ou perdue : pastilles de ses modules, message dans la barre d'état"""
+        prefix = station + STATION_SEP
+        for module in self.module_widgets.values():
+            if (module.get("device_name") or "").startswith(prefix):
+                module["status"].setStyleSheet(status_style(connected))
+        self.show_status_message(f"Station {station} {'connected' if connected else 'lost'}"
+                                 f" ({detail})", 5000)
+
+    def start_acquisition(self, resume_run=None):
         if not self.start_btn.isEnabled():
             return
 
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
 
-        if self.acquisition_thread and self.acquisition_thread.isRunning():
+        if self.supervisor.running:
             print("[DEBUG] Thread déjà actif → arrêt")
             self.stop_acquisition()
 
-        self.worker = AcquisitionWorker(self.config)
-        self.acquisition_thread = QThread()
-
-        self.worker.moveToThread(self.acquisition_thread)
+        if not resume_run:
+            # Le temps repart de zéro : les repères de la mesure précédente n'y ont plus de sens
+            self.annotations = AnnotationIndex()
+            self.refresh_annotations()
 
-        self.worker.new_data.connect(self.handle_new_data)
-        self.worker.finished.connect(self.acquisition_thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.acquisition_thread.finished.connect(self.acquisition_thread.deleteLater)
-
-        # 👉 Démarre le timer après que le thread ait démarré
-        self.acquisition_thread.started.connect(self.worker.start_timer)
+        if self.viewer_mode:
+            self.remote_viewer.start()
+        else:
+            # Le thread démarre tout de suite ; ses blocs n'arrivent qu'au retour dans la boucle Qt
+            self.supervisor.start(self.config)
 
-        self.acquisition_thread.start()
+        if resume_run:
+            self.resume_recording(resume_run)
+        elif self.record_cb.isChecked():
+            self.start_recording()
 
         QTimer.singleShot(500, lambda: self.stop_btn.setEnabled(True))
 
     def stop_acquisition(self):
-        if self.worker:
-            self.worker.stop()
-            
-        if self.acquisition_thread:
-            self.acquisition_thread.quit()
-            self.acquisition_thread.wait()
-
-        self.worker = None
-        self.acquisition_thread = None
+        if self.sequencer is not None:
+            # Avant la fermeture du run : l'interruption figure dans ses évènements
+            self.apply_sequence_actions(self.sequencer.abort("acquisition stopped"))
+        self.remote_viewer.stop()
+        self.recording_pending = False
+        # Arrêt borné : un thread bloqué dans le driver est abandonné, pas attendu
+        if not self.supervisor.stop():
+            self.show_status_message("Acquisition thread did not stop in time (driver blocked?)", 10000)
+        # Derniers blocs encore en file : enregistrés avant la fermeture du run
+        self.drain_pipeline()
+        self.stop_recording()
+        self.offline_since.clear()
 
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
 
-    def handle_new_data(self, data):
-        for channel_id, value in data.items():
-            curve = self.graph_items.get(channel_id, {}).get("curve")
-            config = self.graph_items.get(channel_id, {}).get("config")
+    def set_recording_enabled(self, enabled):
+        self.config.sections.setdefault("recording", {})["enabled"] = bool(enabled)
+        self.save_config()
 
-            if curve and isinstance(value, (int, float)):
-                curve.setData([0, 1, 2, 3, 4], [value] * 5)
+    def start_recording(self, wait_stations=True, generation=None):
+        """`generation` : le run n'est ouvert qu'au premier bloc acquis avec cette config"""
+        rec_cfg = self.config.section("recording")
+        if self.viewer_mode and wait_stations and not self.remote_viewer.ready:
+            # Colonnes du run fixées à la création : on attend les listes de canaux, avec une limite
+            self.recording_pending = True
+            wait_s = self.config.section("remote").get("record_wait_s", 10.0)
+            QTimer.singleShot(int(wait_s * 1000), self.start_pending_recording)
+            self.show_status_message("Recording waits for stations: "
+                                     + ", ".join(self.remote_viewer.missing_stations()), 5000)
+            return
+        self.recording_pending = False
+        if self.viewer_mode:
+            channel_ids = list(self.remote_viewer.channel_ids)
+            if not channel_ids:
+                QMessageBox.warning(self, "Warning", "Could not start recording:\nno station answered")
+                return
+            if self.remote_viewer.missing_stations():
+                print("[WARN] Recording without stations "
+                      + ", ".join(self.remote_viewer.missing_stations()))
+        else:
+            # Mêmes colonnes que les blocs du worker, calculées ici : le worker vit dans un autre
+            # thread et n'existe pas pendant une relance
+            physical = list(self.config.enabled_channel_ids)
+            plan, _ = compile_virtual_channels(self.config.virtual_channels, physical)
+            channel_ids = physical + list(plan.channel_ids)
+        run_id = new_run_id()
+        try:
+            snapshot = self.config.to_dict()
+            self.recorder = RunRecorder.create(run_id, channel_ids, snapshot,
+                                               runs_dir=rec_cfg.get("directory", RUNS_DIR))
+            run_id = self.recorder.meta["run_id"]
+            journal = RunJournal(checkpoint_s=rec_cfg.get("checkpoint_s", 10.0))
+            journal.start_run(run_id, self.recorder.run_dir, snapshot)
+        except OSError as e:
+            QMessageBox.warning(self, "Warning", f"Could not start recording:\n{str(e)}")
+            self.recorder = None
+            # Segment précédent laissé ouvert pour la passation (next_segment) : fermé quand même
+            self.record_writer.close()
+            return
+        self.record_writer.open(self.recorder, journal, records_filtered(snapshot), generation)
+        self.show_status_message(f"Recording run {run_id}")
 
-                # ➕ Met à jour le nom avec la température
-                new_label = f"{config['display_name']} : {value:.1f}°C"
+    def start_pending_recording(self):
+        """Délai d'attente écoulé : le run est créé avec les stations présentes"""
+        if self.recording_pending and self.remote_viewer.running and self.recorder is None:
+            self.start_recording(wait_stations=False)
 
-                # 🔍 Mise à jour du QLabel correspondant dans la liste
-                item_count = self.channel_list.count()
-                for i in range(item_count):
-                    item = self.channel_list.item(i)
-                    widget = self.channel_list.itemWidget(item)
-                    if widget:
-                        labels = widget.findChildren(QLabel)
-                        for label in labels:
-                            if label.text().startswith(config['display_name']):
-                                label.setText(new_label)
-                                break  # 🛑 On a trouvé le bon QLabel, on sort
+    def resume_recording(self, run):
+        rec_cfg = self.config.section("recording")
+        try:
+            self.recorder = RunRecorder.resume(run["run_dir"])
+            journal = RunJournal(checkpoint_s=rec_cfg.get("checkpoint_s", 10.0))
+            journal.resume_run(run["run_id"], self.recorder.position)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Warning", f"Could not resume run {run['run_id']}:\n{str(e)}")
+            self.recorder = None
+            return
+        self.record_writer.open(self.recorder, journal,
+                                records_filtered(self.recorder.meta.get("config", {})))
+        # Repères déjà posés dans ce run, ramenés à l'horloge de la reprise
+        self.annotations = load_annotations(run["run_dir"], self.recorder.time_offset)
+        self.refresh_annotations()
+        self.show_status_message(f"Resumed recording of run {run['run_id']}")
+
+    def stop_recording(self, next_segment=False):
+        """`next_segment` : fermé par le thread d'écriture à l'ouverture du run suivant"""
+        if self.recorder is None:
+            return
+        # Module ou châssis encore absent à l'arrêt : le trou court jusqu'au dernier échantillon
+        for source, t_start in self.offline_since.items():
+            self.log_gap(source, t_start + self.recorder.time_offset)
+        if not next_segment:
+            # Fermé par le thread d'écriture, après les blocs encore en file
+            self.record_writer.close()
+        self.recorder = None
+
+    def check_interrupted_run(self):
+        """Propose (ou applique, si auto_resume) la reprise d'un run interrompu"""
+        run = find_interrupted_run()
+        if run is None or self.recorder is not None:
+            return
+
+        if not self.config.section("recording").get("auto_resume", False):
+            started = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["start_time"]))
+            answer = QMessageBox.question(
+                self, "Resume run",
+                f"Run {run['run_id']} (started {started}) was interrupted.\n"
+                "Resume acquisition and recording into the same run?"
+            )
+            if answer != QMessageBox.Yes:
+                RunJournal().stop_run(run["run_id"], run["position"], abandoned=True)
+                return
 
+        # Même configuration qu'au départ du run, pour garder les mêmes colonnes
+        try:
+            self.config = ThermotionConfig.from_dict(run["config"])
+        except ConfigError as e:
+            QMessageBox.warning(self, "Warning", f"Could not resume run {run['run_id']}:\n{str(e)}")
+            return
+        self.update_display()
+        self.start_acquisition(resume_run=run)
+
+    # --- Séquenceur d'essai ------------------------------------------------------
+
+    def toggle_sequence(self):
+        if self.sequencer is not None:
+            answer = QMessageBox.question(self, "Abort sequence",
+                                          f"Abort sequence '{self.sequencer.plan.name}'?")
+            if answer == QMessageBox.Yes:
+                self.apply_sequence_actions(self.sequencer.abort())
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Run Test Sequence",
+                                              PLANS_DIR if os.path.isdir(PLANS_DIR) else "",
+                                              "Sequence plans (*.json)")
+        if path:
+            self.start_sequence(path)
+
+    def start_sequence(self, path):
+        """Charge un plan et l'arme ; l'acquisition est lancée si besoin, le plan part au premier bloc"""
+        display_config = self.remote_viewer.merged_config() if self.viewer_mode else self.config
+        try:
+            sequencer = Sequencer(TestPlan.load(path), display_config)
+        except (OSError, PlanError) as e:
+            QMessageBox.warning(self, "Warning", f"Could not load sequence:\n{str(e)}")
+            return False
+        runs_dir = self.config.section("recording").get("directory", RUNS_DIR)
+        try:
+            self.sequence_log = SequenceLog(sequencer, os.path.join(runs_dir, "sequences"))
+        except OSError as e:
+            print(f"[WARN] Sequence log unavailable: {e}")
+            self.sequence_log = None
+        self.sequencer = sequencer
+        self.sequencer.start()
+        print(f"[Sequencer] '{sequencer.plan.name}' armed ({len(sequencer.plan.steps)} steps)")
+        self.sequence_btn.setText("Abort Sequence")
+        self.sequence_label.setText(sequencer.status_text())
+        self.sequence_label.show()
+        if not (self.supervisor.running or self.remote_viewer.running):
+            self.start_acquisition()
+        return True
+
+    def apply_sequence_actions(self, actions):
+        """Exécute les actions renvoyées par le séquenceur (repères, segments, évènements)"""
+        for action in actions:
+            kind = action[0]
+            if kind == "event":
+                event = action[1]
+                if self.sequence_log is not None:
+                    self.sequence_log.write(dict(event))
+                if self.recorder is not None:
+                    event = dict(event)
+                    if event.get("t") is not None:
+                        event["t"] += self.recorder.time_offset
+                    self.record_writer.log_event(event)
+            elif kind == "mark":
+                self.add_annotation(Annotation(action[1], action[2]))
+            elif kind == "record" and action[1] == "start":
+                if self.recorder is None and not self.recording_pending:
+                    self.start_recording()
+                self.log_sequence_segment("start")
+            elif kind == "record":
+                self.log_sequence_segment("stop")
+                self.stop_recording()
+            elif kind == "finished":
+                self.finish_sequence(action[1])
+
+    def log_sequence_segment(self, state):
+        if self.sequence_log is not None and self.recorder is not None:
+            self.sequence_log.write({"type": "segment", "state": state,
+                                     "run_id": self.recorder.meta["run_id"]})
+
+    def finish_sequence(self, state):
+        sequencer, self.sequencer = self.sequencer, None
+        if self.sequence_log is not None:
+            self.sequence_log.close()
+            self.sequence_log = None
+        print(f"[Sequencer] '{sequencer.plan.name}' {state}")
+        self.sequence_btn.setText("Run Sequence...")
+        self.sequence_label.setText(sequencer.status_text())
+        self.show_status_message(f"Sequence '{sequencer.plan.name}' {state}", 10000)
+
+    def update_timing_status(self, stats):
+        text = (f"{stats['achieved_rate']:.2f} / {stats['target_rate']:.2f} Hz"
+                f" | overruns: {stats['overruns']}"
+                f" | missed: {stats['missed_deadlines']}")
+        if stats["current_rate"] < stats["target_rate"]:
+            text += f" | degraded: {stats['current_rate']:.2f} Hz"
+        queues = self.pipeline.stats()
+        backlog = max(q["blocks"] for q in queues.values())
+        dropped = {name: q["dropped_samples"] for name, q in queues.items() if q["dropped_samples"]}
+        if backlog > 1:
+            text += f" | backlog: {backlog} blocks"
+        if dropped:
+            text += " | dropped: " + ", ".join(f"{name} {n}" for name, n in dropped.items())
+        self.timing_label.setText(text)
+        self.timing_label.setToolTip("\n".join(
+            f"{name} ({q['policy']}): {q['blocks']} blocks / {q['samples']} samples queued, "
+            f"peak {q['peak_samples']} samples ({q['peak_bytes'] / 1e6:.1f} MB), "
+            f"{q['dropped_samples']} samples dropped" for name, q in queues.items()))
+        self.timing_label.setStyleSheet("color: #e67e22;" if stats["missed_deadlines"] or dropped
+                                        else "")
+
+    def configure_pipeline(self):
+        """Bornes des files : historique affiché, et mémoire tolérée avant perte pour l'enregistrement"""
+        self.pipeline.configure(
+            record_queue_mb=self.config.section("recording").get("queue_mb", RECORD_QUEUE_MB),
+            display_samples=self.config.section("display").get("history_samples", 3600))
+
+    def drain_pipeline(self):
+        """Tout l'arriéré d'un coup : chaque bloc pour le séquenceur, un seul rafraîchissement"""
+        batches = self.pipeline.take()
+        blocks, lost = batches[PROCESS]
+        if lost is not None:
+            self.log_pipeline_loss(*lost)
+        for block in blocks:
+            self.handle_new_data(block)
+        blocks, _ = batches[DISPLAY]
+        if blocks:
+            self.display_blocks(blocks)
+
+    def log_pipeline_loss(self, t_start, t_end):
+        """Interface bloquée au-delà de recording.queue_mb : blocs sautés (hors enregistrement)"""
+        print(f"[WARN] Processing too slow, blocks skipped from t={t_start:.3f} s to t={t_end:.3f} s")
+        self.show_status_message("Processing too slow: sequencer and plugins skipped data "
+                                 "(see recording.queue_mb)", 10000)
+
+    def on_record_lost(self, t_start, t_end):
+        """Écriture trop lente (disque) : trou déjà noté dans le run par le thread d'écriture"""
+        self.show_status_message(f"Recording too slow: data lost from t={t_start:.1f} s "
+                                 f"to t={t_end:.1f} s (see recording.queue_mb)", 10000)
+
+    def on_record_failed(self, run_id, error):
+        if self.recorder is not None and self.recorder.meta["run_id"] == run_id:
+            self.recorder = None
+        QMessageBox.warning(self, "Warning", f"Recording of run {run_id} stopped:\n{error}")
+
+    def handle_new_data(self, block):
+        """Consommateurs sans perte de l'interface : séquenceur, publication, plugins"""
+        if self.sequencer is not None:
+            # Ouverture / fermeture de segment mises en file d'écriture après les blocs déjà reçus
+            self.apply_sequence_actions(self.sequencer.on_block(block))
+            if self.sequencer is not None:
+                self.sequence_label.setText(self.sequencer.status_text())
+        if self.station_server is not None:
+            self.station_server.publish(block)
+        if self.plugins:
+            self.plugins.submit(block)
+
+    def display_blocks(self, blocks):
+        """Historique affiché (au plus sa profondeur, les plus récents) puis un seul rafraîchissement"""
+        for block in blocks:
+            self.sample_store.append(block)
+            # Une seule passe numpy pour toutes les réductions de modules du bloc
+            if self.group_reducer.group_names:
+                latest = self.sample_store.values()[:, -block.n_samples:]
+                self.summary_store.append(DataBlock(self.summary_store.channel_ids, block.timestamps,
+                                                    self.group_reducer.reduce(latest)))
+        self.refresh_curves()
+
+        for channel_id, value in blocks[-1].latest().items():
+            entry = self.graph_items.get(channel_id)
+            if not entry:
+                continue
+
+            if np.isfinite(value):
+                # ➕ Met à jour le nom avec la température
+                entry["label"].setText(f"{entry['config'].display_name} : {value:.1f}{self.units_symbol}")
+
+
+    def refresh_curves(self):
+        """Recharge les courbes affichées depuis l'historique (vues numpy, sans copie)"""
+        if self.reference_diff:
+            self.refresh_reference_diff()
+        if self.summary_mode:
+            t = self.summary_store.timestamps()
+            for module_name, items in self.summary_items.items():
+                for kind in ("mean", "min", "max"):
+                    items[kind].setData(t, self.summary_store.series((module_name, kind))[1])
+        elif self.batched_items:
+            # Tous les panneaux lisent les mêmes vues : pas de copie par panneau ;
+            # bornes des items données par l'index du store, pas recalculées sur la matrice
+            t, values = self.sample_store.timestamps(), self.sample_store.values()
+            for item in self.batched_items.values():
+                item.setData(t, values, self.sample_store.value_range(rows=item.visibleRows()))
+        else:
+            for channel_id, entry in self.graph_items.items():
+                entry["curve"].setData(*self.sample_store.series(channel_id))
+        self.update_viewport()
+
+    def update_viewport(self, *args):
+        store = self.summary_store if self.summary_mode else self.sample_store
+        t = store.timestamps()
+        if len(t):
+            self.viewport.update(float(t[0]), float(t[-1]), self.pane_value_range)
+
+    def pane_value_range(self, pane, x0, x1):
+        """(min, max) des courbes visibles du panneau sur [x0, x1], lus dans l'index du store"""
+        if self.summary_mode:
+            rows = [self.summary_store.index[(module_name, kind)]
+                    for module_name, items in self.summary_items.items()
+                    if items["pane"] == pane and items["mean"].isVisible()
+                    for kind in ("min", "max")]
+            return self.summary_store.value_range(x0, x1, rows)
+        rows = [entry["row"] for entry in self.graph_items.values()
+                if entry["pane"] == pane and entry["checkbox"].isChecked()]
+        return self.sample_store.value_range(x0, x1, rows)
+
+    def on_follow_changed(self, follow):
+        self.follow_cb.blockSignals(True)
+        self.follow_cb.setChecked(follow)
+        self.follow_cb.blockSignals(False)
+
+    # --- Repères ---------------------------------------------------------------
+
+    def current_time(self):
+        """Instant du dernier échantillon, dans l'échelle de temps des courbes"""
+        t = self.sample_store.timestamps()
+        return float(t[-1]) if t.shape[0] else 0.0
+
+    def add_marker(self, quick=False):
+        t = self.current_time()
+        text = f"Mark {len(self.annotations) + 1}"
+        if not quick:
+            text, ok = QInputDialog.getText(self, "Event Marker", f"Event at t = {t:.1f} s:",
+                                            QLineEdit.Normal, text)
+            if not ok:
+                return
+        self.add_annotation(Annotation(t, text))
+
+    def toggle_region(self):
+        t = self.current_time()
+        if self.region_start is None:
+            self.region_start = t
+            self.region_btn.setText("End Region")
+            return
+        start, self.region_start = self.region_start, None
+        self.region_btn.setText("Start Region")
+        text, ok = QInputDialog.getText(self, "Event Region", f"Region {start:.1f} - {t:.1f} s:",
+                                        QLineEdit.Normal, f"Region {len(self.annotations) + 1}")
+        if ok:
+            self.add_annotation(Annotation(min(start, t), text, t_end=max(start, t)))
+
+    def add_annotation(self, annotation):
+        self.annotations.add(annotation)
+        if self.recorder is not None:
+            self.record_writer.log_event(annotation.to_event(self.recorder.time_offset))
+        self.refresh_annotations()
+        if any(ref.align_marker == annotation.text for ref in self.references):
+            # Repère d'alignement posé en direct : les références s'y recalent
+            self.align_references()
+        self.show_status_message(f"Marker '{annotation.text}' at {annotation.t:.1f} s")
+
+    def jump_to_annotation(self, direction):
+        """Centre la vue sur le repère suivant (1) ou précédent (-1), largeur conservée"""
+        if not self.panes:
+            return
+        first = next(iter(self.panes.values()))
+        x0, x1 = first.viewRange()[0]
+        center, half = (x0 + x1) / 2, (x1 - x0) / 2
+        target = (self.annotations.next_after(center + 1e-9) if direction > 0
+                  else self.annotations.previous_before(center - 1e-9))
+        if target is not None:
+            self.viewport.set_follow(False, 2 * half)
+            first.setXRange(target.t - half, target.t + half, padding=0)
+
+    def connect_view_range(self):
+        # Axes X liés : la plage du premier panneau vaut pour tous
+        self.viewport.attach(self.panes, [name for name in self.panes if name != REFERENCE_DIFF_PANE])
+        if self.panes:
+            first = next(iter(self.panes.values()))
+            first.getViewBox().sigXRangeChanged.connect(self.refresh_annotations)
+            first.getViewBox().sigXRangeChanged.connect(self.refresh_references)
+            # Vue déplacée hors suivi : Y réajusté à la nouvelle fenêtre
+            first.getViewBox().sigXRangeChanged.connect(self.update_viewport)
+
+    def refresh_annotations(self, *args):
+        """Dessine les seuls repères de la plage visible, avec des items réutilisés"""
+        if not self.panes:
+            return
+        first = next(iter(self.panes.values()))
+        x0, x1 = first.viewRange()[0]
+        markers = self.annotations.markers_in(x0, x1)
+        regions = self.annotations.regions_in(x0, x1)
+        if len(markers) > MAX_VISIBLE_ANNOTATIONS:
+            markers = markers[::-(-len(markers) // MAX_VISIBLE_ANNOTATIONS)]
+        regions = regions[:MAX_VISIBLE_ANNOTATIONS]
+
+        for i, (pane_name, plot) in enumerate(self.panes.items()):
+            pool = self.annotation_items.setdefault(pane_name, {"lines": [], "regions": []})
+            while len(pool["lines"]) < len(markers):
+                line = pg.InfiniteLine(angle=90, movable=False, pen=cached_pen(ANNOTATION_COLOR, 1),
+                                       label="" if i == 0 else None,
+                                       labelOpts={"position": 0.95, "color": ANNOTATION_COLOR})
+                plot.addItem(line, ignoreBounds=True)
+                pool["lines"].append(line)
+            while len(pool["regions"]) < len(regions):
+                region = pg.LinearRegionItem(movable=False,
+                                             brush=cached_brush(ANNOTATION_COLOR, 40))
+                plot.addItem(region, ignoreBounds=True)
+                pool["regions"].append(region)
+
+            for line, marker in zip(pool["lines"], markers):
+                line.setValue(marker.t)
+                label = getattr(line, "label", None)  # seul le premier panneau a des étiquettes
+                if label is not None:
+                    # Gabarit str.format relu à chaque setValue : accolades du texte échappées
+                    label.setFormat(marker.text.replace("{", "{{").replace("}", "}}"))
+                line.show()
+            for line in pool["lines"][len(markers):]:
+                line.hide()
+            for item, region in zip(pool["regions"], regions):
+                item.setRegion((region.t, region.t_end))
+                item.setToolTip(region.text)
+                item.show()
+            for item in pool["regions"][len(regions):]:
+                item.hide()
+
+    # --- Runs de référence ---------------------------------------------------
+
+    def open_references(self):
+        dialog = ReferenceRunDialog(self.references, self.reference_diff, self.annotations, self,
+                                    runs_dir=self.config.section("recording").get("directory", RUNS_DIR))
+        if dialog.exec() == QDialog.Accepted:
+            self.set_references(dialog.references, dialog.show_difference, dialog.align_markers)
+
+    def set_references(self, references, show_difference, align_markers=None):
+        """`align_markers` : repère d'alignement de chaque run (None : inchangés)"""
+        had_diff_pane = self.reference_diff and bool(self.references)
+        self.references = list(references)
+        for reference, marker in zip(self.references, align_markers or ()):
+            reference.align(marker, self.annotations)
+        self.reference_diff = bool(show_difference)
+        if had_diff_pane != (self.reference_diff and bool(self.references)):
+            self.update_display()   # panneau de différence ajouté ou retiré
+        else:
+            self.build_reference_items()
+
+    def align_references(self):
+        for reference in self.references:
+            reference.align(reference.align_marker, self.annotations)
+        self.refresh_references()
+        if self.reference_diff:
+            self.refresh_reference_diff()
+
+    def build_reference_items(self):
+        """Une courbe pointillée par canal commun à la référence et à l'affichage"""
+        for (run, channel_id), items in self.reference_items.items():
+            for kind, item in items.items():
+                if item is not None:
+                    pane = REFERENCE_DIFF_PANE if kind == "diff" else self.graph_items.get(
+                        channel_id, {}).get("pane")
+                    if pane in self.panes:
+                        self.panes[pane].removeItem(item)
+        self.reference_items = {}
+
+        for run, reference in enumerate(self.references):
+            reference.align(reference.align_marker, self.annotations)
+            style = REFERENCE_STYLES[run % len(REFERENCE_STYLES)]
+            for channel_id in reference.common_channels(self.graph_items):
+                entry = self.graph_items[channel_id]
+                pen = cached_pen(entry["config"].color, 1, style)
+                overlay = pg.PlotCurveItem(pen=pen, connect="finite")
+                # Hors des bornes d'autoscale : une référence plus longue ne change pas la vue
+                self.panes[entry["pane"]].addItem(overlay, ignoreBounds=True)
+                diff = None
+                if self.reference_diff and REFERENCE_DIFF_PANE in self.panes:
+                    diff = pg.PlotCurveItem(pen=pen, connect="finite")
+                    self.panes[REFERENCE_DIFF_PANE].addItem(diff)
+                self.reference_items[(run, channel_id)] = {"overlay": overlay, "diff": diff}
+        self.refresh_references()
+        if self.reference_diff:
+            self.refresh_reference_diff()
+
+    def visible_reference_channels(self, reference, run):
+        if self.summary_mode:
+            return []
+        return [ch_id for ch_id in reference.common_channels(self.graph_items)
+                if (run, ch_id) in self.reference_items
+                and self.graph_items[ch_id]["checkbox"].isChecked()]
+
+    def refresh_references(self, *args):
+        """Recharge les courbes de référence décimées à la plage et à la largeur de la vue"""
+        if not self.reference_items or not self.panes:
+            return
+        first = next(iter(self.panes.values()))
+        x0, x1 = first.viewRange()[0]
+        n_pixels = max(int(first.getViewBox().width()), 100)
+        for run, reference in enumerate(self.references):
+            channel_ids = self.visible_reference_channels(reference, run)
+            t, curves = reference.envelope(channel_ids, x0, x1, n_pixels)
+            for (item_run, channel_id), items in self.reference_items.items():
+                if item_run != run:
+                    continue
+                visible = channel_id in curves
+                items["overlay"].setVisible(visible)
+                if items["diff"] is not None:
+                    items["diff"].setVisible(visible)
+                if visible:
+                    items["overlay"].setData(t, curves[channel_id])
+
+    def refresh_reference_diff(self):
+        """Direct moins référence, aux instants de l'historique (référence interpolée)"""
+        t = self.sample_store.timestamps()
+        for run, reference in enumerate(self.references):
+            channel_ids = [ch_id for ch_id in self.visible_reference_channels(reference, run)
+                           if self.reference_items[(run, ch_id)]["diff"] is not None]
+            if not channel_ids:
+                continue
+            ref_values = reference.values_at(channel_ids, t)
+            for k, channel_id in enumerate(channel_ids):
+                live = self.sample_store.series(channel_id)[1]
+                self.reference_items[(run, channel_id)]["diff"].setData(t, live - ref_values[k])
+
+    def set_opengl(self, enabled):
+        """Active le viewport OpenGL du graphe (logiciel si demandé au lancement)"""
+        if enabled == self.opengl_enabled:
+            return
+        if enabled and not opengl_available():
+            print("[WARN] No OpenGL context available, using raster rendering")
+            return
+        try:
+            self.plot_view.useOpenGL(enabled)
+            self.opengl_enabled = enabled
+        except Exception as e:
+            print(f"[WARN] OpenGL unavailable, using raster rendering: {e}")
 
     def update_graph(self, data):
         for channel_id, value in data.items():
@@ -559,34 +1569,101 @@ class MainWindow(QMainWindow):
                 # ⚠️ À adapter pour stocker et faire défiler les valeurs
                 curve.setData([0, 1, 2, 3, 4], [value]*5)
 
-    def check_device_status(self):
-        try:
-            from nidaqmx.system import System
-            system = System.local()
-            connected_devices = set(dev.name for dev in system.devices)
-
-            updated = False
-            for device_name, device_cfg in self.config.get("devices", {}).items():
-                previous = device_cfg.get("online", True)
-                now = device_name in connected_devices
-
-                if previous != now:
-                    device_cfg["online"] = now
-                    updated = True
-                    status = "connecté" if now else "déconnecté"
-                    print(f"[INFO] {device_name} est maintenant {status}")
-                    self.show_status_message(f"{device_name} est maintenant {status}")
-
-            if updated:
-                self.update_display()
-
-        except Exception as e:
-            print(f"[ERROR] Failed to check device status: {e}")
-
+    def start_device_watcher(self):
+        known = {name: device.online for name, device in self.config.devices.items()}
+        interval = self.config.section("acquisition").get("device_poll_ms", 500)
+        self.device_watcher = DeviceWatcher(known, interval_ms=interval)
+        self.watcher_thread = QThread()
+        self.device_watcher.moveToThread(self.watcher_thread)
+        self.device_watcher.device_changed.connect(self.on_device_changed)
+        self.watcher_thread.started.connect(self.device_watcher.start)
+        self.watcher_thread.start()
+
+    def stop_device_watcher(self):
+        if self.watcher_thread is None:
+            return
+        # Le timer du watcher doit être arrêté depuis son propre thread
+        QMetaObject.invokeMethod(self.device_watcher, "stop", Qt.BlockingQueuedConnection)
+        self.watcher_thread.quit()
+        self.watcher_thread.wait()
+        self.watcher_thread = None
+
+    def on_device_changed(self, device_name, online):
+        """Module branché ou retiré : seule sa pastille et son châssis sont touchés"""
+        self.device_online_changed.emit(device_name, online)
+        device_cfg = self.config.devices.get(device_name)
+        if device_cfg is None or device_cfg.online == online:
+            return
+        device_cfg.online = online
+        for module in self.module_widgets.values():
+            if module.get("device_name") == device_name:
+                module["status"].setStyleSheet(status_style(online))
+
+        status = "connecté" if online else "déconnecté"
+        print(f"[INFO] {device_name} est maintenant {status}")
+        self.show_status_message(f"{device_name} est maintenant {status}")
+        if self.recorder is not None:
+            self.record_writer.log_event({"type": "device", "device": device_name, "online": online})
+
+    def on_device_status(self, source, online, t):
+        """Module ou châssis perdu / retrouvé par le worker ; ses colonnes sont à NaN entre les deux"""
+        if self.station_server is not None:
+            self.station_server.publish_status(source, online, t)
+        if not online:
+            self.offline_since.setdefault(source, t)
+            self.show_status_message(f"{source} offline, other devices still sampling")
+            if self.recorder is not None:
+                self.record_writer.log_event({"type": "offline", "source": source,
+                                              "t": t + self.recorder.time_offset})
+        else:
+            t_start = self.offline_since.pop(source, None)
+            self.show_status_message(f"{source} back online")
+            if self.recorder is None or t_start is None:
+                return
+            if source == ENGINE_SOURCE:
+                # Moteur relancé : aucune ligne entre les deux, une ligne NaN coupe les courbes
+                self.record_writer.mark_gap(t_start + self.recorder.time_offset,
+                                            t + self.recorder.time_offset,
+                                            "acquisition engine restarted")
+            else:
+                self.log_gap(source, t_start + self.recorder.time_offset,
+                             t + self.recorder.time_offset)
+
+    def on_health_changed(self, state, detail):
+        text = f"Engine: {state}"
+        self.health_label.setText(text)
+        self.health_label.setToolTip(detail)
+        self.health_label.setStyleSheet("" if state in (HEALTH_RUNNING, HEALTH_STOPPED)
+                                        else "color: #e74c3c; font-weight: bold;")
+        if state not in (HEALTH_RUNNING, HEALTH_STOPPED):
+            self.show_status_message(f"{text} - {detail}", 10000)
+        if self.recorder is not None and state != HEALTH_STOPPED:
+            self.record_writer.log_event({"type": "engine", "state": state, "detail": detail})
+
+    def log_gap(self, source, t_start, t_end=None):
+        """Décrit un trou dans events.jsonl : quelles colonnes, de quand à quand (None : fin du run)"""
+        channels = [ch_id for ch_id in self.recorder.channel_ids
+                    if source == ENGINE_SOURCE
+                    or ch_id.split("/")[0] == source or chassis_of(ch_id) == source
+                    or ch_id.startswith(source + STATION_SEP)]
+        event = {"type": "gap", "source": source, "reason": "device offline",
+                 "t_start": t_start, "t_end": t_end, "channels": channels}
+        if t_end is None:
+            self.record_writer.log_gap_to_end(event)
+        else:
+            self.record_writer.log_event(event)
 
     def closeEvent(self, event):
         print("[DEBUG] Fermeture de l'application...")
         self.stop_acquisition()
+        # Dernières écritures et fermeture du run avant de quitter
+        self.record_writer.shutdown()
+        self.supervisor.shutdown()
+        self.remote_viewer.shutdown()
+        if self.station_server is not None:
+            self.station_server.stop()
+        self.plugins.shutdown()
+        self.stop_device_watcher()
         event.accept()
 
     def show_status_message(self, message: str, duration_ms: int = 3000):
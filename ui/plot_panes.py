@@ -0,0 +1,151 @@
+import fnmatch
+from functools import partial
+
+import numpy as np
+
+DEFAULT_PANE = "Temperatures"
+
+
+def resolve_panes(panes_cfg, modules):
+    """Répartit les canaux entre les panneaux configurés.
+
+    `panes_cfg` est la liste config["display"]["panes"] :
+        [{"name": "Cryo", "modules": ["cDAQ2Mod1"], "channels": ["cDAQ2Mod3/ai*"]}, ...]
+    Un module est désigné par son nom de périphérique ou son nom affiché ; un
+    canal par son identifiant (motifs acceptés). Le premier panneau qui
+    correspond l'emporte ; les canaux non attribués vont dans le premier.
+
+    `modules` est {nom affiché: {"device_name": ..., "channels": [ChannelConfig, ...]}}.
+    Renvoie (noms des panneaux dans l'ordre, {canal: panneau}).
+    """
+    panes_cfg = [p for p in (panes_cfg or []) if p.get("name")]
+    pane_names = [p["name"] for p in panes_cfg] or [DEFAULT_PANE]
+
+    assignment = {}
+    for module_name, module_data in modules.items():
+        for channel in module_data["channels"]:
+            channel_id = channel.channel_id
+            for pane in panes_cfg:
+                if module_name in pane.get("modules", []) \
+                        or module_data["device_name"] in pane.get("modules", []) \
+                        or any(fnmatch.fnmatchcase(channel_id, pattern)
+                               for pattern in pane.get("channels", [])):
+                    assignment[channel_id] = pane["name"]
+                    break
+            else:
+                assignment[channel_id] = pane_names[0]
+    return pane_names, assignment
+
+
+def build_panes(layout_widget, pane_names):
+    """(Re)crée un PlotItem par panneau, empilés, axes X liés, axe Y propre à chacun."""
+    layout_widget.clear()
+    plots = {}
+    first = None
+    for i, name in enumerate(pane_names):
+        plot = layout_widget.addPlot(row=i, col=0)
+        plot.addLegend()
+        plot.showGrid(x=True, y=True)
+        plot.setLabel('left', 'Temperature', 'degC')
+        if len(pane_names) > 1:
+            plot.setTitle(name)
+        if first is None:
+            first = plot
+        else:
+            plot.setXLink(first)
+        plots[name] = plot
+    if plots:
+        plots[pane_names[-1]].setLabel('bottom', 'Time', 's')
+    return plots
+
+
+class LiveViewport:
+    """Cadrage des panneaux tenu par l'application, pas par l'autoscale de pyqtgraph.
+
+    L'autoscale de pyqtgraph reparcourt tous les points de toutes les courbes
+    à chaque mise à jour. Ici, en suivi, l'axe X glisse simplement jusqu'au
+    dernier échantillon (même largeur, ou tout l'historique) et l'axe Y de
+    chaque panneau géré prend les bornes de la fenêtre visible, demandées à
+    `y_range(panneau, x0, x1)` (index min/max du SampleStore).
+
+    Un déplacement ou un zoom à la souris coupe le suivi (X, la largeur est
+    retenue) ou l'ajustement Y du panneau touché ; le bouton "A" de
+    pyqtgraph les rétablit. Les panneaux non gérés gardent l'autoscale Y de
+    pyqtgraph.
+    """
+
+    def __init__(self, follow_window_s=None, on_follow_changed=None):
+        self.panes = {}
+        self.managed = set()
+        self.follow = True
+        self.window_s = follow_window_s   # None : tout l'historique
+        self.auto_y = {}
+        self.on_follow_changed = on_follow_changed
+        self._x_range = None
+        self._y_ranges = {}
+
+    def attach(self, panes, managed):
+        self.panes = panes
+        self.managed = set(managed)
+        self.auto_y = {name: True for name in self.managed}
+        self._x_range = None
+        self._y_ranges = {}
+        for name, plot in panes.items():
+            view = plot.getViewBox()
+            view.enableAutoRange(x=False)
+            if name in self.managed:
+                view.enableAutoRange(y=False)
+            # Signal du PlotItem : relaie celui de la ViewBox et le bouton "A"
+            plot.sigRangeChangedManually.connect(partial(self._changed_manually, name))
+
+    def set_follow(self, follow, window_s=None):
+        self.follow = bool(follow)
+        if window_s is not None:
+            self.window_s = window_s
+        self._x_range = None
+        if self.on_follow_changed is not None:
+            self.on_follow_changed(self.follow)
+
+    def _changed_manually(self, name, mask):
+        view = self.panes[name].getViewBox()
+        auto_x, auto_y = view.autoRangeEnabled()
+        # Bouton "A" : pyqtgraph vient de réactiver son autoscale, on le reprend à notre compte
+        if auto_x or auto_y:
+            view.enableAutoRange(x=False, y=False if name in self.managed else None)
+            if auto_x:
+                self.set_follow(True)
+                self.window_s = None
+            if auto_y and name in self.managed:
+                self.auto_y[name] = True
+                self._y_ranges.pop(name, None)
+            return
+        if mask[0] and self.follow:
+            x0, x1 = view.viewRange()[0]
+            self.set_follow(False, x1 - x0)
+        if mask[1] and name in self.managed:
+            self.auto_y[name] = False
+
+    def update(self, t_first, t_last, y_range):
+        """Recadre après un bloc ; seules les plages qui changent sont transmises à pyqtgraph."""
+        if not self.panes:
+            return
+        first = next(iter(self.panes.values()))
+        if self.follow and t_last is not None:
+            x0 = t_first if self.window_s is None else t_last - self.window_s
+            x_range = (x0, max(t_last, x0 + 1e-6))
+            if x_range != self._x_range:
+                self._x_range = x_range
+                first.setXRange(*x_range, padding=0)
+        else:
+            x_range = tuple(first.viewRange()[0])
+        for name in self.managed:
+            if not self.auto_y.get(name):
+                continue
+            low, high = y_range(name, *x_range)
+            if not (np.isfinite(low) and np.isfinite(high)):
+                continue
+            if high - low < 1e-9:
+                low, high = low - 0.5, high + 0.5
+            if self._y_ranges.get(name) != (low, high):
+                self._y_ranges[name] = (low, high)
+                self.panes[name].setYRange(low, high)
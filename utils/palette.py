@@ -0,0 +1,89 @@
+import math
+import re
+import zlib
+from functools import lru_cache
+
+import pyqtgraph as pg
+from PySide6.QtGui import QColor
+
+# Couleurs générées dans OKLCH (OKLab en coordonnées polaires) : à luminance et
+# chroma égales, deux teintes éloignées y sont perçues comme aussi différentes
+# que leur écart d'angle, contrairement au HSV.
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2      # pas de teinte le plus "irrationnel"
+LIGHTNESS_LEVELS = (0.78, 0.64, 0.88)      # lisibles sur le fond noir des graphes
+CHROMA = 0.15
+TRAILING_NUMBER = re.compile(r"(\d+)$")
+
+
+def _linear_to_srgb(x):
+    return 12.92 * x if x <= 0.0031308 else 1.055 * x ** (1 / 2.4) - 0.055
+
+
+def _oklch_to_linear_rgb(lightness, chroma, hue_deg):
+    a = chroma * math.cos(math.radians(hue_deg))
+    b = chroma * math.sin(math.radians(hue_deg))
+    l = (lightness + 0.3963377774 * a + 0.2158037573 * b) ** 3
+    m = (lightness - 0.1055613458 * a - 0.0638541728 * b) ** 3
+    s = (lightness - 0.0894841775 * a - 1.2914855480 * b) ** 3
+    return (4.0767416621 * l - 3.3077115913 * m + 0.2309699292 * s,
+            -1.2684380046 * l + 2.6097574011 * m - 0.3413193965 * s,
+            -0.0041960863 * l - 0.7034186147 * m + 1.7076147010 * s)
+
+
+def oklch_to_hex(lightness, chroma, hue_deg):
+    """#rrggbb ; la chroma est réduite jusqu'à entrer dans le gamut sRGB."""
+    for _ in range(32):
+        rgb = _oklch_to_linear_rgb(lightness, chroma, hue_deg)
+        if all(-1e-6 <= c <= 1 + 1e-6 for c in rgb):
+            break
+        chroma *= 0.9
+    return "#" + "".join(f"{round(255 * min(max(_linear_to_srgb(max(c, 0.0)), 0.0), 1.0)):02x}"
+                         for c in rgb)
+
+
+def _stable_fraction(text):
+    # crc32 plutôt que hash() : hash() des str change à chaque lancement
+    return zlib.crc32(text.encode("utf-8")) / 2 ** 32
+
+
+@lru_cache(maxsize=None)
+def channel_color(channel_id):
+    """Couleur déterministe d'un canal, identique d'un lancement à l'autre.
+
+    Les voies d'un même module ("cDAQ2Mod1/ai0", "ai1", ...) avancent de
+    l'angle d'or sur le cercle des teintes à partir d'une teinte propre au
+    module, et alternent entre trois luminances : deux voies voisines ne se
+    ressemblent jamais.
+    """
+    device, _, name = channel_id.rpartition("/")
+    match = TRAILING_NUMBER.search(name)
+    index = int(match.group(1)) if match else zlib.crc32(name.encode("utf-8"))
+    hue = (_stable_fraction(device) + index * GOLDEN_RATIO) % 1.0
+    return oklch_to_hex(LIGHTNESS_LEVELS[index % len(LIGHTNESS_LEVELS)], CHROMA, hue * 360)
+
+
+def distinct_colors(n, offset=0.0):
+    """n couleurs aussi distinctes que possible (teintes réparties, luminances alternées)."""
+    colors = []
+    for i in range(n):
+        # Jusqu'à 12, des teintes équiréparties suffisent ; au-delà, la suite de
+        # l'angle d'or garde les couleurs consécutives éloignées
+        hue = i / n if n <= 12 else i * GOLDEN_RATIO
+        level = LIGHTNESS_LEVELS[i % len(LIGHTNESS_LEVELS)] if n > 6 else LIGHTNESS_LEVELS[0]
+        colors.append(oklch_to_hex(level, CHROMA, ((hue + offset) % 1.0) * 360))
+    return colors
+
+
+# --- Stylos et pinceaux, créés une fois par (couleur, style) ----------------
+# pyqtgraph copie les QPen reçus : les partager entre courbes est sans risque.
+
+@lru_cache(maxsize=1024)
+def cached_pen(color, width=2, style=None):
+    return pg.mkPen(color=color.strip(), width=width, style=style)
+
+
+@lru_cache(maxsize=1024)
+def cached_brush(color, alpha=255):
+    qcolor = QColor(color.strip())
+    qcolor.setAlpha(alpha)
+    return pg.mkBrush(qcolor)